@@ -5,8 +5,7 @@ import os
 # Добавляем родительский каталог в путь для импорта модулей
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from functions.prod_functions import write_in_file_by_lines
-from functions.prod_functions import generate_command_lines
+from functions.prod_functions import generate_gcode_file
 
 file_path = '../gcode/g_code_random.txt'
 
@@ -39,7 +38,7 @@ if __name__ == '__main__':
     """
     try:
         print("Generation begins. Please wait...")
-        write_in_file_by_lines(generate_command_lines(punch_params_dict), file_path)
+        generate_gcode_file(punch_params_dict, file_path)
         print("Generation finished!")
     except:
         raise SyntaxError
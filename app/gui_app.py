@@ -10,8 +10,9 @@ from PyQt5.QtWidgets import (QMainWindow, QApplication, QFileDialog,
 from design.py_files.main import Ui_NPM_Code_Generator
 from design.py_files.scheme import Ui_Scheme
 from functions.prod_functions import (
-    current_time, write_in_file_by_lines, check_params_for_validity
+    current_time, generate_gcode_file, check_params_for_validity
 )
+from functions.job_estimator import estimate_job
 from constants.const import *
 from functions.prod_functions import *
 from visualization import create_punch_visualization
@@ -26,18 +27,17 @@ class CodeGenerationThread(QThread):
     """Поток для генерации G-кода"""
     finished = pyqtSignal(bool, str)
 
-    def __init__(self, advanced_dict, gcode_path):
+    def __init__(self, advanced_dict, gcode_path, pipeline=False):
         super().__init__()
         self.advanced_dict = advanced_dict.copy()
         self.gcode_path = gcode_path
+        self.pipeline = pipeline
 
     def run(self):
         try:
-            # Генерация G-кода
-            g_code_lines = generate_command_lines(self.advanced_dict)
-
-            # Сохранение в файл
-            write_in_file_by_lines(g_code_lines, self.gcode_path)
+            # Потоковая генерация G-кода с записью в файл
+            # (pipeline=True - конвейер: генерация, форматирование и запись на отдельных потоках)
+            generate_gcode_file(self.advanced_dict, self.gcode_path, pipeline=self.pipeline)
 
             self.finished.emit(True, self.gcode_path)
 
@@ -222,6 +222,12 @@ class MainWindow(QMainWindow, Ui_NPM_Code_Generator):
 
         # Запускаем генерацию в отдельном потоке
         if handler_name == "punch_mode_11":
+            # Предварительная оценка задания (без генерации команд)
+            estimate = estimate_job(advanced_dict)
+            self.text_to_info_out(f"Оценка: время {estimate['time_data'][2][0]}, "
+                                  f"строк {estimate['total_lines']}, "
+                                  f"размер {estimate['file_bytes'] / 2 ** 20:.1f} МБ")
+
             # Показываем сообщение о начале генерации
             self.text_to_info_out("Начало генерации кода...")
 
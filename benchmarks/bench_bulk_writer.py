@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк записи G-кода в файл: текстовый режим (прежний write_in_file_by_lines)
+против BulkFileWriter (UTF-8 в переиспользуемый bytearray, блоки по несколько МБ).
+
+Для каждого задания программа форматируется один раз, затем измеряется только запись
+(лучшее из REPEATS повторов):
+    text lines  - open(path, "w", encoding="utf-8").writelines(lines)
+    bulk lines  - BulkFileWriter.writelines(lines) (новый write_in_file_by_lines)
+    text blocks - file.write(block) для блоков format_block() по оборотам
+    bulk blocks - BulkFileWriter.write(block), атомарная замена файла
+Все варианты дают побайтно одинаковый файл.
+
+Запуск:
+    python benchmarks/bench_bulk_writer.py [reference|max]
+"""
+
+import filecmp
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from functions.advanced_punch_generator import CommandLinesGenerator
+from functions.bulk_writer import BulkFileWriter
+
+
+# Эталонное задание tests/test_gcode_generation.py (~30 тыс. пробитий)
+REFERENCE_PARAMS = dict(
+    tube_len=528, i_diam=60, o_diam=70, fabric_thickness=1, punch_step_r=1,
+    needle_step_X=8, needle_step_Y=8, volumetric_density=25, head_len=264,
+    punch_depth=15, punch_offset=10, zero_offset_Y=10, zero_offset_Z=0,
+    support_depth=5, idling_speed=5000, move_speed=1000, rotate_speed=2000,
+    random_border=0.5, num_of_needle_rows=1,
+)
+
+# Предельное задание по ValidationLimits (~4 млн строк, ~250 МБ)
+MAX_ENVELOPE_PARAMS = dict(REFERENCE_PARAMS, tube_len=1200, i_diam=60, o_diam=300, fabric_thickness=0.6,
+                           zero_offset_Y=100, zero_offset_Z=100, punch_depth=14, move_speed=1500,
+                           rotate_speed=1000)
+
+JOBS = {'reference': REFERENCE_PARAMS, 'max': MAX_ENVELOPE_PARAMS}
+
+# Количество повторов записи (берется лучшее время)
+REPEATS = 5
+
+
+def _text_lines(lines, path):
+    with open(path, "w", encoding="utf-8") as file:
+        file.writelines(lines)
+
+
+def _bulk_lines(lines, path):
+    with BulkFileWriter(path, atomic=True) as file:
+        file.writelines(lines)
+
+
+def _text_blocks(blocks, path):
+    with open(path, "w", encoding="utf-8") as file:
+        for block in blocks:
+            file.write(block)
+
+
+def _bulk_blocks(blocks, path):
+    with BulkFileWriter(path, atomic=True) as file:
+        for block in blocks:
+            file.write(block)
+
+
+def run_job(name, params, tmp_dir):
+    generator = CommandLinesGenerator(params)
+    formatter = generator.file_formatter
+    lines = generator.generate_radial_spiral_pattern()
+    batches = list(generator.iter_command_batches())
+    header = ''.join(lines[:len(lines) - sum(len(batch) for batch in batches)])
+    blocks = [header] + [formatter.format_block(batch) for batch in batches]
+    del batches
+
+    size = sum(len(line.encode('utf-8')) for line in lines)
+    print(f"\n{name}: {len(lines)} строк, {size / 2 ** 20:.1f} МБ")
+    print(f"{'variant':>12} {'time, s':>9} {'MB/s':>8} {'speedup':>8} {'identical':>10}")
+
+    reference_path = os.path.join(tmp_dir, 'text_lines.txt')
+    base_time = None
+    for variant, function, data in (('text lines', _text_lines, lines), ('bulk lines', _bulk_lines, lines),
+                                    ('text blocks', _text_blocks, blocks), ('bulk blocks', _bulk_blocks, blocks)):
+        path = os.path.join(tmp_dir, variant.replace(' ', '_') + '.txt')
+        elapsed = float('inf')
+        for _ in range(REPEATS):
+            start = time.perf_counter()
+            function(data, path)
+            elapsed = min(elapsed, time.perf_counter() - start)
+        base_time = base_time or elapsed
+        identical = filecmp.cmp(path, reference_path, shallow=False)
+        print(f"{variant:>12} {elapsed:>9.3f} {size / 2 ** 20 / elapsed:>8.1f} "
+              f"{base_time / elapsed:>8.2f} {str(identical):>10}")
+        if path != reference_path:
+            os.remove(path)
+
+
+def main():
+    names = sys.argv[1:] or list(JOBS)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name in names:
+            run_job(name, JOBS[name], tmp_dir)
+
+
+if __name__ == '__main__':
+    main()
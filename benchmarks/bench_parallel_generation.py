@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк многопроцессной генерации G-кода (CommandLinesGenerator(workers=N)).
+
+Для каждого количества процессов записывает одну и ту же программу в файл,
+выводит время, ускорение относительно workers=1 и проверяет, что файл
+совпадает с последовательной генерацией (кроме строки с датой).
+
+Запуск:
+    python benchmarks/bench_parallel_generation.py [max_workers]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from functions.prod_functions import generate_gcode_file
+
+
+# Крупная программа: ~800 тыс. строк G-кода
+BENCH_PARAMS = dict(
+    tube_len=1056, i_diam=102, o_diam=160, fabric_thickness=0.6, punch_step_r=1,
+    needle_step_X=8, needle_step_Y=8, volumetric_density=25, head_len=264,
+    punch_depth=14, punch_offset=10, zero_offset_Y=100, zero_offset_Z=100,
+    support_depth=5, idling_speed=5000, move_speed=1500, rotate_speed=1000,
+    random_border=0.5, num_of_needle_rows=1,
+)
+
+
+def _read_body(path):
+    """Содержимое файла без строки с датой генерации"""
+    with open(path, encoding='utf-8') as file:
+        lines = file.readlines()
+    return lines[:2] + lines[3:]
+
+
+def main():
+    max_workers = int(sys.argv[1]) if len(sys.argv) > 1 else (os.cpu_count() or 1)
+    worker_counts = sorted({1, *[count for count in (2, 4, 8, 16, 32) if count <= max_workers], max_workers})
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        reference_path = os.path.join(tmp_dir, 'serial.txt')
+        base_time = None
+
+        print(f"CPU: {os.cpu_count()}")
+        print(f"{'workers':>8} {'time, s':>9} {'speedup':>8} {'identical':>10}")
+        for workers in worker_counts:
+            path = os.path.join(tmp_dir, f'workers_{workers}.txt')
+            start = time.perf_counter()
+            generate_gcode_file(BENCH_PARAMS, path, workers=workers)
+            elapsed = time.perf_counter() - start
+
+            if workers == 1:
+                base_time = elapsed
+                os.replace(path, reference_path)
+                identical = True
+            else:
+                identical = _read_body(path) == _read_body(reference_path)
+
+            print(f"{workers:>8} {elapsed:>9.2f} {base_time / elapsed:>8.2f} {str(identical):>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -27,9 +27,25 @@ class GenerationConfig:
 
     # Алгоритм
     EXTRA_ROTATIONS = 20
+    STITCHING_SUBSTEP_STRIDE = 1        # Прореживание подшагов в оборотах прошивки (пробивается каждый N-й подшаг)
+    STITCHING_MERGE_ROTATIONS = False   # Объединение поворотов без пробития только в оборотах прошивки
+    DENSITY_SCHEDULE = False   # Количество угловых шагов слоя по целевой поверхностной плотности пробитий
+    TARGET_DENSITY = None      # Целевая плотность, пробитий/см² (None - плотность шага punch_step_r)
+    DENSITY_TOLERANCE = 0.05   # Допустимое относительное отклонение плотности слоя от целевой
     CENTER_X = 0.0
     RANDOM_SEED = 5
+    RANDOM_MODE = 'sequential'  # 'sequential' - совместимая последовательность, 'counter' - счетчиковый Philox
     RANDOM_AMPLITUDE = 0.5
+    MERGE_ROTATIONS = False  # Объединение подряд идущих поворотов без пробития в один поворот
+    BLEND_ROTATIONS = False  # Совмещение поворота с подходом следующего шага в одну команду G01
+    STROKE_PROFILE = 'single'  # 'single' - удар одним движением, 'two_stage' - быстрый подвод к поверхности ткани
+    SURFACE_CLEARANCE = 1.0    # Зазор до поверхности ткани в конце быстрого подвода, мм
+    OPTIMIZE_PATH = False    # Оптимизация порядка пробитий по времени перемещений по X
+    PATH_CONSTRAINT = 'alternate'  # 'alternate' - соседние шаги в противоположных направлениях, 'free' - без ограничения
+
+    # Формат G-кода
+    GCODE_MODE = 'full'      # 'full' - все слова в каждой строке, 'compact' - модальные слова только при изменении
+    GCODE_COMMENTS = True    # Комментарии в строках команд
 
     # Соответствие объемной плотности к коэффициенту диаметров
     VOLUMETRIC_DENSITY_MAP = {15: 8, 25: 4, 45: 2}
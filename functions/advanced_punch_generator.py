@@ -1,4 +1,4 @@
-from typing import List
+from typing import Iterator, List, Optional, Union
 # Добавляем родительский каталог в путь для импорта модулей
 import sys
 import os
@@ -6,6 +6,10 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from functions.tube_command_generator import TubeCommandGenerator
 from functions.gcode_file_formatter import GCodeFileFormatter
 from functions.motion_commands import MotionCommand
+from functions.command_buffer import CommandBuffer
+from functions.gcode_stream_writer import GCodeStreamWriter, scan_program
+from functions.parallel_generation import iter_parallel_batches
+from functions.pipeline_generation import GenerationPipeline
 
 
 class CommandLinesGenerator:
@@ -14,14 +18,20 @@ class CommandLinesGenerator:
     Объединяет генерацию команд и их форматирование в текстовый файл.
     """
 
-    def __init__(self, params_dict: dict):
+    def __init__(self, params_dict: dict, workers: int = 1, pipeline: bool = False):
         """
         Инициализация продвинутого генератора
 
         Args:
             params_dict (dict): Словарь параметров пробития
+            workers (int): Количество процессов для записи в файл (1 - последовательная генерация)
+            pipeline (bool): Запись в файл конвейером генерация -> форматирование -> запись
+                             на отдельных потоках (при workers == 1)
         """
         self.params = params_dict
+        self.workers = workers
+        self.pipeline = pipeline
+        self.pipeline_report = None
         self.command_generator = TubeCommandGenerator(params_dict)
         self.file_formatter = GCodeFileFormatter(params_dict)
 
@@ -33,9 +43,16 @@ class CommandLinesGenerator:
             List[str]: Список строк G-кода с переносами строк
         """
 
-        commands = self.command_generator.generate_punch_pattern_commands()
         generation_stats = self.command_generator.get_generation_statistics()
-
+        if self.file_formatter.compact:
+            # модальное состояние компактного формата сбрасывается в начале каждого оборота
+            return self.file_formatter.format_batches_to_lines(
+                list(self.iter_command_batches()),
+                generation_stats,
+                "generate_command_lines"
+            )
+
+        commands = self.generate_command_buffer()
         formatted_lines = self.file_formatter.format_to_lines(
             commands,
             generation_stats,
@@ -44,6 +61,44 @@ class CommandLinesGenerator:
 
         return formatted_lines
 
+    def write_radial_spiral_pattern(self, path: str,
+                                    function_name: str = "generate_gcode_file",
+                                    compression: Optional[str] = None,
+                                    level: Optional[int] = None) -> dict:
+        """
+        Потоковая генерация радиально-спирального паттерна сразу в файл.
+        Команды генерируются, форматируются и записываются по одному обороту,
+        заголовок со временем выполнения дописывается в конце.
+        При workers > 1 диапазон оборотов (включая прошивку) делится на шарды,
+        которые генерируются и форматируются в пуле процессов; результат идентичен.
+        При pipeline=True стадии генерации, форматирования и записи работают на
+        отдельных потоках (GenerationPipeline), отчет по стадиям - в pipeline_report.
+        При сжатии (compression) заголовок нельзя перезаписать, поэтому время и количество
+        пробитий рассчитываются предварительным проходом без форматирования (scan_program).
+
+        Args:
+            path (str): Путь к файлу G-кода
+            function_name (str): Имя функции для заголовка
+            compression (Optional[str]): Сжатие файла ('gz', 'xz' или None)
+            level (Optional[int]): Уровень сжатия (None - по умолчанию)
+
+        Returns:
+            dict: Сводка записи (time_data, command_lines, punches)
+        """
+        writer = GCodeStreamWriter(self.params)
+        if self.workers > 1:
+            batches = iter_parallel_batches(self.params, self.workers)
+        elif self.pipeline:
+            batches = GenerationPipeline(self.params)
+        else:
+            batches = self.iter_command_batches()
+        precomputed = scan_program(self.params) if compression is not None else None
+        summary = writer.write(batches, self.get_statistics(), path, function_name,
+                               compression=compression, level=level, precomputed=precomputed)
+        if isinstance(batches, GenerationPipeline):
+            self.pipeline_report = batches.report()
+        return summary
+
     def generate_commands_only(self) -> List[MotionCommand]:
         """
         Генерация только структурированных команд без форматирования
@@ -51,8 +106,26 @@ class CommandLinesGenerator:
         Returns:
             List[MotionCommand]: Список структурированных команд
         """
+        return self.generate_command_buffer().to_commands()
+
+    def generate_command_buffer(self) -> CommandBuffer:
+        """
+        Генерация команд в колоночном представлении (без создания MotionCommand)
+
+        Returns:
+            CommandBuffer: Буфер команд программы
+        """
         return self.command_generator.generate_punch_pattern_commands()
 
+    def iter_command_batches(self) -> Iterator[CommandBuffer]:
+        """
+        Потоковая генерация команд по оборотам (см. TubeCommandGenerator.iter_revolution_batches)
+
+        Yields:
+            CommandBuffer: Команды одного оборота или батч с командой M110
+        """
+        return self.command_generator.iter_revolution_batches()
+
     def get_statistics(self) -> dict:
         """
         Получить статистику генерации
@@ -62,19 +135,19 @@ class CommandLinesGenerator:
         """
         return self.command_generator.get_generation_statistics()
 
-    def get_command_statistics(self, commands: List[MotionCommand] = None) -> dict:
+    def get_command_statistics(self, commands: Union[List[MotionCommand], CommandBuffer] = None) -> dict:
         """
         Получить статистику команд
 
         Args:
-            commands (List[MotionCommand], optional): Команды для анализа.
+            commands (Union[List[MotionCommand], CommandBuffer], optional): Команды для анализа.
                                                      Если None, генерирует новые.
 
         Returns:
             dict: Статистика команд
         """
         if commands is None:
-            commands = self.generate_commands_only()
+            commands = self.generate_command_buffer()
 
         return self.file_formatter.count_command_statistics(commands)
 
@@ -96,7 +169,7 @@ class CommandLinesGenerator:
         print(f"Seed для случайных смещений: {stats['random_seed']}")
 
         if verbose:
-            commands = self.generate_commands_only()
+            commands = self.generate_command_buffer()
             cmd_stats = self.get_command_statistics(commands)
             print("\n=== СТАТИСТИКА КОМАНД ===")
             for key, value in cmd_stats.items():
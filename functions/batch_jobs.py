@@ -0,0 +1,281 @@
+import csv
+import io
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field, asdict
+from typing import List, Optional
+
+from constants.const import advanced_dict
+from functions.bulk_writer import BulkFileWriter
+from functions.compressed_io import compression_from_path
+from functions.layer_plan import LayerPlan
+from functions.parameter_validator import ParameterValidator
+from functions.prod_functions import generate_gcode_file
+from functions.time_calc import _seconds_to_dhms
+
+
+# Служебные поля задания (не являются параметрами пробития)
+JOB_NAME = 'name'
+JOB_OUTPUT = 'output'
+
+# Статусы заданий
+STATUS_OK = 'ok'
+STATUS_INVALID = 'invalid'   # параметры не прошли ParameterValidator
+STATUS_ERROR = 'error'       # ошибка генерации или записи
+
+# Колонки итоговой таблицы (CSV)
+SUMMARY_COLUMNS = ('name', 'status', 'time', 'seconds', 'part1_seconds', 'part2_seconds', 'punches',
+                   'file_bytes', 'generation_seconds', 'output', 'error')
+
+
+@dataclass
+class BatchJob:
+    """
+    Задание пакетной генерации.
+
+    Attributes:
+        name (str): Имя задания
+        output (str): Путь к файлу G-кода
+        params (dict): Параметры пробития (недостающие взяты из advanced_dict)
+    """
+    name: str
+    output: str
+    params: dict = field(default_factory=dict)
+
+
+@dataclass
+class JobResult:
+    """
+    Результат задания пакетной генерации.
+
+    Attributes:
+        name (str): Имя задания
+        status (str): STATUS_OK, STATUS_INVALID или STATUS_ERROR
+        time (str): Время выполнения программы (ч:мм:сс)
+        seconds (int): Время выполнения программы в секундах
+        part1_seconds, part2_seconds (int): Время Part 1 и Part 2 в секундах
+        punches (int): Количество пробитий
+        file_bytes (int): Размер файла
+        generation_seconds (float): Время генерации (по часам)
+        output (str): Путь к файлу G-кода
+        error (str): Сообщение об ошибке
+    """
+    name: str
+    status: str
+    time: str = ''
+    seconds: int = 0
+    part1_seconds: int = 0
+    part2_seconds: int = 0
+    punches: int = 0
+    file_bytes: int = 0
+    generation_seconds: float = 0.0
+    output: str = ''
+    error: str = ''
+
+
+def load_jobs(path: str, output_dir: str) -> List[BatchJob]:
+    """
+    Чтение файла заданий: JSON (список объектов или {"jobs": [...]}) или CSV
+    (строка заголовка с именами параметров). Поля 'name' и 'output' необязательны:
+    по умолчанию job_001, job_002, ... и <name>.txt в output_dir. Пустые ячейки CSV
+    и отсутствующие параметры берутся из advanced_dict.
+
+    Args:
+        path (str): Путь к файлу заданий (.json или .csv)
+        output_dir (str): Каталог файлов G-кода (для относительных путей 'output')
+
+    Returns:
+        List[BatchJob]: Задания в порядке файла
+    """
+    if os.path.splitext(path)[1].lower() == '.csv':
+        with open(path, encoding='utf-8', newline='') as file:
+            records = [{key.strip(): _csv_value(value) for key, value in row.items()
+                        if key and value is not None and value.strip() != ''}
+                       for row in csv.DictReader(file)]
+    else:
+        with open(path, encoding='utf-8') as file:
+            records = json.load(file)
+        if isinstance(records, dict):
+            records = records.get('jobs', [])
+    if not isinstance(records, list) or not all(isinstance(record, dict) for record in records):
+        raise ValueError(f"Файл заданий должен содержать список объектов: {path}")
+
+    jobs = []
+    for index, record in enumerate(records, start=1):
+        record = dict(record)
+        name = str(record.pop(JOB_NAME, f"job_{index:03d}"))
+        output = os.path.join(output_dir, str(record.pop(JOB_OUTPUT, f"{name}.txt")))
+        jobs.append(BatchJob(name=name, output=output, params=dict(advanced_dict, **record)))
+
+    outputs = [os.path.abspath(job.output) for job in jobs]
+    duplicates = sorted({output for output in outputs if outputs.count(output) > 1})
+    if duplicates:
+        raise ValueError(f"Несколько заданий записываются в один файл: {', '.join(duplicates)}")
+    return jobs
+
+
+def run_job(job: BatchJob) -> JobResult:
+    """
+    Проверка параметров и генерация одного задания (выполняется в процессе-исполнителе).
+    Ошибки задания возвращаются в результате и не прерывают остальные задания.
+    Генерация ничего не выводит в консоль: вывод процессов пула не перемешивается.
+
+    Args:
+        job (BatchJob): Задание
+
+    Returns:
+        JobResult: Результат задания
+    """
+    try:
+        is_valid, name, message = ParameterValidator().validate_all_parameters(job.params)
+    except Exception as error:
+        # нечисловое или отсутствующее значение параметра
+        return JobResult(name=job.name, status=STATUS_INVALID, output=job.output,
+                         error=f"{type(error).__name__}: {error}")
+    if not is_valid:
+        return JobResult(name=job.name, status=STATUS_INVALID, output=job.output, error=f"{name}: {message}")
+
+    start = time.perf_counter()
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(job.output)), exist_ok=True)
+        time_data = generate_gcode_file(job.params, job.output, compression=compression_from_path(job.output))
+        punches = LayerPlan.for_params(job.params).total_punches
+        file_bytes = os.path.getsize(job.output)
+    except Exception as error:
+        return JobResult(name=job.name, status=STATUS_ERROR, output=job.output,
+                         generation_seconds=time.perf_counter() - start,
+                         error=f"{type(error).__name__}: {error}")
+    return JobResult(name=job.name, status=STATUS_OK, time=time_data[2][0], seconds=time_data[2][1],
+                     part1_seconds=time_data[0][1], part2_seconds=time_data[1][1], punches=punches,
+                     file_bytes=file_bytes, generation_seconds=time.perf_counter() - start, output=job.output)
+
+
+def run_batch(jobs: List[BatchJob], workers: int = 1) -> List[JobResult]:
+    """
+    Генерация всех заданий: последовательно или в пуле процессов (одно задание - один процесс).
+
+    Аварийное завершение процесса-исполнителя (BrokenProcessPool) прерывает все задания
+    пула, поэтому незавершенные задания перезапускаются в новом пуле. Если пул прерывается
+    раньше, чем завершается хотя бы одно задание, оставшиеся задания выполняются по одному
+    в отдельном процессе: ошибкой отмечается только задание, завершившее свой процесс.
+
+    Args:
+        jobs (List[BatchJob]): Задания
+        workers (int): Количество процессов (1 - последовательно)
+
+    Returns:
+        List[JobResult]: Результаты в порядке заданий
+    """
+    if workers <= 1:
+        return [run_job(job) for job in jobs]
+
+    results: List[Optional[JobResult]] = [None] * len(jobs)
+    pending = list(range(len(jobs)))
+    while pending:
+        broken = _run_pool(jobs, pending, results, workers)
+        if not broken:
+            break
+        if len(broken) == len(pending):
+            for index in broken:
+                _run_pool(jobs, [index], results, 1, isolated=True)
+            break
+        pending = broken
+    return results
+
+
+def _run_pool(jobs: List[BatchJob], indices: List[int], results: List[Optional[JobResult]], workers: int,
+              isolated: bool = False) -> List[int]:
+    """
+    Выполнение заданий в новом пуле процессов с записью результатов в results
+
+    Args:
+        jobs (List[BatchJob]): Задания
+        indices (List[int]): Номера выполняемых заданий
+        results (List[Optional[JobResult]]): Результаты в порядке заданий (заполняются)
+        workers (int): Количество процессов
+        isolated (bool): Задание выполняется одно - прерывание пула является его ошибкой
+
+    Returns:
+        List[int]: Номера заданий, прерванных аварийным завершением пула (без результата)
+    """
+    broken = []
+    with ProcessPoolExecutor(max_workers=min(workers, len(indices))) as executor:
+        futures = {executor.submit(run_job, jobs[index]): index for index in indices}
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                results[index] = future.result()
+            except BrokenProcessPool as error:
+                if isolated:
+                    results[index] = _error_result(jobs[index], error)
+                else:
+                    broken.append(index)
+            except Exception as error:
+                results[index] = _error_result(jobs[index], error)
+    return sorted(broken)
+
+
+def _error_result(job: BatchJob, error: Exception) -> JobResult:
+    """Результат задания, завершившегося исключением в пуле процессов"""
+    return JobResult(name=job.name, status=STATUS_ERROR, output=job.output, error=f"{type(error).__name__}: {error}")
+
+
+def write_summary(results: List[JobResult], path: str):
+    """
+    Запись итоговой таблицы заданий в CSV
+
+    Args:
+        results (List[JobResult]): Результаты заданий
+        path (str): Путь к файлу CSV
+    """
+    text = io.StringIO()
+    writer = csv.DictWriter(text, fieldnames=SUMMARY_COLUMNS, lineterminator='\n')
+    writer.writeheader()
+    for result in results:
+        writer.writerow(dict(asdict(result), generation_seconds=f"{result.generation_seconds:.2f}"))
+    with BulkFileWriter(path, atomic=True) as file:
+        file.write(text.getvalue())
+
+
+def format_summary(results: List[JobResult], elapsed: Optional[float] = None) -> str:
+    """
+    Итоговая таблица заданий для вывода в консоль
+
+    Args:
+        results (List[JobResult]): Результаты заданий
+        elapsed (Optional[float]): Общее время пакета по часам, с
+
+    Returns:
+        str: Отчет
+    """
+    lines = [f"{'Задание':<24}{'статус':>9}{'время программы':>18}{'пробитий':>10}{'размер, МБ':>12}"
+             f"{'генерация, с':>14}"]
+    for result in results:
+        lines.append(f"{result.name:<24}{result.status:>9}{result.time:>18}{result.punches:>10}"
+                     f"{result.file_bytes / 2 ** 20:>12.2f}{result.generation_seconds:>14.2f}")
+        if result.error:
+            lines.append(f"  {result.error}")
+    failed = sum(1 for result in results if result.status != STATUS_OK)
+    total = f"Заданий: {len(results)}, успешно: {len(results) - failed}, с ошибками: {failed}"
+    if elapsed is not None:
+        total += f", общее время: {elapsed:.2f} с"
+    lines.append(total)
+    lines.append(f"Суммарное время программ: {_seconds_to_dhms(sum(result.seconds for result in results))}")
+    return "\n".join(lines)
+
+
+def _csv_value(value: str):
+    """Значение ячейки CSV: int, float, bool или строка"""
+    value = value.strip()
+    if value.lower() in ('true', 'false'):
+        return value.lower() == 'true'
+    for convert in (int, float):
+        try:
+            return convert(value)
+        except ValueError:
+            pass
+    return value
+
@@ -0,0 +1,198 @@
+import os
+import secrets
+from itertools import islice
+from typing import Iterable, Optional, Union
+
+from functions.compressed_io import check_compression, open_compressed_writer
+
+
+class BulkFileWriter:
+    """
+    Запись текста в файл крупными блоками через переиспользуемый буфер bytearray.
+
+    Текст кодируется в UTF-8 и копируется в буфер фиксированного размера;
+    при заполнении буфер записывается в файл одним вызовом write (несколько МБ),
+    после чего используется повторно без выделения памяти. Переводы строк
+    '\\n' заменяются на newline (по умолчанию os.linesep, как в текстовом режиме).
+
+    При atomic=True запись идет во временный файл в том же каталоге, который
+    переименовывается в целевой (os.replace) только после успешного закрытия;
+    при ошибке временный файл удаляется, а существующий файл не изменяется.
+
+    При compression ('gz' / 'xz') блоки сразу сжимаются потоковым компрессором
+    (gzip / lzma), несжатый файл не создается; перезапись (overwrite) недоступна.
+
+    Использование:
+        with BulkFileWriter(path, atomic=True) as writer:
+            writer.write(text)
+    """
+
+    # Размер блока записи по умолчанию (байт)
+    DEFAULT_BLOCK_SIZE = 4 * 1024 * 1024
+
+    # Количество строк, объединяемых перед кодированием в writelines()
+    LINES_PER_CHUNK = 65536
+
+    # Количество попыток подобрать свободное имя временного файла (atomic=True)
+    TEMP_NAME_ATTEMPTS = 100
+
+    def __init__(self, path: str, block_size: int = DEFAULT_BLOCK_SIZE, atomic: bool = False,
+                 newline: Optional[str] = None, compression: Optional[str] = None,
+                 level: Optional[int] = None):
+        """
+        Args:
+            path (str): Путь к файлу
+            block_size (int): Размер блока записи в байтах
+            atomic (bool): Запись через временный файл с атомарным переименованием
+            newline (Optional[str]): Перевод строки в файле (None - os.linesep)
+            compression (Optional[str]): Формат сжатия ('gz', 'xz' или None)
+            level (Optional[int]): Уровень сжатия (None - по умолчанию для формата)
+        """
+        self.path = path
+        self.block_size = block_size
+        self.atomic = atomic
+        self.newline = os.linesep if newline is None else newline
+        self.compression = compression
+        self.level = check_compression(compression, level)
+        self._raw_file = None
+
+        self.bytes_written = 0
+        self._buffer = bytearray(block_size)
+        self._view = memoryview(self._buffer)
+        self._fill = 0
+        self._file = None
+        self._temp_path = None
+
+    def __enter__(self) -> 'BulkFileWriter':
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def open(self):
+        """Открытие файла (при atomic=True - временного файла в каталоге назначения)"""
+        if self.atomic:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            # Временный файл создается обычным open() (права по umask процесса, без его изменения);
+            # режим 'x' исключает совпадение с файлом другого писателя
+            for _ in range(self.TEMP_NAME_ATTEMPTS):
+                temp_path = os.path.join(directory, f".{os.path.basename(self.path)}.{secrets.token_hex(4)}.tmp")
+                try:
+                    self._file = open(temp_path, "x+b")
+                except FileExistsError:
+                    continue
+                self._temp_path = temp_path
+                break
+            else:
+                raise FileExistsError(f"Не удалось создать временный файл в каталоге {directory}")
+        else:
+            self._file = open(self.path, "w+b")
+
+        if self.compression is not None:
+            self._raw_file = self._file
+            self._file = open_compressed_writer(self._raw_file, self.compression, self.level,
+                                                name=os.path.basename(self.path))
+
+    def write(self, text: Union[str, bytes]):
+        """
+        Запись текста (кодируется в UTF-8 в буфер, блоки сбрасываются в файл)
+
+        Args:
+            text (Union[str, bytes]): Текст с переводами строк '\\n'
+                                      (или уже закодированный в UTF-8)
+        """
+        if isinstance(text, str):
+            if self.newline != '\n':
+                text = text.replace('\n', self.newline)
+            data = text.encode('utf-8')
+        elif self.newline != '\n':
+            data = text.replace(b'\n', self.newline.encode('utf-8'))
+        else:
+            data = text
+        size = len(data)
+        self.bytes_written += size
+
+        if self._fill + size > self.block_size:
+            self.flush()
+        if size >= self.block_size:
+            self._file.write(data)
+            return
+
+        self._buffer[self._fill:self._fill + size] = data
+        self._fill += size
+
+    def writelines(self, lines: Iterable[str]):
+        """
+        Запись последовательности строк (строки объединяются порциями перед кодированием)
+
+        Args:
+            lines (Iterable[str]): Строки с переводами строк
+        """
+        lines = iter(lines)
+        while True:
+            chunk = list(islice(lines, self.LINES_PER_CHUNK))
+            if not chunk:
+                break
+            self.write(''.join(chunk))
+
+    def flush(self):
+        """Запись накопленного блока в файл"""
+        if self._fill:
+            self._file.write(self._view[:self._fill])
+            self._fill = 0
+
+    def overwrite(self, offset: int, text: str):
+        """
+        Перезапись уже записанных байт (например, заголовка) без изменения длины файла
+
+        Args:
+            offset (int): Смещение в байтах от начала файла
+            text (str): Текст (после перекодировки не должен выходить за конец файла)
+        """
+        if self.compression is not None:
+            raise ValueError("Перезапись недоступна при записи со сжатием")
+        self.flush()
+        if self.newline != '\n':
+            text = text.replace('\n', self.newline)
+        data = text.encode('utf-8')
+        if offset + len(data) > self.bytes_written:
+            raise ValueError("Перезапись выходит за пределы записанных данных")
+        self._file.seek(offset)
+        self._file.write(data)
+        self._file.seek(0, os.SEEK_END)
+
+    def close(self):
+        """Сброс буфера, закрытие файла и (при atomic=True) переименование в целевой файл"""
+        if self._file is None:
+            return
+        self.flush()
+        self._close_files()
+        if self._temp_path is not None:
+            os.replace(self._temp_path, self.path)
+            self._temp_path = None
+
+    def abort(self):
+        """Закрытие файла без сохранения (временный файл удаляется)"""
+        if self._file is not None:
+            self._close_files()
+        if self._temp_path is not None:
+            try:
+                os.remove(self._temp_path)
+            except OSError:
+                pass
+            self._temp_path = None
+
+    def _close_files(self):
+        """Закрытие компрессора (если есть) и файла"""
+        try:
+            self._file.close()
+        finally:
+            if self._raw_file is not None:
+                self._raw_file.close()
+            self._file = None
+            self._raw_file = None
+
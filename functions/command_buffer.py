@@ -0,0 +1,331 @@
+from typing import Iterable, Iterator, List, Sequence, Union
+
+import numpy as np
+
+from functions.motion_commands import MotionCommand, CommandType, PunchCommands
+from functions.punch_array_engine import RevolutionPunches, rotation_angle_steps, blended_angle_steps
+
+
+# Коды типов команд (индекс в кортеже = значение колонки kind)
+KIND_CODES = (CommandType.LINEAR_MOVE, CommandType.M_CODE, CommandType.PAUSE)
+KIND_LINEAR_MOVE = 0
+KIND_M_CODE = 1
+KIND_PAUSE = 2
+
+# Номера фаз программы
+PHASE_MAIN = 0        # Основная намотка (Part 1)
+PHASE_STITCHING = 1   # Виртуальная прошивка (Part 2)
+
+# Биты колонки int_mask: значение исходно было целым (влияет на текст G-кода)
+INT_X = 1
+INT_Y = 2
+INT_Z = 4
+INT_A = 8
+INT_FEED = 16
+INT_PAUSE = 32
+
+NO_COMMENT = -1
+NO_M_CODE = -1
+
+# Стандартная таблица комментариев буфера
+DEFAULT_COMMENTS = (
+    PunchCommands.ROTATE_COMMENT,
+    PunchCommands.APPROACH_COMMENT,
+    PunchCommands.PUNCH_COMMENT,
+    PunchCommands.RETRACT_COMMENT,
+    PunchCommands.WAITING_COMMENT,
+    PunchCommands.SURFACE_COMMENT,
+    PunchCommands.EXIT_COMMENT,
+)
+(COMMENT_ROTATE, COMMENT_APPROACH, COMMENT_PUNCH, COMMENT_RETRACT, COMMENT_WAITING,
+ COMMENT_SURFACE, COMMENT_EXIT) = range(7)
+
+_COLUMNS = ('kind', 'x', 'y', 'z', 'a', 'feed', 'm_code', 'pause', 'phase', 'comment', 'int_mask')
+_DTYPES = dict(kind=np.int8, x=np.float64, y=np.float64, z=np.float64, a=np.float64,
+               feed=np.float64, m_code=np.int16, pause=np.float64, phase=np.int8,
+               comment=np.int16, int_mask=np.uint8)
+_FILL = dict(kind=KIND_LINEAR_MOVE, x=np.nan, y=np.nan, z=np.nan, a=np.nan, feed=np.nan,
+             m_code=NO_M_CODE, pause=np.nan, phase=PHASE_MAIN, comment=NO_COMMENT, int_mask=0)
+
+
+def _int_bit(value, bit: int) -> int:
+    """Бит int_mask для скалярного значения (целые числа печатаются без '.0')"""
+    return bit if isinstance(value, (int, np.integer)) and not isinstance(value, bool) else 0
+
+
+class CommandBuffer:
+    """
+    Колоночное (struct-of-arrays) представление программы.
+
+    Каждая команда - строка в наборе типизированных массивов. Отсутствующие оси
+    хранятся как NaN, отсутствующие M-код и комментарий - как -1.
+    Буфер ведет себя как последовательность MotionCommand: индексация и итерация
+    создают команды по требованию, поэтому существующий код продолжает работать.
+
+    Columns:
+        kind (int8): Код типа команды (индекс в KIND_CODES)
+        x, y, z, a (float64): Координаты, NaN - ось не задана
+        feed (float64): Скорость подачи, NaN - не задана
+        m_code (int16): Номер M-кода, -1 - нет
+        pause (float64): Время паузы G04, NaN - нет
+        phase (int8): Фаза программы (PHASE_MAIN / PHASE_STITCHING)
+        comment (int16): Индекс комментария в self.comments, -1 - нет
+        int_mask (uint8): Биты INT_* для значений, исходно заданных целыми числами
+    """
+
+    def __init__(self, comments: Sequence[str] = DEFAULT_COMMENTS, **columns):
+        """
+        Инициализация буфера по готовым колонкам
+
+        Args:
+            comments (Sequence[str]): Таблица комментариев
+            **columns: Массивы колонок одинаковой длины (отсутствующие заполняются пустыми значениями)
+        """
+        size = len(next(iter(columns.values()))) if columns else 0
+        for name in _COLUMNS:
+            if name in columns:
+                column = np.asarray(columns[name], dtype=_DTYPES[name])
+            else:
+                column = np.full(size, _FILL[name], dtype=_DTYPES[name])
+            if len(column) != size:
+                raise ValueError(f"Колонка {name} имеет длину {len(column)}, ожидалось {size}")
+            setattr(self, name, column)
+        self.comments = list(comments)
+
+    @classmethod
+    def empty(cls, size: int = 0, comments: Sequence[str] = DEFAULT_COMMENTS) -> 'CommandBuffer':
+        """Буфер из size пустых команд G01"""
+        return cls(comments, **{name: np.full(size, _FILL[name], dtype=_DTYPES[name]) for name in _COLUMNS})
+
+    @classmethod
+    def from_commands(cls, commands: Iterable[MotionCommand], phase: int = PHASE_MAIN) -> 'CommandBuffer':
+        """
+        Преобразование списка MotionCommand в буфер
+
+        Args:
+            commands (Iterable[MotionCommand]): Команды
+            phase (int): Фаза программы для всех команд
+
+        Returns:
+            CommandBuffer: Буфер команд
+        """
+        commands = list(commands)
+        buffer = cls.empty(len(commands))
+        buffer.phase[:] = phase
+        comment_index = {comment: idx for idx, comment in enumerate(buffer.comments)}
+
+        for row, cmd in enumerate(commands):
+            buffer.kind[row] = KIND_CODES.index(cmd.command_type)
+            mask = 0
+            for name, bit in (('x', INT_X), ('y', INT_Y), ('z', INT_Z), ('a', INT_A)):
+                value = getattr(cmd, name)
+                if value is not None:
+                    getattr(buffer, name)[row] = value
+                    mask |= _int_bit(value, bit)
+            if cmd.feed_rate is not None:
+                buffer.feed[row] = cmd.feed_rate
+                mask |= _int_bit(cmd.feed_rate, INT_FEED)
+            if cmd.pause_time is not None:
+                buffer.pause[row] = cmd.pause_time
+                mask |= _int_bit(cmd.pause_time, INT_PAUSE)
+            if cmd.command_type == CommandType.M_CODE:
+                # у прочих команд поле m_code не заполняется
+                buffer.m_code[row] = cmd.m_code
+            if cmd.comment:
+                if cmd.comment not in comment_index:
+                    comment_index[cmd.comment] = len(buffer.comments)
+                    buffer.comments.append(cmd.comment)
+                buffer.comment[row] = comment_index[cmd.comment]
+            buffer.int_mask[row] = mask
+
+        return buffer
+
+    @classmethod
+    def from_punches(cls, punches: RevolutionPunches, rotate_speed: float, idling_speed: float,
+                     move_speed: float, phase: int = PHASE_MAIN, merge_rotations: bool = False,
+                     keep_last_rotation: bool = True,
+                     blend_rotations: Union[bool, np.ndarray] = False) -> 'CommandBuffer':
+        """
+        Сборка команд оборота (поворот + подход/внедрение/извлечение для каждого пробития;
+        при двухэтапном ударе punches.y_surface - подход/подвод/внедрение/выход/извлечение)
+
+        Args:
+            punches (RevolutionPunches): Координаты пробитий оборота
+            rotate_speed, idling_speed, move_speed (float): Скорости
+            phase (int): Фаза программы
+            merge_rotations (bool): Пропускать повороты шагов без пробития (см. rotation_angle_steps)
+            keep_last_rotation (bool): При объединении сохранить поворот последнего шага оборота
+            blend_rotations (Union[bool, np.ndarray]): Совмещать поворот с первым подходом шага
+                                    (маска шагов - только на этих шагах, см. blended_angle_steps):
+                                    подход выполняется вместе с A со скоростью min(rotate_speed, idling_speed)
+
+        Returns:
+            CommandBuffer: Команды оборота в порядке выполнения
+        """
+        punches_per_step = punches.x.shape[1] if punches.x.ndim == 2 else 0
+        two_stage = punches.y_surface is not None
+        rows_per_punch = 5 if two_stage else 3
+        blended = blended_angle_steps(punches.active, blend_rotations)
+        rotations = rotation_angle_steps(punches.active, merge_rotations, keep_last_rotation) & ~blended
+        rows_per_step = rotations.astype(np.int64) + rows_per_punch * punches.active.astype(np.int64) * punches_per_step
+        starts = np.cumsum(rows_per_step) - rows_per_step
+        buffer = cls.empty(int(rows_per_step.sum()))
+        buffer.phase[:] = phase
+
+        # повороты
+        rotate_rows = starts[rotations]
+        buffer.a[rotate_rows] = punches.angles[rotations]
+        buffer.feed[rotate_rows] = rotate_speed
+        buffer.comment[rotate_rows] = COMMENT_ROTATE
+        buffer.int_mask[rotate_rows] = _int_bit(rotate_speed, INT_FEED)
+
+        # тройки подход - внедрение - извлечение
+        # (двухэтапный удар: подход - подвод - внедрение - выход - быстрое извлечение)
+        first_rows = starts[punches.active] + rotations[punches.active]
+        rows = first_rows[:, None] + np.arange(rows_per_punch * punches_per_step)[None, :]
+        stages = [(punches.y, punches.z, idling_speed, COMMENT_APPROACH),
+                  (punches.y_punch, punches.z_punch, move_speed, COMMENT_PUNCH),
+                  (punches.y, punches.z, move_speed, COMMENT_RETRACT)]
+        if two_stage:
+            stages = [stages[0],
+                      (punches.y_surface, punches.z, idling_speed, COMMENT_SURFACE),
+                      stages[1],
+                      (punches.y_surface, punches.z, move_speed, COMMENT_EXIT),
+                      (punches.y, punches.z, idling_speed, COMMENT_RETRACT)]
+        for offset, (y, z, speed, comment) in enumerate(stages):
+            idx = rows[:, offset::rows_per_punch]
+            buffer.x[idx] = punches.x
+            buffer.y[idx] = y
+            buffer.z[idx] = z
+            buffer.feed[idx] = speed
+            buffer.comment[idx] = comment
+            buffer.int_mask[idx] = _int_bit(y, INT_Y) | _int_bit(z, INT_Z) | _int_bit(speed, INT_FEED)
+
+        # совмещенные повороты: первый подход шага получает A и общую скорость
+        if blended.any():
+            blend_speed = min(rotate_speed, idling_speed)
+            blend_rows = first_rows[blended[punches.active]]
+            buffer.a[blend_rows] = punches.angles[blended]
+            buffer.feed[blend_rows] = blend_speed
+            buffer.int_mask[blend_rows] = ((buffer.int_mask[blend_rows] & ~np.uint8(INT_FEED))
+                                           | _int_bit(blend_speed, INT_FEED))
+
+        return buffer
+
+    @classmethod
+    def concatenate(cls, buffers: Iterable['CommandBuffer']) -> 'CommandBuffer':
+        """
+        Объединение буферов в один (таблицы комментариев сводятся в общую)
+
+        Args:
+            buffers (Iterable[CommandBuffer]): Буферы в порядке выполнения
+
+        Returns:
+            CommandBuffer: Объединенный буфер
+        """
+        buffers = list(buffers)
+        if not buffers:
+            return cls.empty()
+
+        comments = list(buffers[0].comments)
+        comment_index = {comment: idx for idx, comment in enumerate(comments)}
+        remapped = []
+        for buffer in buffers:
+            for comment in buffer.comments:
+                if comment not in comment_index:
+                    comment_index[comment] = len(comments)
+                    comments.append(comment)
+            # -1 (нет комментария) остается -1: последний элемент таблицы перекодировки
+            lookup = np.array([comment_index[c] for c in buffer.comments] + [NO_COMMENT], dtype=np.int16)
+            remapped.append(lookup[buffer.comment])
+
+        columns = {name: np.concatenate([getattr(buffer, name) for buffer in buffers]) for name in _COLUMNS}
+        columns['comment'] = np.concatenate(remapped)
+        return cls(comments, **columns)
+
+    def __len__(self) -> int:
+        return len(self.kind)
+
+    def __getitem__(self, index: Union[int, slice, np.ndarray]) -> Union[MotionCommand, 'CommandBuffer']:
+        """Команда по индексу (MotionCommand) или срез/выборка (CommandBuffer)"""
+        if isinstance(index, (int, np.integer)):
+            if index < 0:
+                index += len(self)
+            if not 0 <= index < len(self):
+                raise IndexError("Индекс команды вне диапазона")
+            return self.command_at(int(index))
+        return CommandBuffer(self.comments, **{name: getattr(self, name)[index] for name in _COLUMNS})
+
+    def __iter__(self) -> Iterator[MotionCommand]:
+        for row in range(len(self)):
+            yield self.command_at(row)
+
+    def __repr__(self) -> str:
+        return f"CommandBuffer({len(self)} команд, {self.nbytes} байт)"
+
+    @property
+    def nbytes(self) -> int:
+        """Объем памяти, занимаемый колонками"""
+        return sum(getattr(self, name).nbytes for name in _COLUMNS)
+
+    def command_at(self, row: int) -> MotionCommand:
+        """
+        Создание MotionCommand для строки буфера
+
+        Args:
+            row (int): Номер строки
+
+        Returns:
+            MotionCommand: Команда (целые значения восстанавливаются как int)
+        """
+        mask = int(self.int_mask[row])
+
+        def value(column, bit):
+            item = column[row]
+            if item != item:  # NaN - ось не задана
+                return None
+            return int(item) if mask & bit else float(item)
+
+        m_code = int(self.m_code[row])
+        comment = int(self.comment[row])
+        return MotionCommand(
+            command_type=KIND_CODES[self.kind[row]],
+            x=value(self.x, INT_X),
+            y=value(self.y, INT_Y),
+            z=value(self.z, INT_Z),
+            a=value(self.a, INT_A),
+            feed_rate=value(self.feed, INT_FEED),
+            m_code=m_code if m_code != NO_M_CODE else None,
+            pause_time=value(self.pause, INT_PAUSE),
+            comment=self.comments[comment] if comment != NO_COMMENT else None,
+        )
+
+    def to_commands(self) -> List[MotionCommand]:
+        """Материализация всех команд в список MotionCommand"""
+        return list(self)
+
+    def find_m_code(self, m_code: int) -> int:
+        """
+        Индекс первой M-команды с заданным номером
+
+        Args:
+            m_code (int): Номер M-кода
+
+        Returns:
+            int: Индекс строки или -1, если команда не найдена
+        """
+        rows = np.flatnonzero((self.kind == KIND_M_CODE) & (self.m_code == m_code))
+        return int(rows[0]) if rows.size else -1
+
+    def comment_mask(self, keywords: Sequence[str]) -> np.ndarray:
+        """
+        Маска строк, комментарий которых содержит одно из ключевых слов
+
+        Args:
+            keywords (Sequence[str]): Ключевые слова
+
+        Returns:
+            np.ndarray: Булева маска строк
+        """
+        matching = np.array([any(keyword in comment for keyword in keywords) for comment in self.comments] + [False])
+        return matching[self.comment]
@@ -0,0 +1,126 @@
+import gzip
+import io
+import lzma
+import os
+from typing import BinaryIO, List, Optional
+
+
+# Форматы сжатия файлов G-кода (значение - расширение файла)
+COMPRESSION_GZIP = 'gz'
+COMPRESSION_XZ = 'xz'
+COMPRESSIONS = (COMPRESSION_GZIP, COMPRESSION_XZ)
+
+# Уровень сжатия по умолчанию (gzip: 1-9, xz: 0-9)
+DEFAULT_LEVELS = {COMPRESSION_GZIP: 6, COMPRESSION_XZ: 6}
+LEVEL_RANGES = {COMPRESSION_GZIP: (1, 9), COMPRESSION_XZ: (0, 9)}
+
+# Сигнатуры форматов в начале файла
+_MAGIC = {COMPRESSION_GZIP: b'\x1f\x8b', COMPRESSION_XZ: b'\xfd7zXZ\x00'}
+
+
+def compression_from_path(path: str) -> Optional[str]:
+    """
+    Формат сжатия по расширению файла (.gz / .xz)
+
+    Args:
+        path (str): Путь к файлу
+
+    Returns:
+        Optional[str]: COMPRESSION_GZIP, COMPRESSION_XZ или None (без сжатия)
+    """
+    extension = os.path.splitext(path)[1].lower().lstrip('.')
+    return extension if extension in COMPRESSIONS else None
+
+
+def check_compression(compression: Optional[str], level: Optional[int] = None) -> Optional[int]:
+    """
+    Проверка формата и уровня сжатия
+
+    Args:
+        compression (Optional[str]): Формат сжатия (None - без сжатия)
+        level (Optional[int]): Уровень сжатия (None - по умолчанию)
+
+    Returns:
+        Optional[int]: Уровень сжатия (None, если сжатие не используется)
+    """
+    if compression is None:
+        return None
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Неизвестный формат сжатия: {compression} (допустимо: {', '.join(COMPRESSIONS)})")
+    if level is None:
+        return DEFAULT_LEVELS[compression]
+    low, high = LEVEL_RANGES[compression]
+    if not low <= level <= high:
+        raise ValueError(f"Уровень сжатия {compression} должен быть от {low} до {high}: {level}")
+    return level
+
+
+def open_compressed_writer(file: BinaryIO, compression: str, level: Optional[int] = None,
+                           name: str = '') -> BinaryIO:
+    """
+    Потоковый компрессор поверх открытого двоичного файла
+
+    Args:
+        file (BinaryIO): Файл, открытый на запись в двоичном режиме
+        compression (str): Формат сжатия
+        level (Optional[int]): Уровень сжатия (None - по умолчанию)
+        name (str): Имя исходного файла для заголовка gzip
+
+    Returns:
+        BinaryIO: Объект с методами write()/close() (файл при закрытии не закрывается)
+    """
+    level = check_compression(compression, level)
+    if compression == COMPRESSION_GZIP:
+        return gzip.GzipFile(filename=name, mode='wb', compresslevel=level, fileobj=file)
+    return lzma.LZMAFile(file, mode='wb', preset=level)
+
+
+def detect_compression(path: str) -> Optional[str]:
+    """
+    Формат сжатия по сигнатуре в начале файла
+
+    Args:
+        path (str): Путь к файлу
+
+    Returns:
+        Optional[str]: COMPRESSION_GZIP, COMPRESSION_XZ или None (обычный текст)
+    """
+    with open(path, 'rb') as file:
+        head = file.read(max(len(magic) for magic in _MAGIC.values()))
+    for compression, magic in _MAGIC.items():
+        if head.startswith(magic):
+            return compression
+    return None
+
+
+def open_gcode(path: str) -> io.TextIOBase:
+    """
+    Открытие файла G-кода на чтение: сжатые (.gz / .xz) и обычные файлы
+    читаются одинаково (формат определяется по содержимому)
+
+    Args:
+        path (str): Путь к файлу
+
+    Returns:
+        io.TextIOBase: Текстовый поток UTF-8
+    """
+    compression = detect_compression(path)
+    if compression == COMPRESSION_GZIP:
+        return gzip.open(path, 'rt', encoding='utf-8')
+    if compression == COMPRESSION_XZ:
+        return lzma.open(path, 'rt', encoding='utf-8')
+    return open(path, 'r', encoding='utf-8')
+
+
+def read_gcode_lines(path: str) -> List[str]:
+    """
+    Чтение строк файла G-кода (с переводами строк), в том числе сжатого
+
+    Args:
+        path (str): Путь к файлу
+
+    Returns:
+        List[str]: Строки файла
+    """
+    with open_gcode(path) as file:
+        return file.readlines()
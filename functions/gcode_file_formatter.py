@@ -1,8 +1,58 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Union
 from datetime import datetime
 
+import numpy as np
+
+from constants.const import GenerationConfig
 from functions.motion_commands import MotionCommand
+from functions.command_buffer import (
+    CommandBuffer, KIND_LINEAR_MOVE, KIND_M_CODE, KIND_PAUSE,
+    INT_X, INT_Y, INT_Z, INT_A
+)
 from functions.time_calc import time_prediction_motioncommand
+from functions.punch_array_engine import round_array
+
+Commands = Union[List[MotionCommand], CommandBuffer]
+
+# Форматы строк G-кода
+GCODE_MODE_FULL = 'full'         # Все заданные слова в каждой строке
+GCODE_MODE_COMPACT = 'compact'   # Модальные слова (G01, X, Y, Z, A, F) только при изменении
+GCODE_MODES = (GCODE_MODE_FULL, GCODE_MODE_COMPACT)
+
+
+# Дробные части "десятичных" слов: индекс - тысячные доли (как печатает repr(round(v, 3)))
+_FRACTIONS = np.array(["." + (f"{millis:03d}".rstrip("0") or "0") for millis in range(1000)], dtype=object)
+
+# Нечетные множители для хэша колонок при группировке строк
+_HASH_FACTORS = tuple(np.uint64(factor) for factor in (
+    0x9E3779B97F4A7C15, 0xBF58476D1CE4E5B9, 0x94D049BB133111EB,
+    0xD6E8FEB86659FD93, 0xA0761D6478BD642F, 0xE7037ED1A0B428DB))
+
+
+class _WordCache(dict):
+    """
+    Кэш слов G-кода по значению координаты.
+    Отсутствующий ключ форматируется по правилам MotionCommand.to_gcode_string.
+    """
+
+    def __init__(self, letter: str, kind: str):
+        super().__init__()
+        self.letter = letter
+        self.kind = kind
+        self[float('inf')] = ""  # ось не задана
+
+    def __missing__(self, value: float) -> str:
+        if self.kind == 'feed':
+            word = f" {self.letter}{int(value)}"
+        elif self.kind == 'int':
+            word = f" {self.letter}{round(int(value), 3)}"
+        else:
+            word = f" {self.letter}{round(value, 3)}"
+            if value == 0:
+                # 0.0 и -0.0 - один ключ словаря, но печатаются по-разному
+                return word
+        self[value] = word
+        return word
 
 
 class GCodeFileFormatter:
@@ -10,6 +60,15 @@ class GCodeFileFormatter:
     Класс для форматирования команд в текстовый файл G-кода с заголовками и комментариями
     """
 
+    # Максимальный размер кэша слов для одной оси (уникальные X не копятся бесконечно)
+    WORD_CACHE_LIMIT = 200_000
+
+    # Максимальная целая часть значения для табличного форматирования X и A
+    DECIMAL_TABLE_LIMIT = 100_000
+
+    # Колонка CommandBuffer и бит int_mask для буквы адреса (column_words)
+    _COLUMN_WORDS = {"X": ('x', INT_X), "Y": ('y', INT_Y), "Z": ('z', INT_Z), "A": ('a', INT_A), "F": ('feed', None)}
+
     def __init__(self, params_dict: dict):
         """
         Инициализация форматировщика
@@ -18,49 +77,101 @@ class GCodeFileFormatter:
             params_dict (dict): Словарь параметров пробития
         """
         self.params = params_dict
+        self._word_caches = {}
+        self._integer_tables = {}
 
-    def format_to_lines(self, commands: List[MotionCommand],
+        mode = params_dict.get('gcode_mode', GenerationConfig.GCODE_MODE)
+        if mode not in GCODE_MODES:
+            raise ValueError(f"Неизвестный формат G-кода: {mode} (допустимо: {', '.join(GCODE_MODES)})")
+        self.compact = mode == GCODE_MODE_COMPACT
+        self.comments = bool(params_dict.get('gcode_comments', GenerationConfig.GCODE_COMMENTS))
+        # Байт сэкономлено относительно полного формата с комментариями (без переводов строк)
+        self.saved_bytes = 0
+
+    def format_to_lines(self, commands: Commands,
                        generation_stats: dict,
                        function_name: str = "generate_command_lines") -> List[str]:
         """
         Форматирование команд в список строк для файла
 
         Args:
-            commands (List[MotionCommand]): Список команд
+            commands (Commands): Список команд или буфер команд
             generation_stats (dict): Статистика генерации
             function_name (str): Имя функции для заголовка
 
         Returns:
             List[str]: Список строк файла с переносами строк
         """
-        lines = []
-
         # Добавляем информационный заголовок
         header_lines = self._generate_header(generation_stats, function_name, commands)
-        lines.extend(header_lines)
+        lines = [line + '\n' for line in header_lines]
 
-        # Добавляем команды
-        command_lines = self._format_commands(commands)
-        lines.extend(command_lines)
+        # Добавляем команды (сразу с переносами строк)
+        lines.extend(self._format_commands(commands, line_end='\n'))
+        return lines
 
-        # Добавляем переносы строк
-        return [line + '\n' for line in lines]
+    def format_batches_to_lines(self, batches: List[CommandBuffer], generation_stats: dict,
+                                function_name: str = "generate_command_lines") -> List[str]:
+        """
+        Форматирование программы, заданной батчами-оборотами, в список строк для файла.
+        Каждый батч форматируется отдельно (как при потоковой записи), поэтому
+        в компактном формате результат совпадает с файлом generate_gcode_file.
 
-    def _generate_header(self, stats: dict, function_name: str, commands: List[MotionCommand]) -> List[str]:
-        """Генерация информационного заголовка"""
-        comment_symbol = ';'
+        Args:
+            batches (List[CommandBuffer]): Батчи в порядке выполнения
+            generation_stats (dict): Статистика генерации
+            function_name (str): Имя функции для заголовка
 
+        Returns:
+            List[str]: Список строк файла с переносами строк
+        """
+        header_lines = self._generate_header(generation_stats, function_name, CommandBuffer.concatenate(batches))
+        lines = [line + '\n' for line in header_lines]
+        for batch in batches:
+            lines.extend(self._format_commands(batch, line_end='\n'))
+        return lines
+
+    def _generate_header(self, stats: dict, function_name: str, commands: Commands) -> List[str]:
+        """Генерация информационного заголовка"""
         # Используем оптимизированную функцию для расчета времени
         time_data = time_prediction_motioncommand(commands)
+        return self.format_header(stats, function_name, time_data)
+
+    def format_header(self, stats: dict, function_name: str, time_data: list,
+                      field_width: Optional[int] = None) -> List[str]:
+        """
+        Формирование строк информационного заголовка по готовым данным о времени
+
+        Args:
+            stats (dict): Статистика генерации
+            function_name (str): Имя функции для заголовка
+            time_data (list): Время выполнения в формате time_prediction_motioncommand
+            field_width (Optional[int]): Если задано, строки с вычисляемыми значениями
+                                         (время и число пробитий) дополняются пробелами
+                                         до field_width байт в UTF-8. Используется для
+                                         дозаписи заголовка поверх зарезервированного места.
+
+        Returns:
+            List[str]: Строки заголовка (без переносов строк)
+        """
+        comment_symbol = ';'
+
+        def field(line: str) -> str:
+            if field_width is None:
+                return line
+            padding = field_width - len((comment_symbol + line).encode('utf-8'))
+            if padding < 0:
+                raise ValueError(f"Строка заголовка длиннее {field_width} байт: {line}")
+            return line + ' ' * padding
 
         info_lines = [
             'G-code has been generated based on ',
             f'"{function_name}" function',
             f'at {datetime.now().strftime("%d/%m/%Y %H:%M:%S")}',
             '-' * 50,
-            f'Part 1 => {time_data[0][0]} ({time_data[0][1]})',
-            f'Part 2 => {time_data[1][0]} ({time_data[1][1]})',
-            f'Total => {time_data[2][0]} ({time_data[2][1]})',
+            field(f'Part 1 => {time_data[0][0]} ({time_data[0][1]})'),
+            field(f'Part 2 => {time_data[1][0]} ({time_data[1][1]})'),
+            field(f'Total => {time_data[2][0]} ({time_data[2][1]})'),
             '-' * 50,
             'Generation parameters:',
             f'Tube length => {self.params["tube_len"]}',
@@ -78,32 +189,400 @@ class GCodeFileFormatter:
             f'Idling speed => {self.params["idling_speed"]}',
             f'Move_speed => {self.params["move_speed"]}',
             f'Rotate_speed => {self.params["rotate_speed"]}',
+        ] + self._format_mode_lines() + [
             '-' * 50,
             'Additional calculated parameters:',
             f'Calculated diameter => {stats["calculated_o_diam"]}',
             f'Main rotation number => {stats["main_rotation_num"]}',
             f'Fabric length => {round(stats["total_fabric_len"])}',
-            f'Total punch number => {stats["total_punches"]}',
+            field(f'Total punch number => {stats["total_punches"]}'),
             f'Seed for random => {stats["random_seed"]}',
             '#' * 50
         ]
 
         return [comment_symbol + line for line in info_lines]
 
-    def _format_commands(self, commands: List[MotionCommand]) -> List[str]:
+    def format_mode(self) -> str:
+        """Описание формата строк G-кода (например, "compact, no comments")"""
+        mode = GCODE_MODE_COMPACT if self.compact else GCODE_MODE_FULL
+        return mode + ('' if self.comments else ', no comments')
+
+    def _format_mode_lines(self) -> List[str]:
+        """Строка заголовка с форматом G-кода (только если он отличается от полного с комментариями)"""
+        if not self.compact and self.comments:
+            return []
+        return [f'G-code format => {self.format_mode()}']
+
+    def format_savings(self, saved_bytes: int, text_bytes: int, command_lines: int) -> str:
+        """
+        Сводка экономии компактного формата / формата без комментариев
+
+        Args:
+            saved_bytes (int): Байт сэкономлено относительно полного формата
+            text_bytes (int): Размер записанного текста в байтах
+            command_lines (int): Количество строк команд
+
+        Returns:
+            str: Строка отчета
+        """
+        full_bytes = text_bytes + saved_bytes
+        share = saved_bytes / full_bytes * 100 if full_bytes else 0.0
+        per_line = saved_bytes / command_lines if command_lines else 0.0
+        return (f"Формат G-кода {self.format_mode()}: {text_bytes / 2 ** 20:.2f} МБ "
+                f"вместо {full_bytes / 2 ** 20:.2f} МБ (-{share:.1f}%, {per_line:.1f} байт на строку), "
+                f"строк {command_lines} (количество строк не меняется)")
+
+    def format_commands(self, commands: Commands, line_end: str = "") -> List[str]:
+        """
+        Форматирование команд (например, одного батча) в строки G-кода без заголовка
+
+        Args:
+            commands (Commands): Список команд или буфер команд
+            line_end (str): Окончание каждой строки (например, '\n' для записи в файл)
+
+        Returns:
+            List[str]: Строки G-кода
+        """
+        return self._format_commands(commands, line_end)
+
+    def _format_commands(self, commands: Commands, line_end: str = "") -> List[str]:
         """Форматирование команд в строки G-кода"""
-        return [command.to_gcode_string() for command in commands]
+        if isinstance(commands, CommandBuffer):
+            return self._format_buffer(commands, line_end)
+        if self.compact or not self.comments:
+            return self._format_buffer(CommandBuffer.from_commands(commands), line_end)
+        return [command.to_gcode_string() + line_end for command in commands]
+
+    def format_block(self, commands: Commands, line_end: str = "\n") -> str:
+        """
+        Форматирование команд в единый текстовый блок (для записи в файл батчами).
+        Для буфера строки не создаются по отдельности: части строк склеиваются одним join.
+
+        Args:
+            commands (Commands): Список команд или буфер команд
+            line_end (str): Окончание каждой строки
+
+        Returns:
+            str: Текст команд (каждая строка завершается line_end)
+        """
+        if not isinstance(commands, CommandBuffer):
+            return "".join(self._format_commands(commands, line_end))
+        if len(commands) == 0:
+            return ""
+        if self.compact:
+            return "".join(self._compact_lines(commands, line_end))
+
+        heads, rests = self._buffer_pieces(commands, line_end)
+        pieces = np.empty(2 * len(heads), dtype=object)
+        pieces[0::2] = heads
+        pieces[1::2] = rests
+        return "".join(pieces.tolist())
+
+    def _format_buffer(self, buffer: CommandBuffer, line_end: str = "") -> List[str]:
+        """Пакетное форматирование колонок буфера в строки G-кода"""
+        if len(buffer) == 0:
+            return []
+        if self.compact:
+            return self._compact_lines(buffer, line_end)
+        heads, rests = self._buffer_pieces(buffer, line_end)
+        return list(map(str.__add__, heads.tolist(), rests.tolist()))
+
+    def _buffer_pieces(self, buffer: CommandBuffer, line_end: str):
+        """
+        Части строк буфера: начало "G01 X..." и остальные слова с окончанием строки.
+
+        Слова Y, Z, F и комментарий повторяются для всех команд одной роли
+        в пределах слоя, поэтому строки группируются по этим значениям и каждая
+        группа форматируется один раз. X форматируется один раз на серию
+        одинаковых значений (тройка подход/внедрение/извлечение), A - только
+        для команд поворота. Правила совпадают с MotionCommand.to_gcode_string.
+
+        Returns:
+            tuple: (начала строк, окончания строк) - массивы dtype=object
+        """
+        heads = self._head_words(buffer)
+
+        groups, first_rows = self._group_rows(buffer)
+        comments = self._comment_words(buffer)
+        if not self.comments:
+            self.saved_bytes += self._comment_bytes(buffer)
+            comments = [""] * len(comments)
+
+        middles, tails = [], []
+        for row in first_rows.tolist():
+            middle, tail = self._row_words(buffer, row, comments)
+            middles.append(middle)
+            tails.append(tail + line_end)
+        middles = np.array(middles, dtype=object)
+        tails = np.array(tails, dtype=object)
+
+        rests = (middles + tails)[groups]
+        rotate_rows = np.flatnonzero(~np.isnan(buffer.a))
+        if rotate_rows.size:
+            a_words = self._axis_words(buffer.a[rotate_rows], buffer.int_mask[rotate_rows], INT_A, "A")
+            rests[rotate_rows] = [middle + word + tail for middle, word, tail in
+                                  zip(middles[groups[rotate_rows]].tolist(), a_words,
+                                      tails[groups[rotate_rows]].tolist())]
+
+        # M-коды и паузы (единичные команды) форматируются построчно
+        for row in np.flatnonzero(buffer.kind != KIND_LINEAR_MOVE).tolist():
+            heads[row] = self._single_line(buffer, row)
+            rests[row] = line_end
+
+        return heads, rests
+
+    def _compact_lines(self, buffer: CommandBuffer, line_end: str) -> List[str]:
+        """
+        Строки компактного G-кода: модальные слова печатаются только при изменении.
+
+        Слово оси или подачи пропускается, если его текст совпадает с последним
+        напечатанным словом той же буквы, G01 - если предыдущая строка тоже G01.
+        Модальное состояние сбрасывается в начале каждого буфера (оборота): первая
+        строка оборота содержит все заданные слова, поэтому обороты можно форматировать
+        независимо (параллельная генерация, запись частями). Количество строк
+        не меняется; строка без изменившихся слов печатается как "G01".
+
+        Returns:
+            List[str]: Строки G-кода с окончанием line_end
+        """
+        linear = buffer.kind == KIND_LINEAR_MOVE
+        words = np.full(len(buffer), "", dtype=object)
+        full_length = 3 * int(linear.sum())  # "G01" в каждой строке полного формата
+
+        for letter, column in (("X", buffer.x), ("Y", buffer.y), ("Z", buffer.z), ("A", buffer.a), ("F", buffer.feed)):
+            rows = np.flatnonzero(linear & ~np.isnan(column))
+            if rows.size == 0:
+                continue
+            column_words = self.column_words(buffer, rows, letter)
+            full_length += sum(map(len, column_words))
+            column_words = np.array(column_words, dtype=object)
+            changed = np.ones(rows.size, dtype=bool)
+            changed[1:] = column_words[1:] != column_words[:-1]
+            words[rows[changed]] += column_words[changed]
+
+        # G01 в первой строке после не-G01 (начало буфера, M-код, пауза) и в строках без слов
+        motion = linear.copy()
+        motion[1:] &= ~linear[:-1]
+        motion |= linear & (words == "")
+        words[motion] = "G01" + words[motion]
+        plain = np.flatnonzero(linear & ~motion)
+        words[plain] = [word[1:] for word in words[plain].tolist()]
+
+        for row in np.flatnonzero(~linear).tolist():
+            words[row] = self._single_line(buffer, row)
+            full_length += len(words[row])
+
+        comment_bytes = self._comment_bytes(buffer)
+        compact_length = sum(map(len, words.tolist()))
+        if self.comments:
+            comments = np.array(self._comment_words(buffer), dtype=object)
+            words += comments[buffer.comment]
+            compact_length += comment_bytes
+        self.saved_bytes += full_length + comment_bytes - compact_length
+
+        return (words + line_end).tolist()
+
+    def _single_line(self, buffer: CommandBuffer, row: int) -> str:
+        """Строка M-кода или паузы (комментарий - только если комментарии включены)"""
+        command = buffer.command_at(row)
+        if not self.comments or self.compact:
+            command.comment = None
+        return command.to_gcode_string()
+
+    @staticmethod
+    def _comment_words(buffer: CommandBuffer) -> List[str]:
+        """Окончания строк с комментариями по таблице буфера (последний элемент - без комментария)"""
+        return [f" ; {comment}" if comment else "" for comment in buffer.comments] + [""]
+
+    @staticmethod
+    def _comment_bytes(buffer: CommandBuffer) -> int:
+        """Размер комментариев всех строк буфера в байтах UTF-8"""
+        sizes = np.array([len(f" ; {comment}".encode('utf-8')) if comment else 0
+                          for comment in buffer.comments] + [0], dtype=np.int64)
+        return int(sizes[buffer.comment].sum())
+
+    def _head_words(self, buffer: CommandBuffer) -> np.ndarray:
+        """Начало строки "G01 X..." (X форматируется один раз на серию повторов)"""
+        x = buffer.x
+        x_int = (buffer.int_mask & INT_X) != 0
+        present = ~np.isnan(x)
+
+        # начало серии: значение или его "целость" отличается от предыдущей строки
+        starts = present.copy()
+        starts[1:] &= ~((x[1:] == x[:-1]) & (x_int[1:] == x_int[:-1])
+                        & (np.signbit(x[1:]) == np.signbit(x[:-1])))
+
+        start_rows = np.flatnonzero(starts)
+        words = np.empty(start_rows.size + 1, dtype=object)
+        words[0] = "G01"
+        if not x_int[start_rows].any():
+            words[1:] = self._decimal_words(x[start_rows], "G01 X")
+        else:
+            words[1:] = ["G01" + word for word in
+                         self._axis_words(x[start_rows], buffer.int_mask[start_rows], INT_X, "X")]
+
+        series = np.zeros(len(x), dtype=np.int64)
+        series[start_rows] = np.arange(1, start_rows.size + 1)
+        series = np.maximum.accumulate(series)
+        series[~present] = 0
+        return words[series]
+
+    def _group_rows(self, buffer: CommandBuffer):
+        """
+        Группировка строк по словам Y, Z, F, комментарию, битам целых и наличию A
+
+        Returns:
+            tuple: (номер группы для каждой строки, первая строка каждой группы)
+        """
+        columns = [self._float_bits(buffer.y), self._float_bits(buffer.z), self._float_bits(buffer.feed),
+                   buffer.comment.astype(np.uint64), buffer.int_mask.astype(np.uint64),
+                   np.isnan(buffer.a).astype(np.uint64)]
+
+        # быстрая группировка по хэшу с последующей проверкой точного совпадения
+        key = np.zeros(len(buffer), dtype=np.uint64)
+        for column, factor in zip(columns, _HASH_FACTORS):
+            key = key * factor + column
+        _, first_rows, groups = np.unique(key, return_index=True, return_inverse=True)
+        groups = groups.reshape(-1)
+
+        representative = first_rows[groups]
+        if not all(np.array_equal(column, column[representative]) for column in columns):
+            _, first_rows, groups = np.unique(np.stack(columns, axis=1), axis=0,
+                                              return_index=True, return_inverse=True)
+            groups = groups.reshape(-1)
+
+        return groups, first_rows
+
+    @staticmethod
+    def _float_bits(column: np.ndarray) -> np.ndarray:
+        """Битовое представление float64 (все NaN приводятся к одному значению, -0.0 != 0.0)"""
+        return np.where(np.isnan(column), np.nan, column).view(np.uint64)
+
+    def _row_words(self, buffer: CommandBuffer, row: int, comments: List[str]):
+        """
+        Слова строки группы (с кэшированием): (" Y.. Z..", " F.. ; комментарий")
+        """
+        mask = int(buffer.int_mask[row])
+        y_words = self._word_cache("Y", 'int' if mask & INT_Y else 'float')
+        z_words = self._word_cache("Z", 'int' if mask & INT_Z else 'float')
+        middle = y_words[self._cache_key(buffer.y[row])] + z_words[self._cache_key(buffer.z[row])]
+        tail = self._word_cache("F", 'feed')[self._cache_key(buffer.feed[row])] + comments[buffer.comment[row]]
+        return middle, tail
+
+    def column_words(self, buffer: CommandBuffer, rows: np.ndarray, letter: str) -> List[str]:
+        """
+        Слова G-кода колонки буфера для выбранных строк - те же, что в строках программы
+
+        Args:
+            buffer (CommandBuffer): Буфер команд
+            rows (np.ndarray): Номера строк буфера
+            letter (str): Буква адреса ("X", "Y", "Z", "A" или "F")
+
+        Returns:
+            List[str]: Слова для каждой строки (с ведущим пробелом, пустая строка - значение не задано)
+        """
+        name, bit = self._COLUMN_WORDS[letter]
+        column = getattr(buffer, name)[rows]
+        if bit is None:
+            cache = self._word_cache(letter, 'feed')
+            return [cache[self._cache_key(value)] for value in column.tolist()]
+        return self._axis_words(column, buffer.int_mask[rows], bit, letter)
+
+    @staticmethod
+    def _cache_key(value) -> float:
+        """Ключ кэша слов: NaN (ось не задана) заменяется на inf"""
+        value = float(value)
+        return float('inf') if value != value else value
+
+    def _axis_words(self, column: np.ndarray, int_mask: np.ndarray, bit: int,
+                    letter: str) -> List[str]:
+        """
+        Слова G-кода для колонки (с ведущим пробелом, пустая строка для незаданной оси)
+
+        Args:
+            column (np.ndarray): Значения колонки (NaN - ось не задана)
+            int_mask (np.ndarray): Колонка int_mask для тех же строк
+            bit (int): Бит колонки в int_mask
+            letter (str): Буква адреса оси
+
+        Returns:
+            List[str]: Слова для каждой строки
+        """
+        # NaN не может быть ключом словаря: заменяем на inf (пустое слово)
+        values = np.where(np.isnan(column), np.inf, column).tolist()
 
-    def count_command_statistics(self, commands: List[MotionCommand]) -> Dict[str, int]:
+        is_int = (int_mask & bit) != 0
+        if not is_int.any():
+            if not np.isnan(column).any():
+                return self._decimal_words(column, f" {letter}")
+            return list(map(self._word_cache(letter, 'float').__getitem__, values))
+        if is_int.all():
+            return list(map(self._word_cache(letter, 'int').__getitem__, values))
+
+        float_words = self._word_cache(letter, 'float')
+        int_words = self._word_cache(letter, 'int')
+        return [int_words[value] if flag else float_words[value]
+                for value, flag in zip(values, is_int.tolist())]
+
+    def _decimal_words(self, values: np.ndarray, prefix: str) -> List[str]:
+        """
+        Слова prefix + str(round(v, 3)) для заданных float-значений.
+
+        Округленное до тысячных значение печатается как целая часть и не более
+        трех знаков дроби без хвостовых нулей, поэтому слово собирается из
+        двух таблиц (целые части и дроби) без форматирования каждого числа.
+
+        Args:
+            values (np.ndarray): Значения (без NaN)
+            prefix (str): Начало слова (например, " A" или "G01 X")
+
+        Returns:
+            List[str]: Слова для каждого значения
+        """
+        rounded = round_array(values, 3)
+        magnitude = np.abs(rounded)
+        if magnitude.size == 0:
+            return []
+        if not np.isfinite(magnitude).all() or magnitude.max() >= self.DECIMAL_TABLE_LIMIT:
+            return [f"{prefix}{value}" for value in rounded.tolist()]
+
+        whole, millis = np.divmod(np.rint(magnitude * 1000).astype(np.int64), 1000)
+        positive, negative = self._integer_table(prefix, int(whole.max()) + 1)
+        heads = np.where(np.signbit(rounded), negative[whole], positive[whole])
+        return (heads + _FRACTIONS[millis]).tolist()
+
+    def _integer_table(self, prefix: str, size: int):
+        """Таблицы слов prefix + целая часть (для положительных и отрицательных значений)"""
+        tables = self._integer_tables.get(prefix)
+        if tables is None or len(tables[0]) < size:
+            size = max(size, 1024)
+            tables = (np.array([f"{prefix}{value}" for value in range(size)], dtype=object),
+                      np.array([f"{prefix}-{value}" for value in range(size)], dtype=object))
+            self._integer_tables[prefix] = tables
+        return tables
+
+    def _word_cache(self, letter: str, kind: str) -> '_WordCache':
+        """Кэш отформатированных слов для оси (общий для всех батчей форматировщика)"""
+        key = (letter, kind)
+        cache = self._word_caches.get(key)
+        if cache is None or len(cache) > self.WORD_CACHE_LIMIT:
+            cache = _WordCache(letter, kind)
+            self._word_caches[key] = cache
+        return cache
+
+    def count_command_statistics(self, commands: Commands) -> Dict[str, int]:
         """
         Подсчет статистики команд
 
         Args:
-            commands (List[MotionCommand]): Список команд
+            commands (Commands): Список команд или буфер команд
 
         Returns:
             Dict[str, int]: Статистика команд
         """
+        if isinstance(commands, CommandBuffer):
+            return self._count_buffer_statistics(commands)
+
         stats = {
             'total_commands': len(commands),
             'linear_moves': 0,
@@ -138,12 +617,28 @@ class GCodeFileFormatter:
 
         return stats
 
-    def format_statistics_summary(self, commands: List[MotionCommand]) -> List[str]:
+    def _count_buffer_statistics(self, buffer: CommandBuffer) -> Dict[str, int]:
+        """Подсчет статистики команд по колонкам буфера"""
+        linear = buffer.kind == KIND_LINEAR_MOVE
+        rotations = (linear & ~np.isnan(buffer.a) & np.isnan(buffer.x) &
+                     np.isnan(buffer.y) & np.isnan(buffer.z))
+        punch_moves = linear & buffer.comment_mask(["Подход", "Внедрение игл", "Извлечение игл"])
+
+        return {
+            'total_commands': len(buffer),
+            'linear_moves': int(linear.sum()),
+            'rotations': int(rotations.sum()),
+            'm_codes': int((buffer.kind == KIND_M_CODE).sum()),
+            'pauses': int((buffer.kind == KIND_PAUSE).sum()),
+            'punch_sequences': int(punch_moves.sum()) // 3
+        }
+
+    def format_statistics_summary(self, commands: Commands) -> List[str]:
         """
         Форматирование сводки статистики команд
 
         Args:
-            commands (List[MotionCommand]): Список команд
+            commands (Commands): Список команд или буфер команд
 
         Returns:
             List[str]: Строки со статистикой
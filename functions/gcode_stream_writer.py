@@ -0,0 +1,208 @@
+from dataclasses import dataclass
+from typing import Iterable, Optional, Union, List, Tuple
+
+import numpy as np
+
+from functions.motion_commands import MotionCommand, PunchCommands
+from functions.command_buffer import CommandBuffer
+from functions.gcode_file_formatter import GCodeFileFormatter
+from functions.time_calc import MotionTimeAccumulator, buffer_move_times
+from functions.bulk_writer import BulkFileWriter
+from functions.layer_plan import LayerPlan
+from functions.tube_command_generator import TubeCommandGenerator
+
+
+@dataclass
+class FormattedBatch:
+    """
+    Батч, отформатированный заранее (например, в другом процессе).
+
+    Attributes:
+        text (Union[str, bytes]): Текст команд (строки с переносами, str или UTF-8)
+        command_lines (int): Количество строк
+        punches (int): Количество пробитий
+        move_times (np.ndarray): Время каждой команды в секундах
+        position (Tuple): Позиция (x, y, z, a) после батча
+        saved_bytes (int): Байт сэкономлено компактным форматом / без комментариев
+    """
+    text: Union[str, bytes]
+    command_lines: int
+    punches: int
+    move_times: np.ndarray
+    position: Tuple[float, float, float, float]
+    saved_bytes: int = 0
+
+    @classmethod
+    def from_buffer(cls, buffer: CommandBuffer, formatter: GCodeFileFormatter,
+                    position: Tuple[float, float, float, float],
+                    revolutions: Optional[List[CommandBuffer]] = None) -> 'FormattedBatch':
+        """
+        Форматирование буфера и расчет времени его команд
+
+        Args:
+            buffer (CommandBuffer): Команды батча (без M110)
+            formatter (GCodeFileFormatter): Форматировщик
+            position (Tuple): Позиция перед батчем
+            revolutions (Optional[List[CommandBuffer]]): Обороты, из которых состоит буфер.
+                Если заданы, каждый оборот форматируется отдельно (как при потоковой записи)
+
+        Returns:
+            FormattedBatch: Отформатированный батч
+        """
+        move_times, end_position = buffer_move_times(buffer, position)
+        saved_bytes = formatter.saved_bytes
+        if revolutions is None:
+            text = formatter.format_block(buffer)
+        else:
+            text = "".join(formatter.format_block(revolution) for revolution in revolutions)
+        return cls(
+            text=text,
+            command_lines=len(buffer),
+            punches=_count_punches(buffer),
+            move_times=np.array(move_times, dtype=np.float64),
+            position=end_position,
+            saved_bytes=formatter.saved_bytes - saved_bytes,
+        )
+
+
+def scan_program(params_dict: dict) -> dict:
+    """
+    Проход только по времени и пробитиям для заголовка, который нельзя перезаписать
+    (сжатый файл): обороты генерируются без форматирования, время накапливается
+    MotionTimeAccumulator, количество пробитий берется из плана слоев
+
+    Args:
+        params_dict (dict): Словарь параметров пробития
+
+    Returns:
+        dict: Сводка (time_data, punches), как у GCodeStreamWriter.write
+    """
+    accumulator = MotionTimeAccumulator()
+    for batch in TubeCommandGenerator(params_dict).iter_revolution_batches():
+        accumulator.add(batch)
+    return {
+        'time_data': accumulator.result(),
+        'punches': LayerPlan.for_params(params_dict).total_punches,
+    }
+
+
+def _count_punches(buffer: CommandBuffer) -> int:
+    """Количество пробитий в буфере (по командам подхода)"""
+    return int(buffer.comment_mask([PunchCommands.APPROACH_COMMENT]).sum())
+
+
+class GCodeStreamWriter:
+    """
+    Потоковая запись G-кода в файл.
+
+    Заголовок записывается заранее с зарезервированными полями фиксированной ширины,
+    затем команды записываются батчами по мере генерации, а время выполнения (Part 1 /
+    Part 2) и количество пробитий накапливаются на лету. В конце заголовок
+    перезаписывается поверх зарезервированного места. Объем памяти не зависит
+    от длины программы: в памяти находится только текущий батч.
+    Файл пишется блоками через BulkFileWriter во временный файл и появляется
+    под целевым именем только после успешного завершения записи.
+    """
+
+    # Ширина (в байтах UTF-8) строк заголовка с вычисляемыми значениями
+    HEADER_FIELD_WIDTH = 64
+
+    # Значения-заполнители для резервирования заголовка
+    _EMPTY_TIME_DATA = [["", 0], ["", 0], ["", 0]]
+
+    def __init__(self, params_dict: dict):
+        """
+        Инициализация потокового писателя
+
+        Args:
+            params_dict (dict): Словарь параметров пробития
+        """
+        self.params = params_dict
+        self.formatter = GCodeFileFormatter(params_dict)
+
+    def write(self, batches: Iterable[Union[List[MotionCommand], CommandBuffer, FormattedBatch]],
+              generation_stats: dict, path: str,
+              function_name: str = "generate_gcode_file",
+              compression: Optional[str] = None, level: Optional[int] = None,
+              precomputed: Optional[dict] = None) -> dict:
+        """
+        Запись программы в файл по батчам команд.
+        При сжатии блоки сразу сжимаются (несжатый файл не создается), а заголовок
+        сжатого потока нельзя перезаписать, поэтому он записывается сразу окончательным
+        по сводке предварительного прохода (scan_program); после записи сводка
+        сверяется с фактической.
+
+        Args:
+            batches (Iterable): Батчи команд в порядке выполнения
+                                (например, TubeCommandGenerator.iter_revolution_batches())
+                                или заранее отформатированные батчи FormattedBatch
+            generation_stats (dict): Статистика генерации для заголовка
+            path (str): Путь к файлу
+            function_name (str): Имя функции для заголовка
+            compression (Optional[str]): Сжатие файла ('gz', 'xz' или None)
+            level (Optional[int]): Уровень сжатия
+            precomputed (Optional[dict]): Сводка предварительного прохода (scan_program);
+                                          обязательна при сжатии
+
+        Returns:
+            dict: Сводка записи (time_data, command_lines, punches, text_bytes - размер текста
+                  без сжатия, saved_bytes - экономия компактного формата / без комментариев)
+        """
+        if compression is not None and precomputed is None:
+            raise ValueError("Для записи со сжатием нужна сводка предварительного прохода (scan_program)")
+
+        accumulator = MotionTimeAccumulator()
+        punches = 0
+        command_lines = 0
+        saved_bytes = self.formatter.saved_bytes
+        if precomputed is not None:
+            stats = dict(generation_stats, total_punches=precomputed['punches'])
+            header = self._format_header(stats, function_name, precomputed['time_data'])
+        else:
+            header = self._format_header(generation_stats, function_name, self._EMPTY_TIME_DATA)
+
+        with BulkFileWriter(path, atomic=True, compression=compression, level=level) as file:
+            file.write(''.join(line + '\n' for line in header))
+
+            for batch in batches:
+                if isinstance(batch, FormattedBatch):
+                    accumulator.add_move_times(batch.move_times, batch.position)
+                    punches += batch.punches
+                    command_lines += batch.command_lines
+                    saved_bytes -= batch.saved_bytes
+                    file.write(batch.text)
+                    continue
+
+                if not isinstance(batch, CommandBuffer):
+                    batch = CommandBuffer.from_commands(batch)
+
+                accumulator.add(batch)
+                punches += _count_punches(batch)
+                command_lines += len(batch)
+                file.write(self.formatter.format_block(batch))
+
+            time_data = accumulator.result()
+            if precomputed is not None:
+                # Заголовок уже записан: сводка записи должна совпасть с предварительной
+                if (time_data, punches) != (precomputed['time_data'], precomputed['punches']):
+                    raise RuntimeError("Время или количество пробитий не совпадает с предварительным расчетом")
+            else:
+                stats = dict(generation_stats, total_punches=punches)
+                final_header = self._format_header(stats, function_name, time_data)
+
+                # Перезапись заголовка поверх зарезервированного места (та же длина в байтах)
+                file.overwrite(0, ''.join(line + '\n' for line in final_header))
+            text_bytes = file.bytes_written
+
+        return {
+            'time_data': time_data,
+            'command_lines': command_lines,
+            'punches': punches,
+            'text_bytes': text_bytes,
+            'saved_bytes': self.formatter.saved_bytes - saved_bytes,
+        }
+
+    def _format_header(self, stats: dict, function_name: str, time_data: list) -> List[str]:
+        """Заголовок с полями фиксированной ширины"""
+        return self.formatter.format_header(stats, function_name, time_data,
+                                            field_width=self.HEADER_FIELD_WIDTH)
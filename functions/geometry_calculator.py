@@ -1,5 +1,5 @@
-import math as m
 from constants.const import GenerationConfig
+from functions.layer_plan import LayerPlan
 
 
 class GeometryCalculator:
@@ -16,6 +16,11 @@ class GeometryCalculator:
         self.config = GenerationConfig()
         self.diam_coef = self.config.VOLUMETRIC_DENSITY_MAP[params_dict['volumetric_density']]
 
+    @property
+    def layer_plan(self) -> LayerPlan:
+        """План слоев, общий с генератором команд"""
+        return LayerPlan.for_params(self.params)
+
     def calculate_rotation_parameters(self):
         """
         Расчет параметров намотки и оборотов
@@ -23,17 +28,10 @@ class GeometryCalculator:
         Returns:
             tuple: (основные_обороты, общие_обороты, расчетный_внешний_диаметр)
         """
-        diam_diff = self.params['o_diam'] - self.params['i_diam']
-        ideal_rotation_num = diam_diff / (self.params['fabric_thickness'] * 2)
-
-        rotation_delta = m.floor(ideal_rotation_num) % self.diam_coef
-        if rotation_delta:
-            main_rotation_num = m.floor(ideal_rotation_num) + self.diam_coef - rotation_delta
-        else:
-            main_rotation_num = m.floor(ideal_rotation_num)
+        main_rotation_num = self.layer_plan.main_revolutions
 
         calculated_o_diam = self.params['i_diam'] + main_rotation_num * self.params['fabric_thickness'] * 2
-        total_rotation_num = main_rotation_num + self.config.EXTRA_ROTATIONS
+        total_rotation_num = main_rotation_num + self.layer_plan.extra_revolutions
 
         return main_rotation_num, total_rotation_num, calculated_o_diam
 
@@ -47,40 +45,29 @@ class GeometryCalculator:
         Returns:
             tuple: (диаметр_текущего_слоя, длина_окружности, количество_шагов, размер_шага)
         """
-        current_diameter = self.params['i_diam'] + 2 * self.params['fabric_thickness'] * layer_idx
-        circle_len = m.pi * current_diameter
-
-        ideal_steps = circle_len / self.params['punch_step_r']
-        steps_num_less = max(2, 2 * m.floor(ideal_steps / 2))
-        steps_num_more = max(2, 2 * m.ceil(ideal_steps / 2))
-
-        steps_num_final = min((steps_num_less, steps_num_more),
-                              key=lambda n: (abs(circle_len / n - self.params['punch_step_r']), -n))
-        step_size_final = round(circle_len / steps_num_final, 3)
-
-        return current_diameter, circle_len, steps_num_final, step_size_final
+        plan = self.layer_plan
+        return (float(plan.diameter[layer_idx]), float(plan.circle_len[layer_idx]),
+                int(plan.step_count[layer_idx]), float(plan.step_size[layer_idx]))
 
     def calculate_total_punches(self, main_rotation_num, total_rotation_num):
         """
-        Предварительный расчет общего количества пробитий
+        Предварительный расчет общего количества пробитий по плану слоев
+        (учитываются только шаги с пробитием, как в сгенерированной программе)
 
         Args:
+            main_rotation_num (int): Количество основных оборотов
             total_rotation_num (int): Общее количество оборотов
 
         Returns:
-            tuple: (общее_количество_пробитий, общая_длина_ткани)
+            tuple: (общее_количество_пробитий, общая_длина_ткани, зон_за_проворот, пробитий_в_зоне)
         """
-        total_cranks = 0
-        total_fabric_len = 0
+        plan = self.layer_plan
 
-        for rotation in range(total_rotation_num):
-            current_diameter, circle_len, steps_num_final, _ = self.calculate_layer_parameters(rotation)
-            total_cranks += steps_num_final
-            if rotation < main_rotation_num:
-                total_fabric_len += circle_len
-
-        zones_per_crank = m.ceil(self.params['tube_len'] / self.params['head_len'])
-        punches_in_zone = round(self.params['needle_step_X'] / self.diam_coef)
-        total_punches = punches_in_zone * zones_per_crank * total_cranks
+        total_punches = int(plan.punches[:total_rotation_num].sum())
+        total_fabric_len = 0
+        for circle_len in plan.circle_len[:main_rotation_num].tolist():
+            total_fabric_len += circle_len
+        zones_per_crank = plan.layout.x_step_count
+        punches_in_zone = plan.layout.x_substep_count
 
-        return total_punches, total_fabric_len, zones_per_crank, punches_in_zone
\ No newline at end of file
+        return total_punches, total_fabric_len, zones_per_crank, punches_in_zone
@@ -0,0 +1,808 @@
+import math
+import os
+import time
+from typing import List, Optional, Tuple, Union
+
+import numpy as np
+
+from constants.const import GenerationConfig
+from functions.gcode_file_formatter import GCodeFileFormatter
+from functions.layer_plan import LayerPlan, target_density
+from functions.motion_commands import MotionCommand, PunchCommands
+from functions.punch_array_engine import (PunchLayout, active_angle_steps, rotation_angle_steps,
+                                          blended_angle_steps, faster_blend_steps, layer_heights,
+                                          surface_height, round_array, STROKE_PROFILE_SINGLE, STROKE_PROFILE_TWO_STAGE)
+from functions.time_calc import time_for_moves, _seconds_to_dhms, ACCEL_LINEAR, ACCEL_ANGULAR
+
+
+# Заявленная точность оценки относительно фактической генерации.
+# При random_border = 0 время и размер файла совпадают с генерацией (до ошибок округления float),
+# количество строк и пробитий совпадает всегда.
+TIME_TOLERANCE = 0.005       # Относительная погрешность времени
+FILE_SIZE_TOLERANCE = 0.002  # Относительная погрешность размера файла
+
+# Количество узлов численного интегрирования по случайному смещению
+NOISE_NODES = 2048
+
+# Средняя длина дробной части X при случайном смещении: 3 знака (p=0.9), 2 (0.09), 1 (0.01)
+_MEAN_FRACTION_DIGITS = 2.89
+
+# Количество цифр дробной части для каждого значения в тысячных (0 -> "0")
+_FRACTION_DIGITS = np.array([len(f"{value:03d}".rstrip('0')) or 1 for value in range(1000)], dtype=np.int64)
+
+
+def estimate_job(params: dict) -> dict:
+    """
+    Аналитическая оценка задания без генерации команд.
+
+    По плану слоев (LayerPlan) рассчитываются количество строк и пробитий (точно),
+    время выполнения Part 1 / Part 2 по той же модели разгона, что и time_calc
+    (случайные смещения X учитываются математическим ожиданием), и размер файла
+    (длины строк G-кода, для случайных X - ожидаемая длина). Расчет занимает
+    миллисекунды, поэтому подходит для предварительной оценки задания и проверки
+    ограничений контроллера (объем памяти, количество строк). Время считается для
+    исходного порядка пробитий (змейка): при optimize_path фактическое время не больше
+    оценки, строки и размер файла не меняются.
+
+    Args:
+        params (dict): Словарь параметров пробития
+
+    Returns:
+        dict: Оценка задания:
+            time_data - время в формате time_prediction_motioncommand,
+            part_seconds - время Part 1 и Part 2 в секундах (без округления),
+            command_lines, header_lines, total_lines - количество строк,
+            punches - количество пробитий,
+            revolutions - количество оборотов (основные + прошивка),
+            file_bytes - ожидаемый размер файла в байтах (в формате строк
+                         gcode_mode / gcode_comments),
+            elapsed_ms - время расчета оценки в миллисекундах
+    """
+    start = time.perf_counter()
+    config = GenerationConfig
+    plan = LayerPlan.for_params(params)
+    main = plan.main_revolutions
+    total = plan.total_revolutions
+
+    low = 2 * config.CENTER_X - params['random_border']
+    high = params['random_border']
+
+    formatter = GCodeFileFormatter(params)
+
+    part_seconds = []
+    command_bytes = 0
+    command_lines = 0
+    for first, stop, fix_z_offset in _phases(params, plan):
+        layers = [_layer_estimate(params, plan, revolution, fix_z_offset, low, high,
+                                  formatter.compact, formatter.comments)
+                  for revolution in range(first, stop)]
+        part_seconds.append(_phase_time(params, layers, low, high))
+        command_bytes += sum(layer['bytes'] for layer in layers)
+        command_lines += sum(layer['lines'] for layer in layers)
+
+    # M110 выводится после основных оборотов; Part 2 считается и при пустой прошивке
+    has_split = main > 0
+    part_seconds = (part_seconds + [0.0, 0.0])[:2]
+    time_data = _time_data(part_seconds, has_split)
+
+    # M110: комментарий сохраняется в обоих форматах, если комментарии включены
+    waiting = PunchCommands.waiting()
+    if not formatter.comments:
+        waiting.comment = None
+    waiting_line = waiting.to_gcode_string()
+    if main > 0:
+        command_lines += 1
+        command_bytes += len(waiting_line.encode('utf-8'))
+
+    header = _header_lines(formatter, params, time_data)
+    newline = len(os.linesep)
+    total_lines = len(header) + command_lines
+    file_bytes = (sum(len(line.encode('utf-8')) for line in header)
+                  + command_bytes + newline * total_lines)
+
+    return {
+        'time_data': time_data,
+        'part_seconds': tuple(part_seconds),
+        'command_lines': command_lines,
+        'header_lines': len(header),
+        'total_lines': total_lines,
+        'punches': plan.total_punches,
+        'revolutions': total,
+        'file_bytes': int(round(file_bytes)),
+        'elapsed_ms': (time.perf_counter() - start) * 1000.0,
+    }
+
+
+def check_controller_limits(estimate: dict, max_lines: Optional[int] = None,
+                            max_bytes: Optional[int] = None) -> List[str]:
+    """
+    Проверка оценки задания по ограничениям контроллера
+
+    Args:
+        estimate (dict): Результат estimate_job()
+        max_lines (Optional[int]): Максимальное количество строк программы
+        max_bytes (Optional[int]): Максимальный размер программы в байтах
+
+    Returns:
+        List[str]: Сообщения о превышенных ограничениях (пустой список - ограничения соблюдены)
+    """
+    errors = []
+    if max_lines is not None and estimate['total_lines'] > max_lines:
+        errors.append(f"Количество строк {estimate['total_lines']} превышает ограничение {max_lines}")
+    if max_bytes is not None and estimate['file_bytes'] > max_bytes:
+        errors.append(f"Размер программы {estimate['file_bytes']} байт превышает ограничение {max_bytes}")
+    return errors
+
+
+def estimate_rotation_merge(params: dict) -> dict:
+    """
+    Экономия времени от объединения поворотов без пробития (параметр 'merge_rotations').
+
+    Команды поворота содержат только ось A, поэтому объединение меняет лишь время
+    поворотов: каждый пропущенный поворот на один угловой шаг проходил полный цикл
+    разгона и торможения. Расчет выполняется по плану слоев без генерации команд
+    и совпадает с разностью времени программ с объединением и без него.
+
+    Args:
+        params (dict): Словарь параметров пробития
+
+    Returns:
+        dict: removed_rotations - количество удаляемых команд поворота,
+              part_seconds - экономия Part 1 и Part 2 в секундах,
+              time_data - экономия в формате time_prediction_motioncommand
+    """
+    plan = LayerPlan.for_params(params)
+    main = plan.main_revolutions
+    removed = 0
+    saved = [0.0, 0.0]
+    for part, (first, stop) in enumerate(((0, main), (main, plan.total_revolutions))):
+        full = [_layer_angles(params, plan, revolution, False)[0] for revolution in range(first, stop)]
+        merged = [_layer_angles(params, plan, revolution, True)[0] for revolution in range(first, stop)]
+        removed += sum(angles.size for angles in full) - sum(angles.size for angles in merged)
+        saved[part] = _rotation_time(params, full) - _rotation_time(params, merged)
+    return {
+        'removed_rotations': removed,
+        'part_seconds': tuple(saved),
+        'time_data': _time_data(saved, main > 0),
+    }
+
+
+def format_rotation_merge(savings: dict, time_data: list) -> str:
+    """
+    Строка отчета об экономии времени от объединения поворотов
+
+    Args:
+        savings (dict): Результат estimate_rotation_merge()
+        time_data (list): Время программы с объединением поворотов (формат time_prediction_motioncommand)
+
+    Returns:
+        str: Отчет (доля - от времени программы без объединения)
+    """
+    saved = list(savings['part_seconds']) + [sum(savings['part_seconds'])]
+    parts = []
+    for name, seconds, (_, actual) in zip(("Part 1", "Part 2", "всего"), saved, time_data):
+        share = seconds / (actual + seconds) * 100 if actual + seconds > 0 else 0.0
+        parts.append(f"{name}: {seconds:.1f} с ({share:.2f}%)")
+    return (f"Объединение поворотов: удалено команд поворота {savings['removed_rotations']}, "
+            f"экономия времени " + ", ".join(parts))
+
+
+def estimate_stroke_profiles(params: dict) -> dict:
+    """
+    Оценка времени задания для обоих профилей удара (параметр 'stroke_profile')
+    без генерации команд: выигрыш двухэтапного удара до его применения на станке.
+
+    Args:
+        params (dict): Словарь параметров пробития
+
+    Returns:
+        dict: single, two_stage - результаты estimate_job() для каждого профиля,
+              saved_seconds - экономия двухэтапного удара Part 1, Part 2 и всего в секундах
+    """
+    single = estimate_job(dict(params, stroke_profile=STROKE_PROFILE_SINGLE))
+    two_stage = estimate_job(dict(params, stroke_profile=STROKE_PROFILE_TWO_STAGE))
+    saved = [float(before - after) for before, after in zip(single['part_seconds'], two_stage['part_seconds'])]
+    return {
+        'single': single,
+        'two_stage': two_stage,
+        'saved_seconds': tuple(saved + [sum(saved)]),
+    }
+
+
+def estimate_density_schedule(params: dict) -> dict:
+    """
+    Сравнение расписания шагов по целевой плотности пробитий ('density_schedule')
+    с постоянным шагом punch_step_r по слоям: количество шагов, плотность,
+    пробития и время каждого оборота (модель времени estimate_job).
+
+    Args:
+        params (dict): Словарь параметров пробития
+
+    Returns:
+        dict: target_density - целевая плотность, пробитий/см²,
+              layers - по оборотам: revolution, diameter, steps, density, punches, seconds
+                       (пары значений: постоянный шаг, расписание),
+              punches, part_seconds - итоги (постоянный шаг, расписание),
+              saved_punches, saved_seconds - экономия
+    """
+    variants = [dict(params, density_schedule=False), dict(params, density_schedule=True)]
+    plans = [LayerPlan.for_params(variant) for variant in variants]
+    seconds = [_layer_times(variant, plan) for variant, plan in zip(variants, plans)]
+    area = plans[0].circle_len * params['tube_len'] / 100.0
+
+    layers = []
+    for revolution in range(plans[0].total_revolutions):
+        layers.append({
+            'revolution': revolution,
+            'stitching': revolution >= plans[0].main_revolutions,
+            'diameter': float(plans[0].diameter[revolution]),
+            'steps': tuple(int(plan.step_count[revolution]) for plan in plans),
+            'density': tuple(float(plan.punches[revolution] / area[revolution]) for plan in plans),
+            'punches': tuple(int(plan.punches[revolution]) for plan in plans),
+            'seconds': tuple(float(times[revolution]) for times in seconds),
+        })
+    main = plans[0].main_revolutions
+    part_seconds = tuple((float(times[:main].sum()), float(times[main:].sum())) for times in seconds)
+    punches = tuple(plan.total_punches for plan in plans)
+    return {
+        'target_density': target_density(params),
+        'layers': layers,
+        'punches': punches,
+        'part_seconds': part_seconds,
+        'saved_punches': punches[0] - punches[1],
+        'saved_seconds': sum(part_seconds[0]) - sum(part_seconds[1]),
+    }
+
+
+def format_density_schedule(report: dict, layers: bool = True) -> str:
+    """
+    Отчет по расписанию шагов по целевой плотности
+
+    Args:
+        report (dict): Результат estimate_density_schedule()
+        layers (bool): Таблица по слоям (False - только итог)
+
+    Returns:
+        str: Отчет
+    """
+    lines = []
+    if layers:
+        lines.append(f"{'оборот':>7}{'диаметр':>10}{'шаги':>13}{'пробитий/см²':>17}{'пробития':>15}"
+                     f"{'время, с':>19}{'экономия, с':>13}")
+        for layer in report['layers']:
+            mark = '*' if layer['stitching'] else ''
+            lines.append(f"{layer['revolution']:>6}{mark:1}{layer['diameter']:>10.2f}"
+                         f"{layer['steps'][0]:>6} ->{layer['steps'][1]:>4}"
+                         f"{layer['density'][0]:>8.2f} ->{layer['density'][1]:>6.2f}"
+                         f"{layer['punches'][0]:>7} ->{layer['punches'][1]:>5}"
+                         f"{layer['seconds'][0]:>9.1f} ->{layer['seconds'][1]:>7.1f}"
+                         f"{layer['seconds'][0] - layer['seconds'][1]:>13.1f}")
+        lines.append("* - обороты прошивки")
+    before, after = (sum(seconds) for seconds in report['part_seconds'])
+    share = report['saved_seconds'] / before * 100 if before > 0 else 0.0
+    lines.append(f"Расписание шагов по плотности {report['target_density']:.2f} пробитий/см²: "
+                 f"пробитий {report['punches'][0]} -> {report['punches'][1]}, "
+                 f"время {_seconds_to_dhms(before)} -> {_seconds_to_dhms(after)}, "
+                 f"экономия {report['saved_seconds']:.1f} с ({share:.2f}%)")
+    return "\n".join(lines)
+
+
+def grid_layer_times(params: dict, layout: PunchLayout, x_step_count: np.ndarray, main: np.ndarray,
+                     total: np.ndarray, step_count: np.ndarray, active: np.ndarray) -> np.ndarray:
+    """
+    Ожидаемое время каждого оборота для массива размеров трубы (сочетания x обороты)
+    без построения плана слоев: модель _phase_layer_times для генерации без опций
+    (удар 'single', без объединения и совмещения поворотов, постоянный шаг). Слагаемые
+    времени те же (_rotation_move_times, _stroke_seconds, _inner_move_seconds,
+    _expected_move_times, _first_approach_times), в замкнутом виде задаются только
+    перемещения: углы шагов и переходы по X между шагами. Углы поворотов не округляются
+    до 0.001°, поэтому время совпадает с estimate_job в пределах TIME_TOLERANCE.
+
+    Направление змейки шага s оборота r - четность r * step_count + s, смещение змейки -
+    четность s, поэтому X первого/последнего пробития шага и переходы между шагами
+    определяются четностями: переход между шагами разной четности - половина подшага,
+    одной четности (пропуск полосы шагов без пробития) - ширина прохода по X.
+
+    Args:
+        params (dict): Словарь параметров пробития (станок и ткань)
+        layout (PunchLayout): Раскладка одной зоны по X (x_step_count = 1)
+        x_step_count (np.ndarray): Количество зон по X каждого сочетания
+        main (np.ndarray): Количество основных оборотов каждого сочетания
+        total (np.ndarray): Количество всех оборотов каждого сочетания
+        step_count (np.ndarray): Количество угловых шагов (сочетания x обороты)
+        active (np.ndarray): Количество шагов с пробитием (сочетания x обороты)
+
+    Returns:
+        np.ndarray: Время оборотов в секундах (сочетания x обороты, вне плана - 0)
+    """
+    volumetric_density = layout.section_count
+    revolution = np.arange(step_count.shape[1])[None, :]
+    in_plan = revolution < total[:, None]
+    idle_speed = params['idling_speed'] / 60.0
+    low = 2 * GenerationConfig.CENTER_X - params['random_border']
+    high = params['random_border']
+    difference = _difference_noise(high - low)
+    thickness = params['fabric_thickness']
+    starts_phase = (revolution == 0) | (revolution == main[:, None])
+    first_of_phase = starts_phase & in_plan
+
+    y = round_array(params['zero_offset_Y'] - params['punch_offset'] - thickness * revolution, 3)
+    z = round_array(params['zero_offset_Z'] - thickness * np.minimum(revolution, main[:, None]), 3)
+    y = np.broadcast_to(y, step_count.shape)
+
+    # Повороты: шаги оборота и переход с последнего шага предыдущего оборота (начало фазы - из A=0)
+    step_time = _rotation_move_times(params['rotate_speed'], 360.0 / step_count)
+    previous_step_time = np.concatenate([step_time[:, :1], step_time[:, :-1]], axis=1)
+    entry_time = np.where(starts_phase, _rotation_move_times(params['rotate_speed'], 360.0 * revolution),
+                          previous_step_time)
+    seconds = (step_count - 1) * step_time + entry_time
+
+    # Внедрение и извлечение (координаты внедрения - как в layer_heights)
+    punches = active * (x_step_count * layout.x_substep_count)[:, None]
+    seconds += punches * _stroke_seconds(params, y, z, y + params['punch_depth'] + params['punch_offset'],
+                                         z + params['support_depth'], None)
+
+    # Подходы внутри шага: между подшагами и между зонами
+    seconds += active * _inner_move_seconds(layout, x_step_count, idle_speed, difference)[:, None]
+
+    # Подходы между активными шагами оборота
+    width = layout.x_substep_offset_2 + (x_step_count - 1) * layout.x_step_size
+    half_substep = _expected_move_times(np.array([layout.x_substep_size / 2], dtype=np.float64), np.zeros(1),
+                                        idle_speed, difference)[0]
+    full_width = _expected_distinct_move_times(width.astype(np.float64), np.zeros(width.size), idle_speed, difference)
+    head_step = int(layout.circumferential_head_step)
+    active_in_head = int(min(layout.needle_step_Y, head_step))
+    # переход через полосу без пробития четной длины - между шагами одной четности
+    gap_jumps = -(-step_count // head_step) - 1 if (head_step - active_in_head) % 2 else np.zeros_like(step_count)
+    seconds += (active - 1 - gap_jumps) * half_substep + gap_jumps * full_width[:, None]
+
+    # X первого пробития первого шага и последнего пробития последнего активного шага оборота
+    section = (revolution % volumetric_density) * layout.section_size
+    first_ascending = (revolution * step_count) % 2 == 0
+    first_x = section + np.where(first_ascending, 0.0, width[:, None])
+    full, rest = np.divmod(step_count, head_step)
+    last_step = np.where(rest > 0, full * head_step + np.minimum(rest, active_in_head), (full - 1) * head_step
+                         + active_in_head) - 1
+    last_ascending = (revolution * step_count + last_step) % 2 == 0
+    last_x = section + (last_step % 2) * layout.x_substep_size / 2 + np.where(last_ascending, width[:, None], 0.0)
+
+    # Переход на следующий оборот фазы
+    transition = ~starts_phase[:, 1:] & in_plan[:, 1:]
+    dx = first_x[:, 1:] - last_x[:, :-1]
+    lateral = (y[:, 1:] - y[:, :-1]) ** 2 + (z[:, 1:] - z[:, :-1]) ** 2
+    seconds[:, 1:][transition] += _expected_distinct_move_times(dx[transition], lateral[transition], idle_speed,
+                                                                difference)
+
+    # Первый подход фазы из нулевой позиции
+    seconds[first_of_phase] += _first_approach_times(first_x[first_of_phase], y[first_of_phase],
+                                                     z[first_of_phase], idle_speed, low, high)
+    return np.where(in_plan, seconds, 0.0)
+
+
+def _phases(params: dict, plan: LayerPlan) -> List[Tuple[int, int, Optional[float]]]:
+    """Непустые фазы программы: (первый оборот, оборот после последнего, fix_z_offset)"""
+    main = plan.main_revolutions
+    phases = [(0, main, None), (main, plan.total_revolutions, params['fabric_thickness'] * main)]
+    return [phase for phase in phases if phase[1] > phase[0]]
+
+
+def _layer_times(params: dict, plan: LayerPlan) -> np.ndarray:
+    """Ожидаемое время каждого оборота программы в секундах"""
+    low = 2 * GenerationConfig.CENTER_X - params['random_border']
+    high = params['random_border']
+    times = [np.zeros(0)]
+    for first, stop, fix_z_offset in _phases(params, plan):
+        layers = [_layer_estimate(params, plan, revolution, fix_z_offset, low, high)
+                  for revolution in range(first, stop)]
+        times.append(_phase_layer_times(params, layers, low, high))
+    return np.concatenate(times)
+
+
+def _layer_estimate(params: dict, plan: LayerPlan, revolution: int, fix_z_offset: Optional[float],
+                    low: float, high: float, compact: bool = False, comments: bool = True) -> dict:
+    """
+    Оценка одного оборота: углы поворотов, базовые X первого/последнего пробития
+    каждого активного шага (без случайного смещения) и ожидаемый размер команд в байтах
+    (формат строк - compact и comments, как в GCodeFileFormatter)
+    """
+    layout = plan.layout_for(revolution)
+    step_count = plan.angle_step_count(revolution, params)
+    steps = np.arange(step_count)
+    active = active_angle_steps(layout, step_count)
+    active_steps = steps[active]
+    merge = plan.merges_rotations(revolution, params)
+    blend = params.get('blend_rotations', GenerationConfig.BLEND_ROTATIONS)
+    if blend:
+        blend = faster_blend_steps(params, layout, revolution, step_count, merge)
+    angles, blended = _layer_angles(params, plan, revolution, merge, blend)
+    direction = (revolution * step_count + active_steps) % 2 == 0
+    x_snake_offset = (active_steps % 2) * layout.x_substep_size / 2
+    x_section_offset = (revolution % layout.section_count) * layout.section_size
+    width = layout.x_substep_offset_2 + layout.x_step_offset_2
+
+    base = x_snake_offset + x_section_offset
+    first_x = np.where(direction, base, base + width)
+    last_x = np.where(direction, base + width, base)
+
+    y, z, y_punch, z_punch = layer_heights(params, revolution, fix_z_offset)
+    y_surface = surface_height(params, y)
+
+    if y_surface is None:
+        stroke = [PunchCommands.approach(None, y, z, params['idling_speed']),
+                  PunchCommands.punch(None, y_punch, z_punch, params['move_speed']),
+                  PunchCommands.retract(None, y, z, params['move_speed'])]
+    else:
+        stroke = [PunchCommands.approach(None, y, z, params['idling_speed']),
+                  PunchCommands.surface(None, y_surface, z, params['idling_speed']),
+                  PunchCommands.punch(None, y_punch, z_punch, params['move_speed']),
+                  PunchCommands.exit(None, y_surface, z, params['move_speed']),
+                  PunchCommands.retract(None, y, z, params['idling_speed'])]
+    punches_per_crank = layout.punches_per_crank
+    punch_count = active_steps.size * punches_per_crank
+    step_blended = blended_angle_steps(active, blend)
+    step_rotations = rotation_angle_steps(active, merge, plan.ends_phase(revolution)) & ~step_blended
+
+    # Байты: слова строк без значений X и A + длины A + ожидаемые длины X + комментарии.
+    # Совмещенный поворот: строки поворота нет, A и общая скорость - в строке подхода
+    rotate = _line_words(PunchCommands.rotate(None, params['rotate_speed']), "A")
+    strokes = [_line_words(command, "X") for command in stroke]
+    blend_speed = min(params['rotate_speed'], params['idling_speed'])
+    blend_approach = _line_words(PunchCommands.approach(None, y, z, blend_speed), "XA")
+    x_length = _expected_x_length(params, plan, revolution, active_steps, direction, low, high)
+    size = int(_decimal_lengths(angles).sum())
+    if compact:
+        # X одинаков во всех строках пробития и печатается только в строке подхода
+        size += x_length + _compact_layer_bytes(rotate, strokes, blend_approach, step_rotations, active,
+                                                step_blended, punches_per_crank)
+    else:
+        size += len(stroke) * x_length
+        size += int(step_rotations.sum()) * _full_line_bytes(rotate)
+        size += punch_count * sum(_full_line_bytes(row) for row in strokes)
+        size += int(blended.sum()) * (_full_line_bytes(blend_approach) - _full_line_bytes(strokes[0]))
+    if comments:
+        size += int(step_rotations.sum()) * rotate[2]
+        size += punch_count * sum(row[2] for row in strokes)
+
+    return {
+        'layout': layout,
+        'angles': angles,
+        'blended': blended,
+        'blended_steps': step_blended[active_steps],
+        'first_x': first_x,
+        'last_x': last_x,
+        'y': y,
+        'z': z,
+        'y_punch': y_punch,
+        'z_punch': z_punch,
+        'y_surface': y_surface,
+        'active_count': active_steps.size,
+        'rotations': angles.size - int(blended.sum()),
+        'lines': angles.size - int(blended.sum()) + len(stroke) * punch_count,
+        'bytes': size,
+    }
+
+
+def _line_words(command: MotionCommand, values: str) -> Tuple[Tuple[str, ...], str, int]:
+    """
+    Строка команды для подсчета размера: слова без G01 и комментария, буквы осей,
+    значения которых считаются отдельно (X, A), и размер комментария в байтах
+    """
+    text, _, comment = command.to_gcode_string().partition(" ; ")
+    comment_bytes = len(f" ; {comment}".encode('utf-8')) if comment else 0
+    return tuple(text.split()[1:]), values, comment_bytes
+
+
+def _full_line_bytes(row: Tuple[Tuple[str, ...], str, int]) -> int:
+    """Размер строки полного формата без значений X/A и комментария: "G01" и все слова"""
+    words, values, _ = row
+    return len("G01") + sum(1 + len(word) for word in words) + len(" X") * len(values)
+
+
+def _compact_layer_bytes(rotate: tuple, strokes: List[tuple], blend_approach: tuple, rotations: np.ndarray,
+                         active: np.ndarray, blended: np.ndarray, punches_per_crank: int) -> int:
+    """
+    Размер строк оборота в компактном формате без значений X/A и комментариев
+    (правила GCodeFileFormatter._compact_lines).
+
+    Модальное состояние сбрасывается в начале оборота; Y, Z и F печатаются при изменении
+    текста слова, A - в каждой строке поворота, X - в первой строке пробития (значения X
+    соседних пробитий различны). G01 печатается в первой строке оборота и в строках
+    без слов, в остальных строках отбрасывается начальный пробел.
+    Размер шага зависит только от вида шага и состояния на входе, поэтому считается
+    один раз для каждой пары (вид шага, состояние).
+    """
+    steps = {}
+    # X остальных строк пробития совпадает с X подхода и не печатается
+    strokes = strokes[:1] + [(words, "", comment) for words, _, comment in strokes[1:]]
+
+    def line(row: tuple, state: dict, first: bool) -> int:
+        words, values, _ = row
+        printed = [word for word in words if state.get(word[0]) != word]
+        state.update((word[0], word) for word in words)
+        size = sum(1 + len(word) for word in printed) + len(" X") * len(values)
+        return size + len("G01") if first or not (printed or values) else size - 1
+
+    size = 0
+    state = ()
+    first = True
+    for step_kind in zip(rotations.tolist(), active.tolist(), blended.tolist()):
+        key = (step_kind, state, first)
+        if key not in steps:
+            rotation, punched, joint = step_kind
+            current = dict(state)
+            step_size = 0
+            if rotation:
+                step_size += line(rotate, current, first)
+                first = False
+            if punched:
+                rows = [blend_approach if joint else strokes[0]] + strokes[1:]
+                step_size += sum(line(row, current, first and index == 0) for index, row in enumerate(rows))
+                first = False
+                if punches_per_crank > 1:
+                    repeat = sum(line(row, current, False) for row in strokes)
+                    step_size += (punches_per_crank - 1) * repeat
+            steps[key] = (step_size, tuple(sorted(current.items())), first)
+        step_size, state, first = steps[key]
+        size += step_size
+    return size
+
+
+def _phase_time(params: dict, layers: List[dict], low: float, high: float) -> float:
+    """
+    Время выполнения фазы (основные обороты или прошивка) в секундах.
+    Фаза начинается с нулевой позиции, как и в time_prediction_motioncommand.
+    """
+    return float(_phase_layer_times(params, layers, low, high).sum())
+
+
+def _phase_layer_times(params: dict, layers: List[dict], low: float, high: float) -> np.ndarray:
+    """
+    Время выполнения каждого оборота фазы в секундах (подход к первому пробитию
+    шага относится к обороту этого шага)
+    """
+    plan_layout = layers[0]['layout']
+    idle_speed = params['idling_speed'] / 60.0
+    width = high - low
+    times = np.zeros(len(layers))
+    active_counts = np.array([layer['active_count'] for layer in layers], dtype=np.int64)
+    step_layer = np.repeat(np.arange(len(layers)), active_counts)
+
+    # Повороты; совмещенные с подходом учитываются вместе с подходом
+    angles = [layer['angles'] for layer in layers]
+    blended = np.concatenate([np.zeros(0, dtype=bool)] + [layer['blended'] for layer in layers])
+    rotation_layer = np.repeat(np.arange(len(layers)), [layer_angles.size for layer_angles in angles])
+    rotation_times = _rotation_times(params['rotate_speed'], angles)
+    times += np.bincount(rotation_layer[~blended], rotation_times[~blended], minlength=len(layers))
+
+    # Внедрение и извлечение: смещение по Y/Z одинаково для всех пробитий слоя
+    for index, layer in enumerate(layers):
+        if layer['active_count'] == 0:
+            continue
+        count = layer['active_count'] * plan_layout.punches_per_crank
+        times[index] += count * float(_stroke_seconds(params, layer['y'], layer['z'], layer['y_punch'],
+                                                      layer['z_punch'], layer['y_surface']))
+
+    # Подходы внутри шага: между подшагами и между зонами
+    difference = _difference_noise(width)
+    times += active_counts * float(_inner_move_seconds(plan_layout, plan_layout.x_step_count, idle_speed,
+                                                       difference))
+
+    # Подходы между активными шагами (в том числе на следующий слой)
+    first_x = np.concatenate([layer['first_x'] for layer in layers])
+    last_x = np.concatenate([layer['last_x'] for layer in layers])
+    y = np.concatenate([np.full(layer['active_count'], layer['y'], dtype=np.float64) for layer in layers])
+    z = np.concatenate([np.full(layer['active_count'], layer['z'], dtype=np.float64) for layer in layers])
+    if first_x.size:
+        dx = first_x[1:] - last_x[:-1]
+        lateral = (y[1:] - y[:-1]) ** 2 + (z[1:] - z[:-1]) ** 2
+        target_layer = step_layer[1:]
+        # подход, совмещенный с поворотом: общая скорость, время - не меньше времени поворота
+        joint = np.concatenate([layer['blended_steps'] for layer in layers])[1:]
+        times += np.bincount(target_layer[~joint],
+                             _expected_move_times(dx[~joint], lateral[~joint], idle_speed, difference),
+                             minlength=len(layers))
+        if joint.any():
+            blend_speed = min(params['rotate_speed'], params['idling_speed'])
+            floor = _rotation_times(blend_speed, angles)[blended]
+            times += np.bincount(target_layer[joint],
+                                 _expected_move_times(dx[joint], lateral[joint], blend_speed / 60.0, difference,
+                                                      floor),
+                                 minlength=len(layers))
+
+        # Первый подход фазы из нулевой позиции
+        times[step_layer[0]] += float(_first_approach_times(first_x[:1], y[:1], z[:1], idle_speed, low, high)[0])
+
+    return times
+
+
+def _layer_angles(params: dict, plan: LayerPlan, revolution: int, merge: bool,
+                  blend: Union[bool, np.ndarray] = False) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Углы A оборота в порядке выполнения (при объединении - только шаги с пробитием)
+    и маска углов, поворот на которые совмещен с подходом
+    """
+    step_count = plan.angle_step_count(revolution, params)
+    angles = round_array(360 * revolution + (360 / step_count) * np.arange(step_count), 3)
+    active = active_angle_steps(plan.layout, step_count)
+    rotations = rotation_angle_steps(active, merge, plan.ends_phase(revolution))
+    return angles[rotations], blended_angle_steps(active, blend)[rotations]
+
+
+def _rotation_times(feed: float, angles: List[np.ndarray]) -> np.ndarray:
+    """Время каждого поворота фазы: разность соседних углов в порядке выполнения (начало фазы из A=0)"""
+    angles = np.concatenate([[0.0]] + list(angles))
+    return _rotation_move_times(feed, np.diff(angles))
+
+
+def _rotation_move_times(feed: float, degrees: np.ndarray) -> np.ndarray:
+    """Время поворотов на заданные углы (градусы) со скоростью feed"""
+    angular_speed = feed / 60.0 * math.pi / 180.0
+    return time_for_moves(np.abs(degrees) * math.pi / 180.0, angular_speed, ACCEL_ANGULAR)
+
+
+def _stroke_seconds(params: dict, y, z, y_punch, z_punch, y_surface: Optional[float]):
+    """
+    Время внедрения и извлечения одного пробития слоя (скаляры или массивы слоев).
+    Двухэтапный удар: быстрый участок до поверхности ткани и обратно - со скоростью idling_speed.
+    """
+    y_start = y if y_surface is None else y_surface
+    stroke = np.hypot(y_punch - y_start, z_punch - z)
+    seconds = 2 * time_for_moves(stroke, params['move_speed'] / 60.0, ACCEL_LINEAR)
+    if y_surface is not None:
+        seconds = seconds + 2 * time_for_moves(abs(y_surface - y), params['idling_speed'] / 60.0, ACCEL_LINEAR)
+    return seconds
+
+
+def _inner_move_seconds(layout: PunchLayout, x_step_count, speed: float,
+                        difference: Tuple[np.ndarray, np.ndarray]) -> np.ndarray:
+    """
+    Ожидаемое время подходов внутри одного шага с пробитием: между подшагами
+    и между зонами по X (x_step_count - количество зон, скаляр или массив)
+    """
+    x_step_count = np.asarray(x_step_count)
+    seconds = (x_step_count - 1) * _expected_move_times(
+        np.array([layout.x_step_size - layout.x_substep_offset_2], dtype=np.float64), np.zeros(1),
+        speed, difference)[0]
+    if layout.x_substep_count > 1:
+        seconds = seconds + x_step_count * (layout.x_substep_count - 1) * _expected_move_times(
+            np.array([layout.x_substep_size], dtype=np.float64), np.zeros(1), speed, difference)[0]
+    return seconds
+
+
+def _first_approach_times(first_x: np.ndarray, y: np.ndarray, z: np.ndarray, speed: float,
+                          low: float, high: float) -> np.ndarray:
+    """Ожидаемое время первого подхода фазы из нулевой позиции (смещение X - равномерное на [low, high])"""
+    return _expected_distinct_move_times(first_x, y ** 2 + z ** 2, speed, _uniform_noise(low, high))
+
+
+def _rotation_time(params: dict, angles: List[np.ndarray]) -> float:
+    """Время поворотов фазы со скоростью rotate_speed"""
+    return float(_rotation_times(params['rotate_speed'], angles).sum())
+
+
+def _difference_noise(width: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Узлы и веса распределения разности двух случайных смещений
+    (треугольное распределение на [-width, width])
+    """
+    if width <= 0:
+        return np.zeros(1), np.ones(1)
+    step = 2.0 * width / NOISE_NODES
+    nodes = -width + step * (np.arange(NOISE_NODES) + 0.5)
+    weights = width - np.abs(nodes)
+    return nodes, weights / weights.sum()
+
+
+def _uniform_noise(low: float, high: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Узлы и веса равномерного распределения случайного смещения на [low, high]"""
+    if high <= low:
+        return np.array([float(low)]), np.ones(1)
+    step = (high - low) / NOISE_NODES
+    nodes = low + step * (np.arange(NOISE_NODES) + 0.5)
+    return nodes, np.full(NOISE_NODES, 1.0 / NOISE_NODES)
+
+
+def _expected_move_times(dx: np.ndarray, lateral: np.ndarray, speed: float,
+                         noise: Tuple[np.ndarray, np.ndarray],
+                         floor: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Математическое ожидание времени перемещений со случайной добавкой к X
+
+    Args:
+        dx (np.ndarray): Перемещения по X без случайной добавки
+        lateral (np.ndarray): Квадраты перемещений по Y и Z
+        speed (float): Скорость, мм/с
+        noise (Tuple): Узлы и веса распределения добавки
+        floor (Optional[np.ndarray]): Минимальное время каждого перемещения
+                                      (совместный поворот A, None - без ограничения)
+
+    Returns:
+        np.ndarray: Ожидаемое время каждого перемещения в секундах
+    """
+    nodes, weights = noise
+    if floor is None:
+        floor = np.zeros(len(dx))
+    # Большинство перемещений повторяется: интегрирование только по уникальным тройкам
+    pairs = np.round(np.stack([np.abs(dx), lateral, floor], axis=1), 9)
+    unique, inverse = np.unique(pairs, axis=0, return_inverse=True)
+    distance = np.sqrt((unique[:, :1] + nodes[None, :]) ** 2 + unique[:, 1:2])
+    expected = np.maximum(time_for_moves(distance, speed, ACCEL_LINEAR), unique[:, 2:]) @ weights
+    return expected[inverse.reshape(-1)]
+
+
+def _expected_distinct_move_times(dx: np.ndarray, lateral: np.ndarray, speed: float,
+                                  noise: Tuple[np.ndarray, np.ndarray]) -> np.ndarray:
+    """
+    _expected_move_times для больших массивов с немногими различными перемещениями:
+    уникальные значения ищутся по каждой координате отдельно (сортировка чисел, а не строк)
+    """
+    dx_values, dx_index = np.unique(np.round(np.abs(dx), 9), return_inverse=True)
+    lateral_values, lateral_index = np.unique(np.round(lateral, 9), return_inverse=True)
+    keys, inverse = np.unique(dx_index.ravel() * lateral_values.size + lateral_index.ravel(), return_inverse=True)
+    expected = _expected_move_times(dx_values[keys // lateral_values.size], lateral_values[keys % lateral_values.size],
+                                    speed, noise)
+    return expected[inverse.reshape(-1)]
+
+
+def _expected_x_length(params: dict, plan: LayerPlan, revolution: int, active_steps: np.ndarray,
+                       direction: np.ndarray, low: float, high: float) -> float:
+    """Суммарная ожидаемая длина значений X (в символах) для всех пробитий оборота"""
+    layout = plan.layout_for(revolution)
+    x_substep_offset = np.abs(layout.x_substep_size * np.arange(layout.x_substep_count)[None, :]
+                              - np.where(direction, layout.x_substep_offset_1, layout.x_substep_offset_2)[:, None])
+    x_step_offset = np.abs(layout.x_step_size * np.arange(layout.x_step_count)[None, :]
+                           - np.where(direction, layout.x_step_offset_1, layout.x_step_offset_2)[:, None])
+    base = ((active_steps % 2) * layout.x_substep_size / 2)[:, None, None] \
+        + (revolution % layout.section_count) * layout.section_size \
+        + x_substep_offset[:, None, :] + x_step_offset[:, :, None]
+    base = base.reshape(-1)
+
+    width = high - low
+    if width <= 0:
+        return float(_decimal_lengths(base + low).sum())
+
+    # Уникальные базовые значения (змейка и направление дают несколько вариантов)
+    values, counts = np.unique(base, return_counts=True)
+    x_low, x_high = values + low, values + high
+    negative = np.clip(-x_low / width, 0.0, 1.0)
+    integer_digits = np.ones(values.size)
+    for power in range(1, 16):
+        threshold = 10.0 ** power
+        above = np.clip((x_high - threshold) / width, 0.0, 1.0) + np.clip((-threshold - x_low) / width, 0.0, 1.0)
+        if not above.any():
+            break
+        integer_digits += above
+    lengths = negative + integer_digits + 1 + _MEAN_FRACTION_DIGITS
+    return float(lengths @ counts)
+
+
+def _decimal_lengths(values: np.ndarray) -> np.ndarray:
+    """Длины строк str(round(value, 3)) для массива float"""
+    rounded = round_array(values, 3)
+    millis = np.rint(np.abs(rounded) * 1000).astype(np.int64)
+    whole = millis // 1000
+    integer_digits = np.ones(whole.shape, dtype=np.int64)
+    for power in range(1, 16):
+        integer_digits += whole >= 10 ** power
+    return np.signbit(rounded) + integer_digits + 1 + _FRACTION_DIGITS[millis % 1000]
+
+
+def _time_data(part_seconds: List[float], has_split: bool) -> list:
+    """Время в формате time_prediction_motioncommand"""
+    t1 = part_seconds[0]
+    if not has_split:
+        return [[_seconds_to_dhms(t1), round(t1)], ["0:00:00", 0], [_seconds_to_dhms(t1), round(t1)]]
+    t2 = part_seconds[1]
+    total = t1 + t2
+    return [[_seconds_to_dhms(t1), round(t1)], [_seconds_to_dhms(t2), round(t2)],
+            [_seconds_to_dhms(total), round(total)]]
+
+
+def _header_lines(formatter: GCodeFileFormatter, params: dict, time_data: list) -> List[str]:
+    """Строки заголовка потоковой записи (поля фиксированной ширины)"""
+    from functions.tube_command_generator import TubeCommandGenerator
+    from functions.gcode_stream_writer import GCodeStreamWriter
+
+    stats = TubeCommandGenerator(params).get_generation_statistics()
+    return formatter.format_header(stats, "generate_gcode_file", time_data,
+                                   field_width=GCodeStreamWriter.HEADER_FIELD_WIDTH)
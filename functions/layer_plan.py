@@ -0,0 +1,361 @@
+import math
+from dataclasses import dataclass
+from functools import lru_cache
+
+import numpy as np
+
+from constants.const import GenerationConfig
+from functions.punch_array_engine import PunchLayout, active_angle_steps, round_array
+
+
+# Параметры, от которых зависит план слоев (ключ кэша)
+PLAN_PARAMS = ('i_diam', 'o_diam', 'fabric_thickness', 'punch_step_r', 'num_of_needle_rows',
+               'needle_step_X', 'needle_step_Y', 'volumetric_density', 'tube_len', 'head_len',
+               'density_schedule', 'target_density', 'density_tolerance')
+
+
+@dataclass(frozen=True)
+class LayerPlan:
+    """
+    План слоев (оборотов) программы: основные обороты и обороты прошивки.
+
+    Рассчитывается один раз для набора параметров и используется статистикой,
+    источником случайных смещений, генерацией и оценкой времени, поэтому
+    статистика в заголовке совпадает с фактически сгенерированной программой.
+    Массивы доступны только для чтения (план общий для всех потребителей).
+
+    Attributes:
+        layout (PunchLayout): Раскладка пробитий вдоль X
+        stitching_layout (PunchLayout): Раскладка оборотов прошивки (с прореживанием подшагов)
+        main_revolutions (int): Количество основных оборотов
+        extra_revolutions (int): Количество оборотов прошивки
+        diameter (np.ndarray): Диаметр слоя, мм
+        circle_len (np.ndarray): Длина окружности слоя, мм
+        step_count (np.ndarray): Количество угловых шагов в обороте
+        step_size (np.ndarray): Шаг по окружности, мм (округлен до 0.001)
+        active_steps (np.ndarray): Количество шагов с пробитием
+        punches (np.ndarray): Количество пробитий в обороте
+        first_punch (np.ndarray): Глобальный номер первого пробития оборота
+    """
+    layout: PunchLayout
+    stitching_layout: PunchLayout
+    main_revolutions: int
+    extra_revolutions: int
+    diameter: np.ndarray
+    circle_len: np.ndarray
+    step_count: np.ndarray
+    step_size: np.ndarray
+    active_steps: np.ndarray
+    punches: np.ndarray
+    first_punch: np.ndarray
+
+    @classmethod
+    def for_params(cls, params: dict) -> 'LayerPlan':
+        """
+        План слоев для словаря параметров (из кэша, если уже рассчитан).
+        Количество оборотов прошивки задается параметром 'extra_rotations'
+        (по умолчанию GenerationConfig.EXTRA_ROTATIONS), прореживание подшагов
+        прошивки - 'stitching_substep_stride' (GenerationConfig.STITCHING_SUBSTEP_STRIDE).
+
+        Args:
+            params (dict): Словарь параметров пробития
+
+        Returns:
+            LayerPlan: План слоев
+        """
+        config = GenerationConfig
+        key = tuple(params.get(name) for name in PLAN_PARAMS)
+        extra_revolutions = params.get('extra_rotations', config.EXTRA_ROTATIONS)
+        if not isinstance(extra_revolutions, (int, np.integer)) or extra_revolutions < 0:
+            raise ValueError(f"Количество оборотов прошивки должно быть целым неотрицательным числом: "
+                             f"{extra_revolutions}")
+        return _cached_plan(key, int(extra_revolutions), config.VOLUMETRIC_DENSITY_MAP[params['volumetric_density']],
+                            params.get('stitching_substep_stride', config.STITCHING_SUBSTEP_STRIDE))
+
+    @classmethod
+    def build(cls, params: dict, extra_revolutions: int, volumetric_density: int,
+              substep_stride: int = 1) -> 'LayerPlan':
+        """
+        Расчет плана слоев
+
+        Args:
+            params (dict): Словарь параметров пробития
+            extra_revolutions (int): Количество оборотов прошивки
+            volumetric_density (int): Количество оборотов на полный паттерн (VOLUMETRIC_DENSITY_MAP)
+            substep_stride (int): Прореживание подшагов в оборотах прошивки (1 - без прореживания)
+
+        Returns:
+            LayerPlan: План слоев
+        """
+        layout = PunchLayout.from_params(params, volumetric_density)
+        stitching_layout = layout.sparse(substep_stride)
+        main_revolutions = main_revolution_count(params, volumetric_density)
+
+        revolutions = np.arange(main_revolutions + extra_revolutions)
+        diameter, circle_len, step_count = layer_geometry(params, revolutions)
+
+        active_by_count = {count: int(active_angle_steps(layout, count).sum())
+                           for count in np.unique(step_count).tolist()}
+        active_steps = np.array([active_by_count[count] for count in step_count.tolist()], dtype=np.int64)
+        punches_per_crank = np.where(revolutions < main_revolutions, layout.punches_per_crank,
+                                     stitching_layout.punches_per_crank)
+        punches = active_steps * punches_per_crank
+        first_punch = np.concatenate(([0], np.cumsum(punches)[:-1])).astype(np.int64)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            step_size = round_array(circle_len / step_count, 3)
+
+        arrays = dict(diameter=diameter, circle_len=circle_len, step_count=step_count, step_size=step_size,
+                      active_steps=active_steps, punches=punches, first_punch=first_punch)
+        for array in arrays.values():
+            array.setflags(write=False)
+
+        return cls(layout=layout, stitching_layout=stitching_layout, main_revolutions=main_revolutions,
+                   extra_revolutions=extra_revolutions, **arrays)
+
+    @property
+    def total_revolutions(self) -> int:
+        """Общее количество оборотов (основные + прошивка)"""
+        return self.main_revolutions + self.extra_revolutions
+
+    def layout_for(self, revolution: int) -> PunchLayout:
+        """
+        Раскладка пробитий оборота: основные обороты - layout, прошивка - stitching_layout
+
+        Args:
+            revolution (int): Номер оборота
+
+        Returns:
+            PunchLayout: Раскладка пробитий
+        """
+        return self.layout if revolution < self.main_revolutions else self.stitching_layout
+
+    def merges_rotations(self, revolution: int, params: dict) -> bool:
+        """
+        Объединяются ли повороты без пробития в обороте: параметр 'merge_rotations'
+        (GenerationConfig.MERGE_ROTATIONS) для всех оборотов или 'stitching_merge_rotations'
+        (GenerationConfig.STITCHING_MERGE_ROTATIONS) только для оборотов прошивки
+
+        Args:
+            revolution (int): Номер оборота
+            params (dict): Словарь параметров пробития
+
+        Returns:
+            bool: True, если повороты объединяются
+        """
+        config = GenerationConfig
+        if params.get('merge_rotations', config.MERGE_ROTATIONS):
+            return True
+        return (revolution >= self.main_revolutions
+                and bool(params.get('stitching_merge_rotations', config.STITCHING_MERGE_ROTATIONS)))
+
+    def starts_phase(self, revolution: int) -> bool:
+        """
+        Первый ли оборот фазы: перед ним станок в нулевой позиции
+        (начало программы или после паузы для резки M110)
+
+        Args:
+            revolution (int): Номер оборота
+
+        Returns:
+            bool: True для первого оборота фазы
+        """
+        return revolution in (0, self.main_revolutions)
+
+    def ends_phase(self, revolution: int) -> bool:
+        """
+        Последний ли оборот фазы (основные обороты или прошивка): после него
+        следует пауза для резки M110 или конец программы
+
+        Args:
+            revolution (int): Номер оборота
+
+        Returns:
+            bool: True для последнего оборота фазы
+        """
+        return revolution in (self.main_revolutions - 1, self.total_revolutions - 1)
+
+    @property
+    def total_punches(self) -> int:
+        """Общее количество пробитий программы"""
+        return int(self.punches.sum())
+
+    @property
+    def main_punches(self) -> int:
+        """Количество пробитий основных оборотов"""
+        return int(self.punches[:self.main_revolutions].sum())
+
+    @property
+    def fabric_len(self) -> float:
+        """Длина ткани (сумма длин окружностей основных оборотов)"""
+        total = 0
+        for circle_len in self.circle_len[:self.main_revolutions].tolist():
+            total += circle_len
+        return total
+
+    def angle_step_count(self, revolution: int, params: dict) -> int:
+        """
+        Количество угловых шагов оборота (для оборотов вне плана рассчитывается отдельно)
+
+        Args:
+            revolution (int): Номер оборота
+            params (dict): Словарь параметров пробития
+
+        Returns:
+            int: Количество шагов
+        """
+        if 0 <= revolution < len(self.step_count):
+            return int(self.step_count[revolution])
+        return int(layer_geometry(params, np.array([revolution]))[2][0])
+
+
+@lru_cache(maxsize=64)
+def _cached_plan(key: tuple, extra_revolutions: int, volumetric_density: int, substep_stride: int) -> LayerPlan:
+    """Кэш планов по значениям параметров"""
+    return LayerPlan.build(dict(zip(PLAN_PARAMS, key)), extra_revolutions, volumetric_density, substep_stride)
+
+
+def main_revolution_count(params: dict, volumetric_density: int) -> int:
+    """
+    Количество основных оборотов: ближайшее кратное volumetric_density,
+    не меньшее идеального количества слоев
+
+    Args:
+        params (dict): Словарь параметров пробития
+        volumetric_density (int): Количество оборотов на полный паттерн
+
+    Returns:
+        int: Количество основных оборотов
+    """
+    diam_diff = params['o_diam'] - params['i_diam']
+    ideal_rotation_num = diam_diff / (params['fabric_thickness'] * 2)
+    return math.ceil(ideal_rotation_num / volumetric_density) * volumetric_density
+
+
+def layer_geometry(params: dict, revolutions: np.ndarray):
+    """
+    Диаметр, длина окружности и количество угловых шагов для набора оборотов.
+
+    Количество шагов кратно смещению игольницы по окружности (2 для одного ряда игл,
+    num_of_needle_rows * needle_step_Y для нескольких) и дает шаг, ближайший
+    к целевому punch_step_r (при равенстве выбирается меньшее количество).
+    При параметре 'density_schedule' количество шагов подбирается по целевой
+    поверхностной плотности пробитий (см. density_step_counts).
+
+    Args:
+        params (dict): Словарь параметров пробития
+        revolutions (np.ndarray): Номера оборотов
+
+    Returns:
+        tuple: (диаметры, длины окружностей, количества шагов) - массивы формы revolutions
+    """
+    radial_head_offset = _radial_head_offset(params)
+
+    diameter = params['i_diam'] + 2 * params['fabric_thickness'] * np.asarray(revolutions)
+    circle_len = math.pi * diameter
+    ideal_steps = circle_len / params['punch_step_r']
+
+    # Два ближайших варианта, кратных radial_head_offset
+    low_steps = np.maximum(radial_head_offset, np.floor(ideal_steps / radial_head_offset) * radial_head_offset)
+    high_steps = np.ceil(ideal_steps / radial_head_offset) * radial_head_offset
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        low_error = np.abs(circle_len / low_steps - params['punch_step_r'])
+        high_error = np.abs(circle_len / high_steps - params['punch_step_r'])
+    step_count = np.where(low_error <= high_error, low_steps, high_steps).astype(np.int64)
+
+    if _plan_option(params, 'density_schedule', GenerationConfig.DENSITY_SCHEDULE):
+        step_count = density_step_counts(params, circle_len, step_count)
+
+    return diameter, circle_len, step_count
+
+
+def density_step_counts(params: dict, circle_len: np.ndarray, step_count: np.ndarray) -> np.ndarray:
+    """
+    Количество угловых шагов слоев по целевой поверхностной плотности пробитий.
+
+    Для каждого слоя выбирается количество шагов, кратное radial_head_offset, при котором
+    плотность пробитий слоя (пробитий на см² его поверхности) ближе всего к целевой
+    'target_density' (при равенстве - меньшее количество шагов), если отличие не больше
+    'density_tolerance'. Если такого количества нет (грубое округление при нескольких
+    рядах игл), остается количество шагов, ближайшее к punch_step_r.
+
+    Args:
+        params (dict): Словарь параметров пробития
+        circle_len (np.ndarray): Длины окружностей слоев, мм
+        step_count (np.ndarray): Количество шагов по punch_step_r
+
+    Returns:
+        np.ndarray: Количество шагов слоев
+    """
+    config = GenerationConfig
+    tolerance = _plan_option(params, 'density_tolerance', config.DENSITY_TOLERANCE)
+    if tolerance < 0:
+        raise ValueError(f"Допуск плотности пробитий не может быть отрицательным: {tolerance}")
+    target = target_density(params)
+
+    layout = PunchLayout.from_params(params, config.VOLUMETRIC_DENSITY_MAP[params['volumetric_density']])
+    offset = _radial_head_offset(params)
+    area = np.asarray(circle_len, dtype=np.float64) * params['tube_len'] / 100.0
+    # кандидаты - до количества шагов, превышающего верхнюю границу плотности
+    active_share = active_step_count(layout, layout.circumferential_head_step) / layout.circumferential_head_step
+    limit = np.ceil(target * (1 + tolerance) * area / (layout.punches_per_crank * active_share) / offset + 1)
+    candidates = offset * np.arange(1, int(limit.max()) + 1)
+    density = active_step_count(layout, candidates)[None, :] * layout.punches_per_crank / area[:, None]
+    error = np.abs(density - target)
+    within = error <= tolerance * target + 1e-12
+    # argmin возвращает первый минимум - при равной ошибке меньшее количество шагов
+    closest = np.argmin(np.where(within, error, np.inf), axis=1)
+    return np.where(within.any(axis=1), candidates[closest], step_count).astype(np.int64)
+
+
+def target_density(params: dict) -> float:
+    """
+    Целевая поверхностная плотность пробитий (пробитий на см² поверхности слоя):
+    параметр 'target_density' или плотность при шаге punch_step_r
+
+    Args:
+        params (dict): Словарь параметров пробития
+
+    Returns:
+        float: Плотность, пробитий/см²
+    """
+    target = _plan_option(params, 'target_density', GenerationConfig.TARGET_DENSITY)
+    if target is None:
+        layout = PunchLayout.from_params(params, GenerationConfig.VOLUMETRIC_DENSITY_MAP[params['volumetric_density']])
+        active_share = active_step_count(layout, layout.circumferential_head_step) / layout.circumferential_head_step
+        return active_share * layout.punches_per_crank / (params['punch_step_r'] * params['tube_len'] / 100.0)
+    if target <= 0:
+        raise ValueError(f"Целевая плотность пробитий должна быть больше 0: {target}")
+    return float(target)
+
+
+def active_step_count(layout: PunchLayout, angle_step_count) -> np.ndarray:
+    """
+    Количество шагов с пробитием (сумма маски active_angle_steps) для массива количеств шагов
+
+    Args:
+        layout (PunchLayout): Раскладка пробитий
+        angle_step_count: Количество шагов в обороте (скаляр или массив)
+
+    Returns:
+        np.ndarray: Количество шагов с пробитием
+    """
+    head_step = layout.circumferential_head_step
+    active_in_head = min(layout.needle_step_Y, head_step)
+    full, rest = np.divmod(np.asarray(angle_step_count, dtype=np.int64), head_step)
+    return full * active_in_head + np.minimum(rest, active_in_head)
+
+
+def _radial_head_offset(params: dict) -> int:
+    """Смещение игольницы по окружности в угловых шагах (количество шагов кратно ему)"""
+    num_of_needle_rows = params.get('num_of_needle_rows', 1)
+    if num_of_needle_rows == 1:
+        return 2
+    return num_of_needle_rows * params['needle_step_Y']
+
+
+def _plan_option(params: dict, name: str, default):
+    """Параметр плана (в ключе кэша отсутствующий параметр хранится как None)"""
+    value = params.get(name)
+    return default if value is None else value
@@ -0,0 +1,421 @@
+import os
+import re
+import string
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+
+from constants.const import GenerationConfig
+from functions.tube_command_generator import TubeCommandGenerator
+from functions.gcode_file_formatter import GCodeFileFormatter, GCODE_MODE_FULL
+from functions.command_buffer import CommandBuffer
+from functions.motion_commands import PunchCommands
+from functions.gcode_stream_writer import GCodeStreamWriter, _count_punches
+from functions.time_calc import MotionTimeAccumulator
+from functions.bulk_writer import BulkFileWriter
+from functions.punch_array_engine import STROKE_PROFILE_SINGLE
+
+
+@dataclass(frozen=True)
+class MacroDialect:
+    """
+    Синтаксис подпрограмм контроллера.
+
+    Строки задаются шаблонами str.format. Разворачиватель expand_macro_program
+    разбирает программу по тем же шаблонам, поэтому новый диалект достаточно
+    описать одним экземпляром класса.
+
+    Attributes:
+        name (str): Имя диалекта
+        sub_begin (str): Начало подпрограммы ({number})
+        sub_end (str): Конец подпрограммы ({number})
+        call (str): Вызов подпрограммы с координатой X ({number}, {x})
+        assign (str): Присваивание глобальной переменной ({variable}, {value})
+        argument (str): Ссылка на аргумент X внутри подпрограммы
+        expression (str): Аргумент со смещением ({argument}, {offset} со знаком)
+        variables (Tuple[str, str, str, str]): Переменные Y, Z подхода и Y, Z внедрения
+        program_end (Optional[str]): Конец основной программы (подпрограммы записываются после него)
+        subprograms_first (bool): Подпрограммы определяются до основной программы
+        stroke_number (int): Номер подпрограммы удара (подход - внедрение - извлечение)
+        sweep_number (int): Номер первой подпрограммы прохода по X
+    """
+    name: str
+    sub_begin: str
+    sub_end: str
+    call: str
+    assign: str
+    argument: str
+    expression: str
+    variables: Tuple[str, str, str, str]
+    program_end: Optional[str]
+    subprograms_first: bool
+    stroke_number: int
+    sweep_number: int
+
+
+# Fanuc Custom Macro B: G65 с аргументом X (#24), общие переменные #100-#199,
+# подпрограммы после M30
+FANUC = MacroDialect(
+    name='fanuc', sub_begin='O{number}', sub_end='M99', call='G65 P{number} X{x}',
+    assign='{variable}={value}', argument='#24', expression='[{argument}{offset}]',
+    variables=('#101', '#102', '#103', '#104'), program_end='M30', subprograms_first=False,
+    stroke_number=9001, sweep_number=9100,
+)
+
+# LinuxCNC O-коды: подпрограммы до вызова, позиционный аргумент #1, именованные глобальные переменные
+LINUXCNC = MacroDialect(
+    name='linuxcnc', sub_begin='o{number} sub', sub_end='o{number} endsub', call='o{number} call [{x}]',
+    assign='{variable}={value}', argument='#1', expression='{argument}{offset}',
+    variables=('#<_punch_y>', '#<_punch_z>', '#<_punch_y_in>', '#<_punch_z_in>'), program_end=None,
+    subprograms_first=True, stroke_number=100, sweep_number=200,
+)
+
+DIALECTS = {dialect.name: dialect for dialect in (FANUC, LINUXCNC)}
+
+# Ограничения подпрограмм прохода по X (шаблонов смещений X в угловом шаге)
+MAX_SWEEPS = 32        # Не больше подпрограмм прохода
+MIN_SWEEP_USES = 16    # Шаблон должен повторяться хотя бы в стольких угловых шагах
+
+# Регулярные выражения полей шаблонов диалекта (для разбора программы)
+_FIELD_PATTERNS = {'number': r'\d+', 'x': r'.+', 'variable': r'#[^=\s]+', 'value': r'\S+'}
+
+# Ссылка на переменную со смещением: #24, #<_punch_y>, #1+264.0, [#24-1.001]
+_REFERENCE = re.compile(r'\[?(?P<ref>#<[^>]+>|#\d+)(?P<offset>[+-]\d+(?:\.\d+)?(?:e[+-]?\d+)?)?\]?')
+
+
+def get_dialect(dialect: Union[str, MacroDialect]) -> MacroDialect:
+    """
+    Диалект по имени (или готовый экземпляр MacroDialect)
+
+    Args:
+        dialect (Union[str, MacroDialect]): Имя диалекта из DIALECTS или диалект
+
+    Returns:
+        MacroDialect: Диалект
+    """
+    if isinstance(dialect, MacroDialect):
+        return dialect
+    if dialect not in DIALECTS:
+        raise ValueError(f"Неизвестный диалект подпрограмм: {dialect} (допустимо: {', '.join(DIALECTS)})")
+    return DIALECTS[dialect]
+
+
+class MacroProgramWriter:
+    """
+    Запись программы с ударом пробития в виде подпрограммы.
+
+    Тройка подход - внедрение - извлечение одинакова для всех пробитий слоя
+    и отличается только X, поэтому она определяется один раз (подпрограмма удара),
+    Y/Z слоя передаются через глобальные переменные (присваиваются при смене слоя),
+    а каждое пробитие - вызов с координатой X. При sweep=True повторяющиеся
+    шаблоны прохода по X в угловом шаге (смещения X относительно первого пробития)
+    выносятся в подпрограммы прохода: угловой шаг - один вызов с базовой X.
+    Шаблоны выбираются предварительным проходом генерации. Повороты, M110 и команды,
+    не совпадающие с ударом, записываются как в обычной программе.
+    Поддерживается только профиль удара 'single': двухэтапный удар (5 команд)
+    подпрограммой удара не описывается.
+    """
+
+    def __init__(self, params_dict: dict, dialect: Union[str, MacroDialect] = 'fanuc', sweep: bool = True):
+        """
+        Args:
+            params_dict (dict): Словарь параметров пробития
+            dialect (Union[str, MacroDialect]): Диалект подпрограмм
+            sweep (bool): Подпрограммы прохода по X для повторяющихся угловых шагов
+
+        Raises:
+            ValueError: Профиль удара отличается от 'single'
+        """
+        profile = params_dict.get('stroke_profile', GenerationConfig.STROKE_PROFILE)
+        if profile != STROKE_PROFILE_SINGLE:
+            raise ValueError(f"Программа с подпрограммами поддерживает только профиль удара "
+                             f"'{STROKE_PROFILE_SINGLE}', задан: {profile}")
+        self.params = params_dict
+        self.dialect = get_dialect(dialect)
+        self.sweep = sweep
+        # Строки вне подпрограмм - в полном формате (G01 в каждой строке)
+        self.formatter = GCodeFileFormatter(dict(params_dict, gcode_mode=GCODE_MODE_FULL))
+        self._feeds = (str(int(params_dict['idling_speed'])), str(int(params_dict['move_speed'])))
+
+    def write(self, path: str, function_name: str = "generate_macro_gcode_file") -> dict:
+        """
+        Генерация и запись программы с подпрограммами
+
+        Args:
+            path (str): Путь к файлу G-кода
+            function_name (str): Имя функции для заголовка
+
+        Returns:
+            dict: Сводка (time_data, command_lines, punches, macro_lines, calls, sweeps,
+                  text_bytes - размер файла, flat_bytes - размер обычной программы)
+        """
+        scan = self._scan()
+        sweeps = {}
+        if self.sweep:
+            frequent = [pattern for pattern, uses in scan['patterns'].most_common(MAX_SWEEPS)
+                        if uses >= MIN_SWEEP_USES]
+            sweeps = {pattern: self.dialect.sweep_number + idx for idx, pattern in enumerate(frequent)}
+
+        generator = TubeCommandGenerator(self.params)
+        stats = dict(generator.get_generation_statistics(), total_punches=scan['punches'])
+        # размер обычной программы: заголовок generate_gcode_file (поля фиксированной ширины) и команды
+        flat_header = self.formatter.format_header(stats, "generate_gcode_file", scan['time_data'],
+                                                   field_width=GCodeStreamWriter.HEADER_FIELD_WIDTH)
+        flat_bytes = sum(len((line + os.linesep).encode('utf-8')) for line in flat_header) + scan['command_bytes']
+        header = self.formatter.format_header(stats, function_name, scan['time_data'])
+        header.append(f';Macro dialect => {self.dialect.name}, sweep subprograms => {len(sweeps)}')
+
+        subprograms = self._subprograms(sweeps)
+        counters = {'macro_lines': 0, 'calls': 0}
+        values = [None] * len(self.dialect.variables)
+
+        with BulkFileWriter(path, atomic=True) as file:
+            file.write(''.join(line + '\n' for line in header))
+            if self.dialect.subprograms_first:
+                file.write(''.join(line + '\n' for line in subprograms))
+            for batch in generator.iter_revolution_batches():
+                lines = self._batch_lines(batch, sweeps, values, counters)
+                counters['macro_lines'] += len(lines)
+                file.write(''.join(line + '\n' for line in lines))
+            if self.dialect.program_end is not None:
+                file.write(self.dialect.program_end + '\n')
+            if not self.dialect.subprograms_first:
+                file.write(''.join(line + '\n' for line in subprograms))
+            text_bytes = file.bytes_written
+
+        return {
+            'time_data': scan['time_data'],
+            'command_lines': scan['command_lines'],
+            'punches': scan['punches'],
+            'macro_lines': counters['macro_lines'] + len(subprograms) + (self.dialect.program_end is not None),
+            'calls': counters['calls'],
+            'sweeps': len(sweeps),
+            'text_bytes': text_bytes,
+            'flat_bytes': flat_bytes,
+        }
+
+    def _scan(self) -> dict:
+        """Предварительный проход: время, пробития, размер обычной программы и шаблоны проходов по X"""
+        accumulator = MotionTimeAccumulator()
+        patterns = Counter()
+        punches = command_lines = command_bytes = 0
+        newline_extra = len(os.linesep.encode('utf-8')) - 1
+
+        for batch in TubeCommandGenerator(self.params).iter_revolution_batches():
+            accumulator.add(batch)
+            punches += _count_punches(batch)
+            command_lines += len(batch)
+            command_bytes += len(self.formatter.format_block(batch).encode('utf-8')) + newline_extra * len(batch)
+            if self.sweep:
+                strokes = self._strokes(batch)
+                for group in self._groups(strokes):
+                    pattern = self._sweep_pattern(strokes['x'][group])
+                    if pattern is not None:
+                        patterns[pattern] += 1
+
+        return {'time_data': accumulator.result(), 'punches': punches, 'command_lines': command_lines,
+                'command_bytes': command_bytes, 'patterns': patterns}
+
+    def _strokes(self, batch: CommandBuffer) -> dict:
+        """
+        Тройки подход - внедрение - извлечение батча, совпадающие с подпрограммой удара
+
+        Returns:
+            dict: rows - строки подхода, x - значения X (текст), keys - значения переменных
+                  (Y, Z подхода и Y, Z внедрения, текст)
+        """
+        approach = np.flatnonzero(batch.comment_mask([PunchCommands.APPROACH_COMMENT]))
+        approach = approach[approach + 2 < len(batch)]
+        punch_mask = batch.comment_mask([PunchCommands.PUNCH_COMMENT])
+        retract_mask = batch.comment_mask([PunchCommands.RETRACT_COMMENT])
+        approach = approach[punch_mask[approach + 1] & retract_mask[approach + 2]]
+        approach = approach[np.isnan(batch.a[approach])]  # подход с поворотом A остается командой
+
+        def texts(rows: np.ndarray, letter: str) -> np.ndarray:
+            # текст значений как в обычной программе ("" - слово не задано)
+            return np.array([word[2:] for word in self.formatter.column_words(batch, rows, letter)], dtype=object)
+
+        (x, y, z, feed), (x_punch, y_punch, z_punch, feed_punch), (x_retract, y_retract, z_retract, feed_retract) = (
+            [texts(approach + offset, letter) for letter in ("X", "Y", "Z", "F")]
+            for offset in range(3))
+        idling, move = self._feeds
+        valid = ((x != "") & (x_punch == x) & (x_retract == x) & (y != "") & (z != "")
+                 & (y_punch != "") & (z_punch != "") & (y_retract == y) & (z_retract == z)
+                 & (feed == idling) & (feed_punch == move) & (feed_retract == move))
+        keys = np.stack([y, z, y_punch, z_punch], axis=1) if approach.size else np.empty((0, 4), dtype=object)
+        return {'rows': approach[valid], 'x': x[valid], 'keys': keys[valid]}
+
+    @staticmethod
+    def _groups(strokes: dict) -> List[np.ndarray]:
+        """Группы ударов подряд (один угловой шаг) с одинаковыми значениями переменных"""
+        rows, keys = strokes['rows'], strokes['keys']
+        if rows.size == 0:
+            return []
+        breaks = np.diff(rows) != 3
+        breaks |= np.any(keys[1:] != keys[:-1], axis=1)
+        return np.split(np.arange(rows.size), np.flatnonzero(breaks) + 1)
+
+    @staticmethod
+    def _sweep_pattern(x_words: np.ndarray) -> Optional[Tuple[str, ...]]:
+        """
+        Шаблон прохода по X: смещения относительно первой X (None - если X контроллера,
+        вычисленная как база + смещение с округлением до 0.001, не совпадает с исходной)
+        """
+        if len(x_words) < 2:
+            return None
+        base = float(x_words[0])
+        pattern = []
+        for word in x_words[1:].tolist():
+            offset = round(float(word) - base, 3)
+            if str(round(base + offset, 3)) != word:
+                return None
+            pattern.append(f"{offset:+}")
+        return tuple(pattern)
+
+    def _subprograms(self, sweeps: Dict[Tuple[str, ...], int]) -> List[str]:
+        """Строки подпрограммы удара и подпрограмм прохода по X"""
+        dialect = self.dialect
+        y, z, y_punch, z_punch = dialect.variables
+        x = f" X{dialect.argument}"
+        lines = [
+            dialect.sub_begin.format(number=dialect.stroke_number),
+            f"G01{x} Y{y} Z{z} F{self._feeds[0]}",
+            f"G01{x} Y{y_punch} Z{z_punch} F{self._feeds[1]}",
+            f"G01{x} Y{y} Z{z} F{self._feeds[1]}",
+            dialect.sub_end.format(number=dialect.stroke_number),
+        ]
+        for pattern, number in sweeps.items():
+            lines.append(dialect.sub_begin.format(number=number))
+            lines.append(dialect.call.format(number=dialect.stroke_number, x=dialect.argument))
+            lines.extend(dialect.call.format(number=dialect.stroke_number,
+                                             x=dialect.expression.format(argument=dialect.argument, offset=offset))
+                         for offset in pattern)
+            lines.append(dialect.sub_end.format(number=number))
+        return lines
+
+    def _batch_lines(self, batch: CommandBuffer, sweeps: Dict[Tuple[str, ...], int], values: list,
+                     counters: dict) -> List[str]:
+        """Строки батча: вызовы подпрограмм вместо ударов, остальные команды - как есть"""
+        dialect = self.dialect
+        strokes = self._strokes(batch)
+        covered = np.zeros(len(batch), dtype=bool)
+        for offset in range(3):
+            covered[strokes['rows'] + offset] = True
+        other_rows = np.flatnonzero(~covered)
+        other_lines = self.formatter.format_commands(batch[other_rows]) if other_rows.size else []
+
+        events = [(row, line) for row, line in zip(other_rows.tolist(), other_lines)]
+        for group in self._groups(strokes):
+            lines = []
+            for variable, idx, value in zip(dialect.variables, range(4), strokes['keys'][group[0]].tolist()):
+                if values[idx] != value:
+                    values[idx] = value
+                    lines.append(dialect.assign.format(variable=variable, value=value))
+            x_words = strokes['x'][group]
+            number = sweeps.get(self._sweep_pattern(x_words)) if sweeps else None
+            if number is not None:
+                calls = [dialect.call.format(number=number, x=x_words[0])]
+            else:
+                calls = [dialect.call.format(number=dialect.stroke_number, x=word) for word in x_words.tolist()]
+            counters['calls'] += len(calls)
+            lines.extend(calls)
+            events.append((int(strokes['rows'][group[0]]), lines))
+
+        events.sort(key=lambda event: event[0])
+        result = []
+        for _, line in events:
+            if isinstance(line, list):
+                result.extend(line)
+            else:
+                result.append(line)
+        return result
+
+
+def _template_pattern(template: str) -> 're.Pattern':
+    """Регулярное выражение строки по шаблону диалекта"""
+    pattern = ''
+    for literal, field, _, _ in string.Formatter().parse(template):
+        pattern += re.escape(literal)
+        if field is not None:
+            pattern += f'(?P<{field}>{_FIELD_PATTERNS[field]})'
+    return re.compile(pattern)
+
+
+def expand_macro_program(lines: Iterable[str], dialect: Union[str, MacroDialect] = 'fanuc') -> List[str]:
+    """
+    Разворачивание программы с подпрограммами в обычные строки G-кода.
+
+    Присваивания переменных выполняются, вызовы заменяются телом подпрограммы
+    с подставленными значениями (смещения X вычисляются с округлением до 0.001).
+    Комментарии и строки заголовка отбрасываются. Результат совпадает
+    построчно с командами обычной программы без комментариев.
+
+    Args:
+        lines (Iterable[str]): Строки программы (например, read_gcode_lines(path))
+        dialect (Union[str, MacroDialect]): Диалект подпрограмм
+
+    Returns:
+        List[str]: Строки команд без комментариев и переводов строк
+    """
+    dialect = get_dialect(dialect)
+    sub_begin, sub_end = _template_pattern(dialect.sub_begin), _template_pattern(dialect.sub_end)
+    call, assign = _template_pattern(dialect.call), _template_pattern(dialect.assign)
+
+    subprograms: Dict[str, List[str]] = {}
+    main = []
+    body = None
+    finished = False
+    for line in lines:
+        line = line.split(';', 1)[0].strip()
+        if not line:
+            continue
+        match = sub_begin.fullmatch(line)
+        if match:
+            body = subprograms.setdefault(match.group('number'), [])
+            continue
+        if body is not None:
+            if sub_end.fullmatch(line):
+                body = None
+            else:
+                body.append(line)
+            continue
+        if line == dialect.program_end:
+            finished = True
+        elif not finished:
+            main.append(line)
+
+    variables = {}
+    result = []
+
+    def evaluate(text: str, local: dict) -> str:
+        match = _REFERENCE.fullmatch(text)
+        if match is None:
+            return text
+        value = local.get(match.group('ref'), variables.get(match.group('ref')))
+        if value is None:
+            raise ValueError(f"Переменная не задана: {match.group('ref')}")
+        if match.group('offset'):
+            return str(round(float(value) + float(match.group('offset')), 3))
+        return value
+
+    def run(line: str, local: dict, depth: int = 0):
+        match = assign.fullmatch(line)
+        if match:
+            variables[match.group('variable')] = evaluate(match.group('value'), local)
+            return
+        match = call.fullmatch(line)
+        if match:
+            if depth > 8 or match.group('number') not in subprograms:
+                raise ValueError(f"Неизвестная подпрограмма или слишком глубокая вложенность: {line}")
+            argument = {dialect.argument: evaluate(match.group('x'), local)}
+            for body_line in subprograms[match.group('number')]:
+                run(body_line, argument, depth + 1)
+            return
+        result.append(' '.join(word[0] + evaluate(word[1:], local) if '#' in word else word
+                               for word in line.split()))
+
+    for line in main:
+        run(line, {})
+    return result
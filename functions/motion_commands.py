@@ -157,12 +157,21 @@ class MotionCommand:
 class PunchCommands:
     """Фабричные методы для создания команд пробития"""
 
+    # Комментарии команд пробития (фиксированный набор)
+    APPROACH_COMMENT = "Подход к точке пробития"
+    PUNCH_COMMENT = "Внедрение игл"
+    RETRACT_COMMENT = "Извлечение игл"
+    ROTATE_COMMENT = "Поворот"
+    WAITING_COMMENT = "Пауза для резки"
+    SURFACE_COMMENT = "Подвод к поверхности ткани"
+    EXIT_COMMENT = "Выход игл из ткани"
+
     @staticmethod
     def approach(x: float, y: float, z: float, feed_rate: float) -> MotionCommand:
         """Команда подхода к точке пробития"""
         return MotionCommand.linear_move(
             x=x, y=y, z=z, feed_rate=feed_rate,
-            comment="Подход к точке пробития"
+            comment=PunchCommands.APPROACH_COMMENT
         )
 
     @staticmethod
@@ -170,7 +179,7 @@ class PunchCommands:
         """Команда пробития"""
         return MotionCommand.linear_move(
             x=x, y=y, z=z, feed_rate=feed_rate,
-            comment="Внедрение игл"
+            comment=PunchCommands.PUNCH_COMMENT
         )
 
     @staticmethod
@@ -178,7 +187,23 @@ class PunchCommands:
         """Команда Извлечение игла после пробития"""
         return MotionCommand.linear_move(
             x=x, y=y, z=z, feed_rate=feed_rate,
-            comment="Извлечение игл"
+            comment=PunchCommands.RETRACT_COMMENT
+        )
+
+    @staticmethod
+    def surface(x: float, y: float, z: float, feed_rate: float) -> MotionCommand:
+        """Команда быстрого подвода игл к поверхности ткани (двухэтапный удар)"""
+        return MotionCommand.linear_move(
+            x=x, y=y, z=z, feed_rate=feed_rate,
+            comment=PunchCommands.SURFACE_COMMENT
+        )
+
+    @staticmethod
+    def exit(x: float, y: float, z: float, feed_rate: float) -> MotionCommand:
+        """Команда выхода игл из ткани (двухэтапный удар, далее - быстрое извлечение)"""
+        return MotionCommand.linear_move(
+            x=x, y=y, z=z, feed_rate=feed_rate,
+            comment=PunchCommands.EXIT_COMMENT
         )
 
     @staticmethod
@@ -186,10 +211,10 @@ class PunchCommands:
         """Команда поворота"""
         return MotionCommand.linear_move(
             a=angle, feed_rate=feed_rate,
-            comment="Поворот"
+            comment=PunchCommands.ROTATE_COMMENT
         )
 
     @staticmethod
     def waiting() -> MotionCommand:
         """Команда паузы для резки"""
-        return MotionCommand.m_code(110, "Пауза для резки")
\ No newline at end of file
+        return MotionCommand.m_code(110, PunchCommands.WAITING_COMMENT)
\ No newline at end of file
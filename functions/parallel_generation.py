@@ -0,0 +1,129 @@
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from itertools import repeat
+from typing import Iterator, List, Optional, Union
+
+from functions.tube_command_generator import TubeCommandGenerator
+from functions.gcode_file_formatter import GCodeFileFormatter
+from functions.gcode_stream_writer import FormattedBatch
+from functions.command_buffer import CommandBuffer, PHASE_MAIN, PHASE_STITCHING
+from functions.motion_commands import PunchCommands
+from functions.time_calc import buffer_end_position
+
+
+# Количество шардов на один процесс (несколько шардов сглаживают разную длину оборотов)
+SHARDS_PER_WORKER = 4
+
+
+@dataclass(frozen=True)
+class RevolutionShard:
+    """
+    Диапазон оборотов, генерируемый одним заданием.
+
+    Attributes:
+        start (int): Первый оборот шарда
+        stop (int): Оборот после последнего
+        phase_start (int): Первый оборот фазы (позиция станка в начале фазы нулевая)
+        fix_z_offset (Optional[float]): Фиксированное смещение по Z (виртуальная прошивка)
+    """
+    start: int
+    stop: int
+    phase_start: int
+    fix_z_offset: Optional[float] = None
+
+
+def split_revolutions(params_dict: dict, shard_count: int) -> List[Union[RevolutionShard, CommandBuffer]]:
+    """
+    Разбиение программы на шарды в порядке выполнения: основные обороты,
+    пауза для резки M110 (готовый буфер) и обороты виртуальной прошивки
+
+    Args:
+        params_dict (dict): Словарь параметров пробития
+        shard_count (int): Желаемое количество шардов на каждую фазу
+
+    Returns:
+        List: Шарды RevolutionShard и буфер с командой M110
+    """
+    generator = TubeCommandGenerator(params_dict)
+    revolutions = generator.calclulate_number_of_revolutions()
+    extra = generator.layer_plan.extra_revolutions
+    fix_z_offset = params_dict['fabric_thickness'] * revolutions
+
+    parts = _split_range(0, revolutions, shard_count)
+    if revolutions > 0:
+        parts.append(CommandBuffer.from_commands([PunchCommands.waiting()]))
+    parts.extend(_split_range(revolutions, revolutions + extra, shard_count, fix_z_offset))
+    return parts
+
+
+def _split_range(start: int, stop: int, shard_count: int,
+                 fix_z_offset: Optional[float] = None) -> List[RevolutionShard]:
+    """Разбиение диапазона оборотов на последовательные шарды близкого размера"""
+    total = stop - start
+    shard_count = max(1, min(shard_count, total))
+    bounds = [start + total * idx // shard_count for idx in range(shard_count + 1)]
+    return [RevolutionShard(first, last, start, fix_z_offset)
+            for first, last in zip(bounds[:-1], bounds[1:]) if last > first]
+
+
+def generate_shard(params_dict: dict, shard: RevolutionShard) -> FormattedBatch:
+    """
+    Генерация и форматирование шарда (выполняется в процессе-исполнителе)
+
+    Args:
+        params_dict (dict): Словарь параметров пробития
+        shard (RevolutionShard): Диапазон оборотов
+
+    Returns:
+        FormattedBatch: Текст и время команд шарда
+    """
+    generator = TubeCommandGenerator(params_dict)
+    position = _shard_start_position(generator, shard)
+
+    generator.seek_revolution(shard.start)
+    phase = PHASE_STITCHING if shard.fix_z_offset is not None else PHASE_MAIN
+    revolutions = [generator._revolution_buffer(punches, phase) for punches in
+                   generator.generate_revolution_arrays(shard.stop - shard.start, shard.fix_z_offset)]
+    # обороты форматируются по отдельности: текст совпадает с последовательной записью по оборотам
+    return FormattedBatch.from_buffer(CommandBuffer.concatenate(revolutions), GCodeFileFormatter(params_dict),
+                                      position, revolutions)
+
+
+def _shard_start_position(generator: TubeCommandGenerator, shard: RevolutionShard):
+    """
+    Позиция станка перед первым оборотом шарда: последние заданные координаты
+    предыдущих оборотов фазы (в начале фазы позиция нулевая)
+    """
+    phase = PHASE_STITCHING if shard.fix_z_offset is not None else PHASE_MAIN
+    unknown = float('nan')
+    position = (unknown,) * 4
+
+    revolution = shard.start - 1
+    while revolution >= shard.phase_start and any(value != value for value in position):
+        punches = generator.generate_revolution(revolution, shard.fix_z_offset)
+        end = buffer_end_position(generator._revolution_buffer(punches, phase), (unknown,) * 4)
+        position = tuple(end_value if value != value else value for value, end_value in zip(position, end))
+        revolution -= 1
+
+    return tuple(0.0 if value != value else value for value in position)
+
+
+def iter_parallel_batches(params_dict: dict, workers: int) -> Iterator[Union[FormattedBatch, CommandBuffer]]:
+    """
+    Параллельная генерация программы по шардам в пуле процессов.
+    Батчи выдаются в порядке выполнения по мере готовности.
+
+    Args:
+        params_dict (dict): Словарь параметров пробития
+        workers (int): Количество процессов
+
+    Yields:
+        Union[FormattedBatch, CommandBuffer]: Отформатированные шарды и буфер с командой M110
+    """
+    parts = split_revolutions(params_dict, workers * SHARDS_PER_WORKER)
+    shards = [part for part in parts if isinstance(part, RevolutionShard)]
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(generate_shard, repeat(params_dict), shards)
+        for part in parts:
+            yield next(results) if isinstance(part, RevolutionShard) else part
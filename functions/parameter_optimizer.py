@@ -0,0 +1,192 @@
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence
+
+from constants.const import ValidationLimits
+from functions.job_estimator import estimate_job
+from functions.layer_plan import LayerPlan
+from functions.parameter_validator import ParameterValidator
+from functions.time_calc import _seconds_to_dhms
+
+
+# Количество рядов игл, перебираемое по умолчанию (в ValidationLimits не ограничено)
+NEEDLE_ROWS = (1, 2, 3)
+
+# Параметры, перебираемые оптимизатором (остальные - параметры трубы и станка из исходного словаря)
+SEARCH_PARAMS = ('punch_step_r', 'volumetric_density', 'num_of_needle_rows', 'random_border',
+                 'idling_speed', 'move_speed', 'rotate_speed')
+
+
+def default_search_space() -> Dict[str, tuple]:
+    """
+    Пространство поиска по умолчанию из ValidationLimits.
+
+    Время выполнения монотонно убывает с ростом каждой скорости, а покрытие от скоростей
+    не зависит, поэтому меньшие скорости всегда доминируются: по умолчанию перебирается
+    только верхняя граница. Для станков с меньшими фактическими ограничениями диапазоны
+    скоростей передаются явно.
+
+    Returns:
+        Dict[str, tuple]: Значения каждого перебираемого параметра
+    """
+    limits = ValidationLimits
+    return {
+        'punch_step_r': tuple(limits.ALLOWED_PUNCH_STEPS),
+        'volumetric_density': tuple(limits.ALLOWED_VOLUMETRIC_DENSITIES),
+        'num_of_needle_rows': NEEDLE_ROWS,
+        'random_border': (limits.MIN_RANDOM_BORDER, limits.MAX_RANDOM_BORDER / 2, limits.MAX_RANDOM_BORDER),
+        'idling_speed': (limits.MAX_IDLING_SPEED,),
+        'move_speed': (limits.MAX_MOVE_SPEED,),
+        'rotate_speed': (limits.MAX_ROTATE_SPEED,),
+    }
+
+
+def parameter_grid(params: dict, space: Optional[Dict[str, Sequence]] = None) -> List[dict]:
+    """
+    Все сочетания значений пространства поиска
+
+    Args:
+        params (dict): Словарь параметров пробития (труба и станок)
+        space (Optional[Dict[str, Sequence]]): Значения параметров (None - default_search_space;
+                                               отсутствующие параметры берутся из params)
+
+    Returns:
+        List[dict]: Словари параметров кандидатов
+    """
+    space = dict(default_search_space() if space is None else space)
+    names = [name for name in SEARCH_PARAMS if name in space] + [name for name in space if name not in SEARCH_PARAMS]
+    values = [tuple(space[name]) for name in names]
+    return [dict(params, **dict(zip(names, combination))) for combination in itertools.product(*values)]
+
+
+def needle_density(params: dict) -> float:
+    """
+    Метрика покрытия: проколов игл на см² площади, проходимой игольницей за основные обороты
+    (удары x ряды игл x иглы ряда / площадь слоев). Один ряд с шагом punch_step_r и несколько
+    рядов с пропуском шагов дают одинаковую плотность при разном количестве ударов.
+
+    Args:
+        params (dict): Словарь параметров пробития
+
+    Returns:
+        float: Плотность проколов, 1/см²
+    """
+    plan = LayerPlan.for_params(params)
+    main = plan.main_revolutions
+    area = float(plan.circle_len[:main].sum()) * plan.layout.x_step_count * params['head_len'] / 100.0
+    if area <= 0:
+        return 0.0
+    needles = params.get('num_of_needle_rows', 1) * params['head_len'] / params['needle_step_X']
+    return plan.main_punches * needles / area
+
+
+def evaluate_candidate(params: dict) -> dict:
+    """
+    Оценка кандидата: проверка параметров, время по модели job_estimator и покрытие
+    (выполняется в процессе-исполнителе)
+
+    Args:
+        params (dict): Словарь параметров пробития
+
+    Returns:
+        dict: params, valid, error, seconds, punches, density, random_border
+    """
+    row = {'params': params, 'valid': False, 'error': None, 'seconds': float('inf'), 'punches': 0,
+           'density': 0.0, 'random_border': params['random_border']}
+    is_valid, name, message = ParameterValidator().validate_all_parameters(params)
+    if not is_valid:
+        row['error'] = f"{name}: {message}"
+        return row
+    try:
+        estimate = estimate_job(params)
+    except (ValueError, ZeroDivisionError) as error:
+        row['error'] = str(error)
+        return row
+    row.update(valid=True, seconds=float(sum(estimate['part_seconds'])), punches=estimate['punches'],
+               density=needle_density(params))
+    return row
+
+
+def pareto_front(rows: List[dict]) -> List[dict]:
+    """
+    Парето-оптимальные кандидаты по двум критериям: меньше время и больше плотность
+    проколов. Кандидат исключается, если другой не хуже по обоим критериям и лучше
+    хотя бы по одному. Из кандидатов с одинаковыми временем и плотностью остается
+    один - с наибольшим случайным смещением (равномерность паттерна).
+
+    Проверка доминирования - один проход по кандидатам, отсортированным по времени:
+    кандидат оптимален, если его плотность больше плотности всех более быстрых.
+
+    Args:
+        rows (List[dict]): Оценки кандидатов (evaluate_candidate)
+
+    Returns:
+        List[dict]: Парето-оптимальные кандидаты по возрастанию времени
+    """
+    front, best_density = [], float('-inf')
+    for row in sorted(rows, key=lambda row: (row['seconds'], -row['density'], -row['random_border'])):
+        if row['density'] > best_density:
+            front.append(row)
+            best_density = row['density']
+    return front
+
+
+def optimize_parameters(params: dict, space: Optional[Dict[str, Sequence]] = None, workers: int = 1,
+                        min_density: Optional[float] = None, max_seconds: Optional[float] = None,
+                        min_random_border: Optional[float] = None) -> dict:
+    """
+    Поиск параметров пробития с минимальным временем выполнения при ограничениях покрытия.
+
+    Кандидаты (сочетания значений пространства поиска) оцениваются без генерации
+    команд (job_estimator, десятки миллисекунд на кандидата) параллельно в пуле процессов.
+
+    Args:
+        params (dict): Словарь параметров пробития (труба и станок)
+        space (Optional[Dict[str, Sequence]]): Пространство поиска (None - default_search_space)
+        workers (int): Количество процессов (1 - последовательно)
+        min_density (Optional[float]): Минимальная плотность проколов, 1/см²
+        max_seconds (Optional[float]): Максимальное время выполнения, с
+        min_random_border (Optional[float]): Минимальное случайное смещение
+
+    Returns:
+        dict: candidates - оценки всех кандидатов, feasible - допустимые по ограничениям,
+              pareto - Парето-оптимальные допустимые кандидаты по возрастанию времени
+    """
+    candidates = parameter_grid(params, space)
+    if workers > 1:
+        chunksize = max(1, len(candidates) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            rows = list(executor.map(evaluate_candidate, candidates, chunksize=chunksize))
+    else:
+        rows = [evaluate_candidate(candidate) for candidate in candidates]
+
+    feasible = [row for row in rows if row['valid']
+                and (min_density is None or row['density'] >= min_density)
+                and (max_seconds is None or row['seconds'] <= max_seconds)
+                and (min_random_border is None or row['random_border'] >= min_random_border)]
+    return {
+        'candidates': rows,
+        'feasible': feasible,
+        'pareto': pareto_front(feasible),
+    }
+
+
+def format_pareto(result: dict, names: Sequence[str] = SEARCH_PARAMS) -> str:
+    """
+    Таблица Парето-оптимальных кандидатов
+
+    Args:
+        result (dict): Результат optimize_parameters()
+        names (Sequence[str]): Выводимые параметры
+
+    Returns:
+        str: Отчет
+    """
+    invalid = sum(1 for row in result['candidates'] if not row['valid'])
+    lines = [f"Кандидатов: {len(result['candidates'])} (недопустимых параметров: {invalid}), "
+             f"допустимых по ограничениям: {len(result['feasible'])}, Парето-оптимальных: {len(result['pareto'])}",
+             f"{'время':>16}{'пробитий':>10}{'проколов/см²':>14}" + ''.join(f"{name:>20}" for name in names)]
+    for row in result['pareto']:
+        lines.append(f"{_seconds_to_dhms(row['seconds']):>16}{row['punches']:>10}{row['density']:>14.2f}"
+                     + ''.join(f"{row['params'][name]!s:>20}" for name in names))
+    return "\n".join(lines)
@@ -0,0 +1,217 @@
+import csv
+import io
+import itertools
+import math
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+from constants.const import GenerationConfig
+from functions.bulk_writer import BulkFileWriter
+from functions.job_estimator import grid_layer_times
+from functions.layer_plan import layer_geometry, active_step_count
+from functions.parameter_validator import ParameterValidator
+from functions.punch_array_engine import PunchLayout, STROKE_PROFILE_SINGLE
+
+
+# Параметры трубы, перебираемые сеткой (остальные параметры - из исходного словаря)
+SWEEP_PARAMS = ('i_diam', 'o_diam', 'tube_len', 'volumetric_density')
+
+# Колонки таблицы: параметры сетки, calculate_rotation_parameters, calculate_total_punches, время,
+# проверка габаритов ParameterValidator
+SWEEP_DTYPE = np.dtype([
+    ('i_diam', np.float64),
+    ('o_diam', np.float64),
+    ('tube_len', np.float64),
+    ('volumetric_density', np.int64),
+    ('main_rotation_num', np.int64),
+    ('total_rotation_num', np.int64),
+    ('calculated_o_diam', np.float64),
+    ('total_punches', np.int64),
+    ('total_fabric_len', np.float64),
+    ('zones_per_crank', np.int64),
+    ('punches_in_zone', np.int64),
+    ('part1_seconds', np.float64),
+    ('part2_seconds', np.float64),
+    ('total_seconds', np.float64),
+    ('valid', np.bool_),
+])
+
+# Опции генерации, которые модель сетки не учитывает (значения по умолчанию обязательны)
+UNSUPPORTED_OPTIONS = {
+    'merge_rotations': GenerationConfig.MERGE_ROTATIONS,
+    'blend_rotations': GenerationConfig.BLEND_ROTATIONS,
+    'stroke_profile': STROKE_PROFILE_SINGLE,
+    'density_schedule': GenerationConfig.DENSITY_SCHEDULE,
+    'stitching_substep_stride': GenerationConfig.STITCHING_SUBSTEP_STRIDE,
+    'stitching_merge_rotations': GenerationConfig.STITCHING_MERGE_ROTATIONS,
+}
+
+# Количество сочетаний в одном блоке расчета (массивы блока - сочетания x обороты)
+CHUNK_SIZE = 8192
+
+
+def sweep_grid(params: dict, values: Dict[str, Sequence], product: bool = True) -> Dict[str, np.ndarray]:
+    """
+    Плоские массивы сочетаний параметров сетки
+
+    Args:
+        params (dict): Словарь параметров пробития (значения по умолчанию для SWEEP_PARAMS)
+        values (Dict[str, Sequence]): Значения параметров сетки
+        product (bool): True - все сочетания значений (декартово произведение),
+                        False - массивы одинаковой длины задают сочетания поэлементно
+
+    Returns:
+        Dict[str, np.ndarray]: Массив каждого параметра SWEEP_PARAMS (по одному элементу на сочетание)
+    """
+    unknown = sorted(set(values) - set(SWEEP_PARAMS))
+    if unknown:
+        raise ValueError(f"Параметры {', '.join(unknown)} не перебираются сеткой: {', '.join(SWEEP_PARAMS)}")
+    arrays = [np.atleast_1d(np.asarray(values.get(name, params[name]))).ravel() for name in SWEEP_PARAMS]
+    if product:
+        arrays = np.meshgrid(*arrays, indexing='ij')
+    else:
+        arrays = np.broadcast_arrays(*arrays)
+    return {name: np.ravel(array) for name, array in zip(SWEEP_PARAMS, arrays)}
+
+
+def sweep_parameters(params: dict, values: Optional[Dict[str, Sequence]] = None, product: bool = True,
+                     chunk_size: int = CHUNK_SIZE) -> np.ndarray:
+    """
+    Векторный расчет оборотов, пробитий и времени выполнения для сетки размеров трубы
+    (предварительная оценка заказа без построения плана слоев для каждого сочетания).
+
+    Для всех сочетаний сразу рассчитываются величины GeometryCalculator
+    (calculate_rotation_parameters, calculate_total_punches) и время Part 1 / Part 2
+    по модели job_estimator. Обороты всех сочетаний блока обрабатываются одним
+    массивом (сочетания x обороты), поэтому 10^5 сочетаний считаются за секунды.
+    Количество пробитий совпадает с планом слоев, время - с estimate_job в пределах
+    TIME_TOLERANCE (углы поворотов без округления до 0.001°). Модель соответствует
+    генерации без опций UNSUPPORTED_OPTIONS. При o_diam <= i_diam основных оборотов нет.
+    Колонка 'valid' - проверка габаритов трубы ParameterValidator (пределы ValidationLimits,
+    i_diam не больше o_diam): недопустимые сочетания рассчитываются, но не генерируются.
+
+    Args:
+        params (dict): Словарь параметров пробития (станок, ткань и значения по умолчанию)
+        values (Optional[Dict[str, Sequence]]): Значения параметров SWEEP_PARAMS
+                                                (отсутствующие берутся из params)
+        product (bool): Все сочетания значений (False - поэлементные сочетания)
+        chunk_size (int): Количество сочетаний в одном блоке расчета
+
+    Returns:
+        np.ndarray: Структурированный массив SWEEP_DTYPE (строка на сочетание, порядок sweep_grid)
+    """
+    for name, default in UNSUPPORTED_OPTIONS.items():
+        if params.get(name, default) != default:
+            raise ValueError(f"Опция '{name}' не поддерживается расчетом сетки")
+    extra = params.get('extra_rotations', GenerationConfig.EXTRA_ROTATIONS)
+    if not isinstance(extra, (int, np.integer)) or extra < 0:
+        raise ValueError(f"Количество оборотов прошивки должно быть целым неотрицательным числом: {extra}")
+    if chunk_size < 1:
+        raise ValueError(f"Размер блока должен быть не меньше 1: {chunk_size}")
+
+    grid = sweep_grid(params, values or {}, product)
+    densities = np.unique(grid['volumetric_density']).tolist()
+    unknown = sorted(set(densities) - set(GenerationConfig.VOLUMETRIC_DENSITY_MAP))
+    if unknown:
+        raise ValueError(f"Недопустимые значения volumetric_density {unknown}, "
+                         f"допустимы: {sorted(GenerationConfig.VOLUMETRIC_DENSITY_MAP)}")
+    table = np.zeros(grid['i_diam'].size, dtype=SWEEP_DTYPE)
+    for name in SWEEP_PARAMS:
+        table[name] = grid[name]
+    table['valid'] = ParameterValidator().valid_dimensions(grid['tube_len'], grid['i_diam'], grid['o_diam'],
+                                                           params['punch_step_r'])
+
+    # Раскладка по окружности и подшаги X зависят только от volumetric_density
+    for density in densities:
+        indices = np.flatnonzero(grid['volumetric_density'] == density)
+        for start in range(0, indices.size, chunk_size):
+            chunk = indices[start:start + chunk_size]
+            columns = _sweep_chunk(params, int(extra), int(density), grid['i_diam'][chunk],
+                                   grid['o_diam'][chunk], grid['tube_len'][chunk])
+            for name, column in columns.items():
+                table[name][chunk] = column
+    return table
+
+
+def write_sweep_csv(table: np.ndarray, path: str):
+    """
+    Запись таблицы сетки в CSV (колонки SWEEP_DTYPE)
+
+    Args:
+        table (np.ndarray): Результат sweep_parameters()
+        path (str): Путь к файлу CSV
+    """
+    text = io.StringIO()
+    writer = csv.writer(text, lineterminator='\n')
+    writer.writerow(table.dtype.names)
+    writer.writerows(table.tolist())
+    with BulkFileWriter(path, atomic=True) as file:
+        file.write(text.getvalue())
+
+
+def parse_sweep_values(text: str) -> np.ndarray:
+    """
+    Значения параметра сетки из строки: список через запятую ("60,80,100")
+    и/или диапазоны "начало:конец:шаг" (конец включительно)
+
+    Args:
+        text (str): Строка значений
+
+    Returns:
+        np.ndarray: Значения параметра
+    """
+    values = []
+    for part in text.split(','):
+        bounds = [float(value) for value in part.split(':')]
+        if len(bounds) == 1:
+            values.append(bounds)
+        elif len(bounds) == 3 and bounds[2] > 0:
+            count = int(math.floor((bounds[1] - bounds[0]) / bounds[2] + 1e-9)) + 1
+            values.append(bounds[0] + bounds[2] * np.arange(max(count, 0)))
+        else:
+            raise ValueError(f"Диапазон должен иметь вид начало:конец:шаг (шаг больше 0): {part}")
+    return np.array(list(itertools.chain.from_iterable(values)), dtype=np.float64)
+
+
+def _sweep_chunk(params: dict, extra: int, density: int, i_diam: np.ndarray, o_diam: np.ndarray,
+                 tube_len: np.ndarray) -> Dict[str, np.ndarray]:
+    """Колонки таблицы для блока сочетаний с одинаковой volumetric_density"""
+    config = GenerationConfig
+    volumetric_density = config.VOLUMETRIC_DENSITY_MAP[density]
+    layout = PunchLayout.from_params(dict(params, tube_len=params['head_len']), volumetric_density)
+    thickness = params['fabric_thickness']
+
+    # Обороты (main_revolution_count для массивов)
+    ideal_rotation_num = (o_diam - i_diam) / (thickness * 2)
+    main = np.maximum(np.ceil(ideal_rotation_num / volumetric_density) * volumetric_density, 0).astype(np.int64)
+    total = main + extra
+    revolution = np.arange(int(total.max()) if total.size else 0)[None, :]
+    in_plan = revolution < total[:, None]
+    in_main = revolution < main[:, None]
+
+    # Слои всех сочетаний блока: сочетания x обороты
+    _, circle_len, step_count = layer_geometry(dict(params, i_diam=i_diam[:, None]), revolution)
+    active = active_step_count(layout, step_count)
+    x_step_count = np.ceil(tube_len / params['head_len']).astype(np.int64)
+    punches_per_crank = x_step_count * layout.x_substep_count
+    punches = np.where(in_plan, active * punches_per_crank[:, None], 0)
+
+    seconds = grid_layer_times(params, layout, x_step_count, main, total, step_count, active)
+    part1 = np.where(in_main, seconds, 0.0).sum(axis=1)
+    part2 = seconds.sum(axis=1) - part1
+    # Без основных оборотов прошивка - единственная фаза (Part 1), как в estimate_job
+    part1, part2 = np.where(main > 0, part1, part2), np.where(main > 0, part2, 0.0)
+
+    return {
+        'main_rotation_num': main,
+        'total_rotation_num': total,
+        'calculated_o_diam': i_diam + main * thickness * 2,
+        'total_punches': punches.sum(axis=1),
+        'total_fabric_len': np.where(in_main, circle_len, 0.0).sum(axis=1),
+        'zones_per_crank': x_step_count,
+        'punches_in_zone': np.full(i_diam.size, layout.x_substep_count),
+        'part1_seconds': part1,
+        'part2_seconds': part2,
+        'total_seconds': part1 + part2,
+    }
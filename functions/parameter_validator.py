@@ -119,6 +119,23 @@ class ParameterValidator:
 
         return True, None, None
 
+    def valid_dimensions(self, tube_len, i_diam, o_diam, punch_step_r):
+        """
+        Проверка габаритов трубы и геометрических зависимостей (как в _check_dimensional_limits)
+        для массивов numpy: маска допустимых сочетаний сетки размеров
+
+        Args:
+            tube_len, i_diam, o_diam (np.ndarray): Длина трубы, внутренний и внешний диаметры
+            punch_step_r (float): Окружной шаг
+
+        Returns:
+            np.ndarray: True - сочетание проходит проверку
+        """
+        return ((tube_len < self.limits.MAX_TUBE_LENGTH + 0.001) & (tube_len > self.limits.MIN_TUBE_LENGTH - 0.001)
+                & (i_diam > self.limits.MIN_INNER_DIAMETER - 0.001) & (i_diam < self.limits.MAX_INNER_DIAMETER + 0.001)
+                & (o_diam < self.limits.MAX_OUTER_DIAMETER + 0.001) & (o_diam > self.limits.MIN_OUTER_DIAMETER - 0.001)
+                & (i_diam <= o_diam) & (punch_step_r <= i_diam * 3.14))
+
     def _check_discrete_values(self, params_dict):
         """Проверка дискретных значений"""
         checks = [
@@ -0,0 +1,129 @@
+from dataclasses import replace
+from typing import Tuple
+
+import numpy as np
+
+from functions.punch_array_engine import RevolutionPunches
+from functions.time_calc import time_for_moves, ACCEL_LINEAR
+
+
+# Ограничения оптимизатора порядка пробитий
+PATH_CONSTRAINT_ALTERNATE = 'alternate'  # Соседние шаги с пробитием проходятся в противоположных направлениях
+PATH_CONSTRAINT_FREE = 'free'            # Направление каждого шага выбирается свободно
+PATH_CONSTRAINTS = (PATH_CONSTRAINT_ALTERNATE, PATH_CONSTRAINT_FREE)
+
+# Направления прохода шага
+_ASCENDING = 0   # от меньшего X к большему
+_DESCENDING = 1  # от большего X к меньшему
+
+
+def check_path_constraint(constraint: str) -> str:
+    """
+    Проверка ограничения оптимизатора
+
+    Args:
+        constraint (str): Ограничение ('alternate' или 'free')
+
+    Returns:
+        str: Ограничение
+    """
+    if constraint not in PATH_CONSTRAINTS:
+        raise ValueError(f"Неизвестное ограничение порядка пробитий: {constraint} "
+                         f"(допустимо: {', '.join(PATH_CONSTRAINTS)})")
+    return constraint
+
+
+def revolution_end(punches: RevolutionPunches) -> Tuple[float, float, float]:
+    """
+    Позиция (x, y, z) после последнего пробития оборота при оптимизированном порядке.
+
+    Последний шаг оборота всегда проходится в направлении змейки, поэтому позиция
+    зависит только от набора X последнего шага, а не от порядка внутри оборота:
+    оборот можно оптимизировать независимо, зная только предыдущий оборот.
+
+    Args:
+        punches (RevolutionPunches): Координаты пробитий оборота (в любом порядке)
+
+    Returns:
+        Tuple[float, float, float]: Позиция извлечения последнего пробития
+    """
+    last = punches.x[-1]
+    x = last.max() if _snake_direction(punches)[-1] == _ASCENDING else last.min()
+    return float(x), punches.y, punches.z
+
+
+def optimize_revolution_path(punches: RevolutionPunches, entry: Tuple[float, float, float],
+                             speed: float, constraint: str = PATH_CONSTRAINT_ALTERNATE) -> RevolutionPunches:
+    """
+    Порядок пробитий оборота с минимальным временем перемещений по X.
+
+    Внутри углового шага пробития проходятся монотонно по X (каждый промежуток
+    проходится один раз), направление прохода шагов выбирается динамическим
+    программированием по времени подходов (модель разгона time_calc): от позиции
+    входа в оборот до первого пробития и между последним пробитием шага и первым
+    пробитием следующего. Последний шаг проходится в направлении змейки
+    (см. revolution_end). Набор X каждого шага не меняется, поэтому покрытие
+    паттерна (углы, координаты и случайные смещения пробитий) сохраняется.
+
+    Args:
+        punches (RevolutionPunches): Координаты пробитий оборота
+        entry (Tuple[float, float, float]): Позиция (x, y, z) перед первым подходом оборота
+        speed (float): Скорость подхода, мм/мин (idling_speed)
+        constraint (str): 'alternate' - соседние шаги в противоположных направлениях,
+                          'free' - направление каждого шага выбирается свободно
+
+    Returns:
+        RevolutionPunches: Оборот с переставленными X
+    """
+    check_path_constraint(constraint)
+    if punches.x.size == 0:
+        return punches
+
+    ordered = np.sort(punches.x, axis=1)
+    starts = np.stack([ordered[:, 0], ordered[:, -1]], axis=1)   # первый X шага по направлениям
+    ends = starts[:, ::-1]                                        # последний X шага по направлениям
+    snake = _snake_direction(punches)
+    last = snake[-1]
+    count = ordered.shape[0]
+
+    if constraint == PATH_CONSTRAINT_ALTERNATE:
+        directions = last ^ ((count - 1 - np.arange(count)) % 2)
+    else:
+        directions = _best_directions(starts, ends, snake, entry, (punches.y, punches.z), speed / 60.0)
+
+    x = np.where((directions == _ASCENDING)[:, None], ordered, ordered[:, ::-1])
+    return replace(punches, x=np.ascontiguousarray(x))
+
+
+def _best_directions(starts: np.ndarray, ends: np.ndarray, snake: np.ndarray,
+                     entry: Tuple[float, float, float], heights: Tuple[float, float],
+                     speed: float) -> np.ndarray:
+    """
+    Направления шагов с минимальным временем подходов между шагами
+    (при равном времени сохраняется направление змейки)
+    """
+    count = starts.shape[0]
+    lateral = (heights[0] - entry[1]) ** 2 + (heights[1] - entry[2]) ** 2
+    cost = time_for_moves(np.sqrt((starts[0] - entry[0]) ** 2 + lateral), speed, ACCEL_LINEAR)
+    previous = np.zeros((count, 2), dtype=np.int64)
+
+    # переход: время подхода из конца шага i-1 (направление строки) в начало шага i (направление столбца)
+    moves = time_for_moves(np.abs(starts[1:, None, :] - ends[:-1, :, None]), speed, ACCEL_LINEAR)
+    for step in range(1, count):
+        total = cost[:, None] + moves[step - 1]
+        # при равенстве предпочтение - направлению змейки предыдущего шага
+        best = np.where(total[1 - snake[step - 1]] < total[snake[step - 1]], 1 - snake[step - 1], snake[step - 1])
+        previous[step] = best
+        cost = total[best, [0, 1]]
+
+    directions = np.empty(count, dtype=np.int64)
+    directions[-1] = snake[-1]
+    for step in range(count - 1, 0, -1):
+        directions[step - 1] = previous[step, directions[step]]
+    return directions
+
+
+def _snake_direction(punches: RevolutionPunches) -> np.ndarray:
+    """Направления шагов с пробитием по исходной змейке (0 - по возрастанию X)"""
+    steps = np.flatnonzero(punches.active)
+    return ((punches.revolution * punches.active.size + steps) % 2 != 0).astype(np.int64)
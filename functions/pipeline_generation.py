@@ -0,0 +1,219 @@
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, Iterator, Optional, Union
+
+from functions.tube_command_generator import TubeCommandGenerator
+from functions.gcode_file_formatter import GCodeFileFormatter
+from functions.gcode_stream_writer import FormattedBatch
+from functions.command_buffer import CommandBuffer
+
+
+# Емкость очередей между стадиями (в батчах-оборотах): ограничивает память
+# и притормаживает генерацию, если запись на диск не успевает (backpressure)
+PIPELINE_QUEUE_SIZE = 4
+
+# Период проверки флага остановки при ожидании очереди, с
+_POLL_INTERVAL = 0.1
+
+# Маркер конца потока батчей
+_END = object()
+
+
+@dataclass
+class StageCounters:
+    """
+    Счетчики стадии конвейера.
+
+    Attributes:
+        name (str): Имя стадии
+        items (int): Обработано батчей
+        lines (int): Обработано строк G-кода
+        bytes (int): Выдано байт (для стадий форматирования и записи)
+        busy_seconds (float): Время работы стадии
+        wait_seconds (float): Время ожидания соседних стадий (пустая или полная очередь)
+    """
+    name: str
+    items: int = 0
+    lines: int = 0
+    bytes: int = 0
+    busy_seconds: float = 0.0
+    wait_seconds: float = 0.0
+
+    @property
+    def lines_per_second(self) -> float:
+        """Пропускная способность стадии, строк в секунду работы"""
+        return self.lines / self.busy_seconds if self.busy_seconds > 0 else 0.0
+
+    def summary(self) -> str:
+        """Строка отчета по стадии"""
+        return (f"{self.name}: {self.items} батчей, {self.lines} строк, "
+                f"{self.bytes / 2 ** 20:.1f} МБ, работа {self.busy_seconds:.2f} с, "
+                f"ожидание {self.wait_seconds:.2f} с, {self.lines_per_second:.0f} строк/с")
+
+
+class _StageFailure:
+    """Исключение стадии, передаваемое по конвейеру вниз по течению"""
+
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+class GenerationPipeline:
+    """
+    Конвейер генерация -> форматирование -> запись на отдельных потоках.
+
+    Стадия генерации выдает батчи-обороты TubeCommandGenerator, стадия форматирования
+    переводит их в UTF-8 (FormattedBatch с временем команд), стадия записи (поток,
+    итерирующий конвейер) сбрасывает байты на диск. Стадии связаны очередями
+    ограниченной емкости: при медленной записи генерация приостанавливается.
+    Исключение любой стадии останавливает остальные и повторно возбуждается
+    в потоке записи. Порядок батчей и результат совпадают с последовательной записью.
+
+    Использование:
+        pipeline = GenerationPipeline(params)
+        GCodeStreamWriter(params).write(pipeline, stats, path)
+        print(pipeline.report())
+    """
+
+    def __init__(self, params_dict: dict, queue_size: int = PIPELINE_QUEUE_SIZE):
+        """
+        Args:
+            params_dict (dict): Словарь параметров пробития
+            queue_size (int): Емкость очередей между стадиями (в батчах)
+        """
+        self.params = params_dict
+        self.queue_size = queue_size
+        self.counters: Dict[str, StageCounters] = {
+            name: StageCounters(name) for name in ('generate', 'format', 'write')
+        }
+        self._stop = threading.Event()
+
+    def __iter__(self) -> Iterator[Union[FormattedBatch, CommandBuffer]]:
+        """
+        Запуск стадий генерации и форматирования; итерация выполняется стадией записи
+
+        Yields:
+            Union[FormattedBatch, CommandBuffer]: Отформатированные обороты и буфер с командой M110
+        """
+        self._stop.clear()
+        generated = queue.Queue(self.queue_size)
+        formatted = queue.Queue(self.queue_size)
+
+        generator = TubeCommandGenerator(self.params)
+        threads = [
+            threading.Thread(target=self._run_stage, name='gcode-generate', daemon=True,
+                             args=(generator.iter_revolution_batches(), None, generated,
+                                   self.counters['generate'])),
+            threading.Thread(target=self._run_stage, name='gcode-format', daemon=True,
+                             args=(self._iter_queue(generated, self.counters['format']),
+                                   self._formatter(), formatted, self.counters['format'])),
+        ]
+        for thread in threads:
+            thread.start()
+
+        counters = self.counters['write']
+        try:
+            for batch in self._iter_queue(formatted, counters):
+                start = time.perf_counter()
+                yield batch
+                counters.busy_seconds += time.perf_counter() - start
+                counters.items += 1
+                counters.lines += _batch_lines(batch)
+                counters.bytes += len(batch.text) if isinstance(batch, FormattedBatch) else 0
+        finally:
+            # Остановка стадий (в том числе при ошибке записи)
+            self._stop.set()
+            for thread in threads:
+                thread.join()
+
+    def report(self) -> str:
+        """
+        Отчет о пропускной способности стадий
+
+        Returns:
+            str: По одной строке на стадию
+        """
+        return "\n".join(counters.summary() for counters in self.counters.values())
+
+    def _formatter(self) -> Callable:
+        """Функция стадии форматирования: оборот -> FormattedBatch (текст в UTF-8)"""
+        formatter = GCodeFileFormatter(self.params)
+        position = [(0.0, 0.0, 0.0, 0.0)]
+
+        def format_batch(buffer: CommandBuffer):
+            # Батч с M110 передается как есть: после него позиция станка нулевая
+            if buffer.find_m_code(110) != -1:
+                position[0] = (0.0, 0.0, 0.0, 0.0)
+                return buffer
+            batch = FormattedBatch.from_buffer(buffer, formatter, position[0])
+            batch.text = batch.text.encode('utf-8')
+            position[0] = batch.position
+            return batch
+
+        return format_batch
+
+    def _run_stage(self, source: Iterable, work: Optional[Callable], output: queue.Queue,
+                   counters: StageCounters):
+        """Цикл стадии: батч из источника -> обработка -> очередь следующей стадии"""
+        try:
+            iterator = iter(source)
+            while True:
+                start = time.perf_counter()
+                waited = counters.wait_seconds
+                batch = next(iterator, _END)
+                if batch is _END:
+                    break
+                if work is not None:
+                    batch = work(batch)
+                # ожидание очереди-источника учтено в wait_seconds
+                counters.busy_seconds += time.perf_counter() - start - (counters.wait_seconds - waited)
+                counters.items += 1
+                counters.lines += _batch_lines(batch)
+                if isinstance(batch, FormattedBatch):
+                    counters.bytes += len(batch.text)
+                if not self._put(output, batch, counters):
+                    return
+            self._put(output, _END, counters)
+        except BaseException as error:
+            self._put(output, _StageFailure(error), counters)
+
+    def _put(self, output: queue.Queue, item, counters: StageCounters) -> bool:
+        """Передача в очередь с ожиданием свободного места; False - конвейер остановлен"""
+        start = time.perf_counter()
+        try:
+            while not self._stop.is_set():
+                try:
+                    output.put(item, timeout=_POLL_INTERVAL)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        finally:
+            counters.wait_seconds += time.perf_counter() - start
+
+    def _iter_queue(self, source: queue.Queue, counters: StageCounters) -> Iterator:
+        """Батчи из очереди до маркера конца; исключение предыдущей стадии возбуждается заново"""
+        while True:
+            start = time.perf_counter()
+            item = None
+            while item is None:
+                if self._stop.is_set():
+                    return
+                try:
+                    item = source.get(timeout=_POLL_INTERVAL)
+                except queue.Empty:
+                    continue
+            counters.wait_seconds += time.perf_counter() - start
+
+            if item is _END:
+                return
+            if isinstance(item, _StageFailure):
+                raise item.error
+            yield item
+
+
+def _batch_lines(batch: Union[FormattedBatch, CommandBuffer]) -> int:
+    """Количество строк G-кода в батче"""
+    return batch.command_lines if isinstance(batch, FormattedBatch) else len(batch)
@@ -4,7 +4,17 @@ from datetime import datetime
 
 from functions.parameter_validator import ParameterValidator
 from functions.advanced_punch_generator import CommandLinesGenerator
-from functions.time_calc import time_prediction_motioncommand
+from functions.time_calc import time_prediction_motioncommand, MotionTimeAccumulator
+from functions.tube_command_generator import TubeCommandGenerator
+from functions.bulk_writer import BulkFileWriter
+from functions.compressed_io import compression_from_path
+from functions.program_splitter import ProgramSplitter
+from functions.macro_program import MacroProgramWriter
+from functions.job_estimator import (estimate_rotation_merge, format_rotation_merge, estimate_density_schedule,
+                                    format_density_schedule)
+from functions.punch_array_engine import STROKE_PROFILE_SINGLE, STROKE_PROFILE_TWO_STAGE
+from functions.gcode_file_formatter import GCodeFileFormatter
+from constants.const import GenerationConfig
 from functions.advanced_punch_generator import CommandLinesGenerator
 
 
@@ -21,6 +31,8 @@ def current_time():
 def write_in_file_by_lines(lines, path):
     """
     Записывает список строк в файл, перезаписывая существующее содержимое.
+    Строки кодируются в UTF-8 блоками по несколько МБ (BulkFileWriter),
+    файл заменяется атомарно после успешной записи.
 
     Args:
         lines (list): Список строк для записи
@@ -30,7 +42,7 @@ def write_in_file_by_lines(lines, path):
         bool: True если запись успешна, False при ошибке
     """
     try:
-        with open(path, "w", encoding="utf-8") as file:
+        with BulkFileWriter(path, atomic=True) as file:
             file.writelines(lines)
         return True
     except IOError as e:
@@ -92,9 +104,60 @@ def calculate_execution_time(params_dict):
         list: [[time_str_part1, time_sec_part1], [time_str_part2, time_sec_part2], [time_str_total, time_sec_total]]
     """
     generator = CommandLinesGenerator(params_dict)
-    commands = generator.generate_commands_only()
+    commands = generator.generate_command_buffer()
     return time_prediction_motioncommand(commands)
 
+def compare_execution_time(before_params, after_params):
+    """
+    Сравнение времени выполнения двух вариантов программы без записи файлов
+    (потоковый расчет по оборотам, программа целиком в памяти не хранится).
+
+    Args:
+        before_params (dict): Параметры исходного варианта
+        after_params (dict): Параметры сравниваемого варианта
+
+    Returns:
+        dict: lines - количество строк команд (до, после),
+              part_seconds - время Part 1 и Part 2 (до, после) в секундах,
+              saved_seconds - экономия Part 1, Part 2 и всего в секундах
+    """
+    lines, part_seconds = [], []
+    for params in (before_params, after_params):
+        accumulator = MotionTimeAccumulator()
+        count = 0
+        for batch in TubeCommandGenerator(params).iter_revolution_batches():
+            accumulator.add(batch)
+            count += len(batch)
+        lines.append(count)
+        part_seconds.append(tuple((accumulator.part_times + [0.0])[:2]))
+    saved = [before - after for before, after in zip(*part_seconds)]
+    return {
+        'lines': tuple(lines),
+        'part_seconds': tuple(part_seconds),
+        'saved_seconds': tuple(saved + [sum(saved)]),
+    }
+
+
+def format_time_comparison(title, comparison):
+    """
+    Строка отчета по результату compare_execution_time
+
+    Args:
+        title (str): Название оптимизации
+        comparison (dict): Результат compare_execution_time
+
+    Returns:
+        str: Отчет (доля - от времени исходного варианта)
+    """
+    before = list(comparison['part_seconds'][0]) + [sum(comparison['part_seconds'][0])]
+    parts = []
+    for name, seconds, total in zip(("Part 1", "Part 2", "всего"), comparison['saved_seconds'], before):
+        share = seconds / total * 100 if total > 0 else 0.0
+        parts.append(f"{name}: {seconds:.1f} с ({share:.2f}%)")
+    lines_before, lines_after = comparison['lines']
+    return f"{title}: строк {lines_before} -> {lines_after}, экономия времени " + ", ".join(parts)
+
+
 def generate_command_lines(params_dict):
     """
     Генерация G-кода для пробития треугольного паттерна радиально-спиральным методом
@@ -107,4 +170,115 @@ def generate_command_lines(params_dict):
         list: Список строк G-кода с переносами строк
     """
     generator = CommandLinesGenerator(params_dict)
-    return generator.generate_radial_spiral_pattern()
\ No newline at end of file
+    return generator.generate_radial_spiral_pattern()
+
+
+def generate_gcode_file(params_dict, path, workers=1, pipeline=False, compression=None, level=None):
+    """
+    Потоковая генерация G-кода сразу в файл (без хранения всей программы в памяти).
+    Заголовок со временем выполнения и количеством пробитий дописывается после генерации.
+    Сводка записи и отчеты - write_gcode_file / generation_reports.
+
+    Args:
+        params_dict (dict): Словарь параметров пробития
+        path (str): Путь к файлу для записи
+        workers (int): Количество процессов генерации (1 - последовательно)
+        pipeline (bool): Генерация, форматирование и запись на отдельных потоках
+        compression (str): Сжатие файла 'gz' или 'xz' (None - по расширению пути .gz / .xz)
+        level (int): Уровень сжатия (None - по умолчанию)
+
+    Returns:
+        list: [[time_str_part1, time_sec_part1], [time_str_part2, time_sec_part2], [time_str_total, time_sec_total]]
+    """
+    return write_gcode_file(params_dict, path, workers=workers, pipeline=pipeline,
+                            compression=compression, level=level)['time_data']
+
+
+def write_gcode_file(params_dict, path, workers=1, pipeline=False, compression=None, level=None):
+    """
+    Потоковая генерация G-кода в файл со сводкой записи (параметры - как у generate_gcode_file)
+
+    Returns:
+        dict: Сводка записи: time_data, command_lines, punches, text_bytes, saved_bytes,
+              pipeline_report - отчет по стадиям конвейера (None без pipeline)
+    """
+    if compression is None:
+        compression = compression_from_path(path)
+    generator = CommandLinesGenerator(params_dict, workers=workers, pipeline=pipeline)
+    summary = generator.write_radial_spiral_pattern(path, "generate_gcode_file",
+                                                    compression=compression, level=level)
+    return dict(summary, pipeline_report=generator.pipeline_report)
+
+
+def generation_reports(params_dict, summary):
+    """
+    Отчеты по записанной программе: стадии конвейера, экономия формата и выигрыш
+    каждой включенной оптимизации. Сравнения с исходным вариантом (compare_execution_time)
+    повторяют расчет программы, поэтому отчеты строятся только по запросу.
+
+    Args:
+        params_dict (dict): Словарь параметров пробития
+        summary (dict): Результат write_gcode_file
+
+    Returns:
+        list: Строки отчета
+    """
+    config = GenerationConfig
+    reports = []
+    if summary.get('pipeline_report'):
+        reports.append(summary['pipeline_report'])
+    if summary['saved_bytes']:
+        reports.append(GCodeFileFormatter(params_dict).format_savings(summary['saved_bytes'], summary['text_bytes'],
+                                                                       summary['command_lines']))
+    if params_dict.get('merge_rotations', config.MERGE_ROTATIONS):
+        reports.append(format_rotation_merge(estimate_rotation_merge(params_dict), summary['time_data']))
+    if params_dict.get('blend_rotations', config.BLEND_ROTATIONS):
+        comparison = compare_execution_time(dict(params_dict, blend_rotations=False), params_dict)
+        reports.append(format_time_comparison("Совмещение поворота с подходом", comparison))
+    if params_dict.get('stroke_profile', config.STROKE_PROFILE) == STROKE_PROFILE_TWO_STAGE:
+        comparison = compare_execution_time(dict(params_dict, stroke_profile=STROKE_PROFILE_SINGLE), params_dict)
+        reports.append(format_time_comparison("Двухэтапный удар", comparison))
+    if params_dict.get('density_schedule', config.DENSITY_SCHEDULE):
+        reports.append(format_density_schedule(estimate_density_schedule(params_dict), layers=False))
+    if params_dict.get('optimize_path', config.OPTIMIZE_PATH):
+        comparison = compare_execution_time(dict(params_dict, optimize_path=False), params_dict)
+        reports.append(format_time_comparison("Оптимизация порядка пробитий", comparison))
+    return reports
+
+
+def generate_split_gcode_files(params_dict, path, by_part=True, max_lines=None, max_bytes=None):
+    """
+    Генерация G-кода несколькими файлами-частями (для контроллеров с ограничением
+    размера программы). Части режутся на границах оборотов, каждая следующая
+    часть восстанавливает положение станка. Рядом записывается манифест JSON.
+
+    Args:
+        params_dict (dict): Словарь параметров пробития
+        path (str): Путь к программе (program.txt -> program.part01.txt, ..., program.manifest.json)
+        by_part (bool): Начинать новую часть после паузы для резки M110
+        max_lines (int): Максимальное количество строк файла части (None - без ограничения)
+        max_bytes (int): Максимальный размер файла части в байтах (None - без ограничения)
+
+    Returns:
+        dict: Манифест с временем, строками и оборотами каждой части
+    """
+    splitter = ProgramSplitter(params_dict, by_part=by_part, max_lines=max_lines, max_bytes=max_bytes)
+    return splitter.write(path)
+
+
+def generate_macro_gcode_file(params_dict, path, dialect='fanuc', sweep=True):
+    """
+    Генерация G-кода с ударом пробития в виде подпрограммы: каждое пробитие -
+    вызов с координатой X, повторяющиеся проходы по X - подпрограммы прохода.
+    Эквивалентность обычной программе проверяется expand_macro_program.
+
+    Args:
+        params_dict (dict): Словарь параметров пробития
+        path (str): Путь к файлу для записи
+        dialect (str): Диалект подпрограмм ('fanuc', 'linuxcnc')
+        sweep (bool): Подпрограммы прохода по X для повторяющихся угловых шагов
+
+    Returns:
+        dict: Сводка записи (time_data, размер файла и обычной программы, количество вызовов)
+    """
+    return MacroProgramWriter(params_dict, dialect=dialect, sweep=sweep).write(path)
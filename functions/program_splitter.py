@@ -0,0 +1,238 @@
+import json
+import os
+from dataclasses import dataclass, asdict
+from typing import List, Optional, Tuple
+
+from functions.tube_command_generator import TubeCommandGenerator
+from functions.gcode_file_formatter import GCodeFileFormatter
+from functions.gcode_stream_writer import GCodeStreamWriter, _count_punches
+from functions.bulk_writer import BulkFileWriter
+from functions.motion_commands import MotionCommand
+from functions.time_calc import (MotionTimeAccumulator, buffer_move_times, buffer_end_position,
+                                 sum_move_times, _seconds_to_dhms)
+
+
+# Комментарий команд восстановления состояния в начале части
+RESTORE_COMMENT = "Восстановление положения"
+
+
+@dataclass
+class ProgramPart:
+    """
+    Часть программы, записанная в отдельный файл.
+
+    Attributes:
+        index (int): Номер части (с 1)
+        file (str): Имя файла части
+        revolutions (Tuple[int, int]): Первый и последний оборот части (-1, -1 - без оборотов)
+        program_lines (Tuple[int, int]): Диапазон строк команд в исходной программе (с 1, без заголовка)
+        lines (int): Количество строк в файле части (с заголовком и преамбулой)
+        bytes (int): Размер файла части
+        time (list): Время выполнения команд части [строка, секунды]
+        seconds (float): Время выполнения в секундах (без округления)
+        punches (int): Количество пробитий
+        pause (bool): Часть заканчивается паузой для резки M110
+    """
+    index: int
+    file: str
+    revolutions: Tuple[int, int] = (-1, -1)
+    program_lines: Tuple[int, int] = (0, 0)
+    lines: int = 0
+    bytes: int = 0
+    time: list = None
+    seconds: float = 0.0
+    punches: int = 0
+    pause: bool = False
+
+
+class ProgramSplitter:
+    """
+    Запись программы несколькими файлами-частями для контроллеров с ограничением
+    размера программы.
+
+    Программа режется только на границах оборотов: по паузе для резки M110
+    (by_part), по максимальному количеству строк (max_lines) и/или байт (max_bytes)
+    файла части. Пауза M110 остается в конце части перед резкой. Каждая часть,
+    кроме первой, начинается с преамбулы, которая восстанавливает положение Y/Z
+    (отвод), X, A и модальную подачу на конец предыдущей части. Рядом с частями
+    записывается манифест (JSON) со временем, строками и оборотами каждой части.
+    """
+
+    # Ширина (в байтах UTF-8) дозаписываемых строк заголовка части
+    HEADER_FIELD_WIDTH = GCodeStreamWriter.HEADER_FIELD_WIDTH
+
+    def __init__(self, params_dict: dict, by_part: bool = True, max_lines: Optional[int] = None,
+                 max_bytes: Optional[int] = None):
+        """
+        Args:
+            params_dict (dict): Словарь параметров пробития
+            by_part (bool): Начинать новую часть после паузы M110
+            max_lines (Optional[int]): Максимальное количество строк файла части
+            max_bytes (Optional[int]): Максимальный размер файла части в байтах
+        """
+        self.params = params_dict
+        self.by_part = by_part
+        self.max_lines = max_lines
+        self.max_bytes = max_bytes
+        self.formatter = GCodeFileFormatter(params_dict)
+        self._newline_extra = len(os.linesep.encode('utf-8')) - 1
+
+    @staticmethod
+    def part_path(path: str, index: int) -> str:
+        """Путь к файлу части: program.txt -> program.part01.txt"""
+        root, extension = os.path.splitext(path)
+        return f"{root}.part{index:02d}{extension}"
+
+    @staticmethod
+    def manifest_path(path: str) -> str:
+        """Путь к манифесту: program.txt -> program.manifest.json"""
+        return os.path.splitext(path)[0] + ".manifest.json"
+
+    def write(self, path: str) -> dict:
+        """
+        Генерация программы и запись по частям
+
+        Args:
+            path (str): Путь к программе (части и манифест записываются рядом)
+
+        Returns:
+            dict: Манифест (также записывается в manifest_path(path))
+        """
+        self._program_name = os.path.basename(path)
+        generator = TubeCommandGenerator(self.params)
+        accumulator = MotionTimeAccumulator()
+        parts: List[ProgramPart] = []
+
+        writer = None
+        part = None
+        new_part = False
+        model_position = (0.0, 0.0, 0.0, 0.0)     # позиция для расчета времени (после M110 - нулевая)
+        machine_position = (0.0, 0.0, 0.0, 0.0)   # фактическая позиция станка
+        last_feed = None
+        program_line = 0
+        revolution = 0
+
+        try:
+            for batch in generator.iter_revolution_batches():
+                is_pause = batch.find_m_code(110) != -1
+                data = self.formatter.format_block(batch).encode('utf-8')
+                size = len(data) + self._newline_extra * len(batch)
+
+                if part is not None and not is_pause and (new_part or self._exceeds(writer, part, batch, size)):
+                    self._close_part(writer, part)
+                    part = None
+                if part is None:
+                    new_part = False
+                    part = ProgramPart(index=len(parts) + 1, file=os.path.basename(self.part_path(path, len(parts) + 1)))
+                    parts.append(part)
+                    writer = self._open_part(path, part, machine_position, last_feed)
+                    if self._exceeds(writer, part, batch, size):
+                        raise ValueError(f"Оборот {revolution} не помещается в ограничение размера части "
+                                         f"(строк: {self.max_lines}, байт: {self.max_bytes})")
+
+                writer.write(data)
+                accumulator.add(batch)
+                move_times, end_position = buffer_move_times(batch, model_position)
+                part.seconds = sum_move_times(move_times, part.seconds)
+                part.punches += _count_punches(batch)
+                part.lines += len(batch)
+                if part.program_lines[0] == 0:
+                    part.program_lines = (program_line + 1, program_line + len(batch))
+                else:
+                    part.program_lines = (part.program_lines[0], program_line + len(batch))
+                program_line += len(batch)
+
+                machine_position = buffer_end_position(batch, machine_position)
+                model_position = (0.0, 0.0, 0.0, 0.0) if is_pause else end_position
+                feeds = batch.feed[batch.feed == batch.feed]
+                if feeds.size:
+                    last_feed = float(feeds[-1])
+
+                if is_pause:
+                    part.pause = True
+                    new_part = self.by_part
+                else:
+                    first = part.revolutions[0] if part.revolutions[0] >= 0 else revolution
+                    part.revolutions = (first, revolution)
+                    revolution += 1
+
+            if part is not None:
+                self._close_part(writer, part)
+                writer = None
+        finally:
+            if writer is not None:
+                writer.abort()
+
+        manifest = {
+            'program': self._program_name,
+            'split': {'by_part': self.by_part, 'max_lines': self.max_lines, 'max_bytes': self.max_bytes},
+            'time_data': accumulator.result(),
+            'parts': [asdict(part) for part in parts],
+        }
+        with BulkFileWriter(self.manifest_path(path), atomic=True) as file:
+            file.write(json.dumps(manifest, ensure_ascii=False, indent=2) + '\n')
+        return manifest
+
+    def _exceeds(self, writer: BulkFileWriter, part: ProgramPart, batch, size: int) -> bool:
+        """Превысит ли часть ограничения после добавления батча"""
+        if self.max_lines is not None and part.lines + len(batch) > self.max_lines:
+            return True
+        if self.max_bytes is not None and writer.bytes_written + size > self.max_bytes:
+            return True
+        return False
+
+    def _open_part(self, path: str, part: ProgramPart, position: Tuple[float, float, float, float],
+                   feed: Optional[float]) -> BulkFileWriter:
+        """Открытие файла части: заголовок с зарезервированными полями и преамбула"""
+        writer = BulkFileWriter(self.part_path(path, part.index), atomic=True)
+        writer.open()
+
+        lines = self._part_header(part)
+        if part.index > 1:
+            lines += self.formatter.format_commands(self._preamble(position, feed))
+        writer.write(''.join(line + '\n' for line in lines))
+        part.lines = len(lines)
+        return writer
+
+    def _close_part(self, writer: BulkFileWriter, part: ProgramPart):
+        """Дозапись заголовка части и закрытие файла"""
+        part.time = [_seconds_to_dhms(part.seconds), round(part.seconds)]
+        header = self._part_header(part)
+        writer.overwrite(0, ''.join(line + '\n' for line in header))
+        part.bytes = writer.bytes_written
+        writer.close()
+
+    def _part_header(self, part: ProgramPart) -> List[str]:
+        """
+        Строки заголовка части: вычисляемые поля фиксированной ширины, имя программы -
+        отдельной строкой без выравнивания (не меняется при перезаписи заголовка)
+        """
+        def field(line: str) -> str:
+            padding = self.HEADER_FIELD_WIDTH - len(line.encode('utf-8'))
+            if padding < 0:
+                raise ValueError(f"Строка заголовка длиннее {self.HEADER_FIELD_WIDTH} байт: {line}")
+            return line + ' ' * padding
+
+        time = part.time or ["", 0]
+        return [
+            f';Program => {self._program_name}',
+            field(f';Program part => {part.index}'),
+            field(f';Revolutions => {part.revolutions[0]}-{part.revolutions[1]}'),
+            field(f';Program lines => {part.program_lines[0]}-{part.program_lines[1]}'),
+            field(f';Part time => {time[0]} ({time[1]})'),
+            field(f';Punches => {part.punches}'),
+            ';' + '#' * 50,
+        ]
+
+    def _preamble(self, position: Tuple[float, float, float, float],
+                  feed: Optional[float]) -> List[MotionCommand]:
+        """Команды восстановления состояния станка на конец предыдущей части"""
+        x, y, z, a = (round(value, 3) for value in position)
+        commands = [
+            MotionCommand.linear_move(y=y, z=z, feed_rate=self.params['idling_speed'], comment=RESTORE_COMMENT),
+            MotionCommand.linear_move(x=x, feed_rate=self.params['idling_speed'], comment=RESTORE_COMMENT),
+            MotionCommand.linear_move(a=a, feed_rate=self.params['rotate_speed'], comment=RESTORE_COMMENT),
+        ]
+        if feed is not None:
+            commands.append(MotionCommand.linear_move(feed_rate=feed, comment=RESTORE_COMMENT))
+        return commands
@@ -0,0 +1,399 @@
+import math
+from dataclasses import dataclass, replace
+from typing import Optional, Union
+
+import numpy as np
+
+from constants.const import GenerationConfig
+
+
+# Профили удара пробития
+STROKE_PROFILE_SINGLE = 'single'        # Подход - внедрение - извлечение (внедрение с punch_offset по воздуху)
+STROKE_PROFILE_TWO_STAGE = 'two_stage'  # Быстрый подвод к поверхности ткани, внедрение, выход, быстрое извлечение
+STROKE_PROFILES = (STROKE_PROFILE_SINGLE, STROKE_PROFILE_TWO_STAGE)
+
+# Наибольший шаг прореживания подшагов: смещение змейки покрывает только один пропущенный подшаг
+MAX_SUBSTEP_STRIDE = 2
+
+# Абсолютный порог отклонения дробной части value * 10**ndigits от 0.5 (в единицах
+# последнего знака), при котором значение считается "почти половинным"
+# и округляется штатной функцией round() (точная десятичная арифметика)
+_TIE_TOLERANCE = 1e-6
+
+
+def round_array(values, ndigits: int = 3) -> np.ndarray:
+    """
+    Векторный аналог встроенной round(value, ndigits) для массивов float64.
+
+    np.round умножает значение на 10**ndigits, из-за чего в редких случаях
+    "почти половинные" значения округляются не так, как round() из Python.
+    Такие значения досчитываются штатным round(), поэтому результат
+    совпадает со скалярным расчетом бит в бит.
+
+    Args:
+        values: Массив (или скаляр) значений
+        ndigits (int): Количество знаков после запятой
+
+    Returns:
+        np.ndarray: Округленные значения
+    """
+    values = np.asarray(values, dtype=np.float64)
+    scale = 10.0 ** ndigits
+    scaled = values * scale
+    result = np.rint(scaled) / scale
+
+    with np.errstate(invalid='ignore'):
+        near_tie = np.abs(scaled - np.floor(scaled) - 0.5) < _TIE_TOLERANCE
+    if near_tie.any():
+        idx = np.flatnonzero(near_tie)
+        flat = result.reshape(-1)
+        flat[idx] = [round(value, ndigits) for value in values.reshape(-1)[idx].tolist()]
+
+    return result
+
+
+@dataclass(frozen=True)
+class PunchLayout:
+    """
+    Постоянные параметры раскладки пробитий вдоль X и по окружности.
+    Рассчитываются один раз для набора параметров пробития.
+    """
+    x_step_count: int
+    x_step_size: Union[int, float]
+    x_step_offset_1: Union[int, float]
+    x_step_offset_2: Union[int, float]
+    x_substep_count: int
+    x_substep_size: int
+    x_substep_offset_1: int
+    x_substep_offset_2: int
+    section_count: int
+    section_size: float
+    needle_step_Y: Union[int, float]
+    circumferential_head_step: Union[int, float]
+
+    @classmethod
+    def from_params(cls, params: dict, volumetric_density: int) -> 'PunchLayout':
+        """
+        Расчет раскладки по словарю параметров
+
+        Args:
+            params (dict): Словарь параметров пробития
+            volumetric_density (int): Количество оборотов на полный паттерн
+                                      (значение из VOLUMETRIC_DENSITY_MAP)
+
+        Returns:
+            PunchLayout: Раскладка пробитий
+        """
+        x_step_count = math.ceil(params['tube_len'] / params['head_len'])
+        x_step_size = params['head_len']
+
+        x_substep_count = round(params['needle_step_X'] / volumetric_density)
+        x_substep_size = round(params['needle_step_X'] / volumetric_density / x_substep_count)
+
+        num_of_needle_rows = params.get('num_of_needle_rows', 1)
+
+        return cls(
+            x_step_count=x_step_count,
+            x_step_size=x_step_size,
+            x_step_offset_1=0,
+            x_step_offset_2=(x_step_count - 1) * x_step_size,
+            x_substep_count=x_substep_count,
+            x_substep_size=x_substep_size,
+            x_substep_offset_1=0,
+            x_substep_offset_2=(x_substep_count - 1) * x_substep_size,
+            section_count=volumetric_density,
+            section_size=params['needle_step_X'] / volumetric_density,
+            needle_step_Y=params['needle_step_Y'],
+            circumferential_head_step=num_of_needle_rows * params['needle_step_Y'],
+        )
+
+    @property
+    def punches_per_crank(self) -> int:
+        """Количество пробитий за один проворот (все зоны и подшаги)"""
+        return self.x_step_count * self.x_substep_count
+
+    def sparse(self, substep_stride: int) -> 'PunchLayout':
+        """
+        Раскладка с прореженными подшагами: пробивается каждый substep_stride-й подшаг зоны.
+        Смещение змейки (половина подшага) растет вместе с шагом подшагов и при шаге 2
+        равно исходному подшагу, поэтому соседние угловые шаги пробивают пропущенные
+        подшаги, не выходя за пределы зоны. При большем шаге смещение змейки не покрывает
+        пропущенные подшаги, поэтому допустим шаг не больше 2.
+
+        Args:
+            substep_stride (int): Шаг прореживания подшагов (1 - без прореживания, 2 - каждый
+                                  второй подшаг; больше количества подшагов - без изменений)
+
+        Returns:
+            PunchLayout: Раскладка (та же, если прореживать нечего)
+        """
+        if not isinstance(substep_stride, (int, np.integer)) or substep_stride < 1:
+            raise ValueError(f"Шаг прореживания подшагов должен быть целым числом не меньше 1: {substep_stride}")
+        substep_stride = min(int(substep_stride), self.x_substep_count)
+        if self.x_substep_count % substep_stride:
+            raise ValueError(f"Шаг прореживания {substep_stride} не делит количество подшагов {self.x_substep_count}")
+        if substep_stride > MAX_SUBSTEP_STRIDE:
+            raise ValueError(f"Шаг прореживания подшагов не больше {MAX_SUBSTEP_STRIDE}: {substep_stride}")
+        count = self.x_substep_count // substep_stride
+        if count == self.x_substep_count:
+            return self
+        size = self.x_substep_size * substep_stride
+        return replace(self, x_substep_count=count, x_substep_size=size, x_substep_offset_2=(count - 1) * size)
+
+
+@dataclass
+class RevolutionPunches:
+    """
+    Координаты пробитий одного оборота в виде массивов.
+
+    Attributes:
+        revolution (int): Номер оборота (слоя)
+        angles (np.ndarray): Углы поворота A для каждого шага, форма (n_steps,)
+        active (np.ndarray): Маска шагов с пробитием, форма (n_steps,)
+        x (np.ndarray): Координаты X пробитий, форма (n_active, x_step_count * x_substep_count)
+                        в порядке обхода станком
+        y, z: Координаты подхода/извлечения (общие для слоя)
+        y_punch, z_punch: Координаты внедрения игл (общие для слоя, без округления)
+        y_surface: Координата Y конца быстрого подвода к ткани (None - удар одним движением)
+    """
+    revolution: int
+    angles: np.ndarray
+    active: np.ndarray
+    x: np.ndarray
+    y: Union[int, float]
+    z: Union[int, float]
+    y_punch: Union[int, float]
+    z_punch: Union[int, float]
+    y_surface: Optional[float] = None
+
+    @property
+    def punch_count(self) -> int:
+        """Количество пробитий в обороте"""
+        return self.x.size
+
+
+def active_angle_steps(layout: PunchLayout, angle_step_count: int) -> np.ndarray:
+    """
+    Маска шагов, на которых выполняется пробитие.
+    Шаги внутри полосы needle_step_Y..circumferential_head_step-1 только проворачиваются.
+
+    Args:
+        layout (PunchLayout): Раскладка пробитий
+        angle_step_count (int): Количество шагов в обороте
+
+    Returns:
+        np.ndarray: Булева маска формы (angle_step_count,)
+    """
+    phase = np.arange(angle_step_count) % layout.circumferential_head_step
+    return ~((layout.needle_step_Y <= phase) & (phase <= layout.circumferential_head_step - 1))
+
+
+def rotation_angle_steps(active: np.ndarray, merge: bool = False, keep_last: bool = True) -> np.ndarray:
+    """
+    Маска шагов, для которых выводится команда поворота.
+    Без объединения поворот выводится на каждом шаге. При объединении поворотов
+    шаги без пробития пропускаются: станок сразу поворачивается на угол следующего
+    шага с пробитием (в том числе первого шага следующего оборота).
+
+    Args:
+        active (np.ndarray): Маска шагов с пробитием (active_angle_steps)
+        merge (bool): Объединять подряд идущие повороты без пробития
+        keep_last (bool): Сохранить поворот последнего шага (конец фазы: после оборота
+                          нет следующего поворота, конечный угол A не меняется)
+
+    Returns:
+        np.ndarray: Булева маска формы (n_steps,)
+    """
+    if not merge:
+        return np.ones(active.shape, dtype=bool)
+    mask = active.astype(bool)
+    if keep_last and mask.size:
+        mask[-1] = True
+    return mask
+
+
+def blended_angle_steps(active: np.ndarray, blend: Union[bool, np.ndarray] = False) -> np.ndarray:
+    """
+    Маска шагов, поворот которых совмещается с первым подходом шага в одну команду G01.
+    Совмещение допустимо, только когда иглы извлечены и подход не меняет Y/Z:
+    внутри оборота предыдущее извлечение выполнено на той же высоте слоя. Первый шаг
+    с пробитием оборота (переход на новый слой или начало фазы) не совмещается.
+
+    Args:
+        active (np.ndarray): Маска шагов с пробитием (active_angle_steps)
+        blend (Union[bool, np.ndarray]): Совмещать поворот с подходом (маска шагов -
+                                         только на этих шагах, см. faster_blend_steps)
+
+    Returns:
+        np.ndarray: Булева маска формы (n_steps,)
+    """
+    mask = active.astype(bool) & np.asarray(blend, dtype=bool)
+    first = np.flatnonzero(active)
+    if first.size:
+        mask[first[0]] = False
+    return mask
+
+
+def faster_blend_steps(params: dict, layout: PunchLayout, revolution: int, angle_step_count: int,
+                       merge: bool = False) -> np.ndarray:
+    """
+    Маска шагов, поворот которых выгодно совмещать с подходом.
+
+    Совмещенная команда выполняется со скоростью min(rotate_speed, idling_speed), поэтому
+    длинный подход (переход через полосу шагов без пробития) вместе с поворотом медленнее,
+    чем поворот на rotate_speed и подход на idling_speed по отдельности. Шаг совмещается,
+    только если по модели разгона time_calc совместное перемещение быстрее раздельных.
+    Сравниваются номинальные X (без случайного смещения), поэтому маска одинакова
+    при генерации и в оценке job_estimator.
+
+    Args:
+        params (dict): Словарь параметров пробития
+        layout (PunchLayout): Раскладка пробитий оборота
+        revolution (int): Номер оборота
+        angle_step_count (int): Количество шагов в обороте
+        merge (bool): Повороты шагов без пробития объединены (см. rotation_angle_steps)
+
+    Returns:
+        np.ndarray: Булева маска формы (n_steps,)
+    """
+    from functions.time_calc import time_for_moves, ACCEL_LINEAR, ACCEL_ANGULAR
+
+    steps = np.arange(angle_step_count)
+    angles = round_array(360 * revolution + (360 / angle_step_count) * steps, 3)
+    active_steps = steps[active_angle_steps(layout, angle_step_count)]
+    mask = np.zeros(angle_step_count, dtype=bool)
+    if active_steps.size < 2:
+        return mask
+
+    # номинальные X последнего пробития предыдущего шага и первого пробития шага
+    direction = (revolution * angle_step_count + active_steps) % 2 == 0
+    base = (active_steps % 2) * layout.x_substep_size / 2
+    width = layout.x_substep_offset_2 + layout.x_step_offset_2
+    dx = np.abs(np.where(direction, base, base + width)[1:] - np.where(direction, base + width, base)[:-1])
+    previous = active_steps[:-1] if merge else active_steps[1:] - 1
+    da = np.abs(angles[active_steps[1:]] - angles[previous]) * math.pi / 180.0
+
+    blend_speed = min(params['rotate_speed'], params['idling_speed'])
+    separate = (time_for_moves(da, params['rotate_speed'] / 60.0 * math.pi / 180.0, ACCEL_ANGULAR)
+                + time_for_moves(dx, params['idling_speed'] / 60.0, ACCEL_LINEAR))
+    blended = np.maximum(time_for_moves(dx, blend_speed / 60.0, ACCEL_LINEAR),
+                         time_for_moves(da, blend_speed / 60.0 * math.pi / 180.0, ACCEL_ANGULAR))
+    mask[active_steps[1:]] = blended < separate
+    return mask
+
+
+def compute_revolution(params: dict, layout: PunchLayout, revolution: int,
+                       angle_step_count: int, random_offsets: np.ndarray,
+                       fix_z_offset: Optional[float] = None) -> RevolutionPunches:
+    """
+    Векторный расчет всех пробитий одного оборота.
+
+    Повторяет логику циклов TubeCommandGenerator: змейка по направлению,
+    смещение секции для слоя, смещение шага и случайные смещения,
+    которые расходуются последовательно только на активных шагах.
+
+    Args:
+        params (dict): Словарь параметров пробития
+        layout (PunchLayout): Раскладка пробитий
+        revolution (int): Номер оборота
+        angle_step_count (int): Количество шагов в обороте
+        random_offsets (np.ndarray): Случайные смещения для пробитий оборота
+                                     (не меньше n_active * punches_per_crank значений)
+        fix_z_offset (Optional[float]): Фиксированное смещение по Z (виртуальная прошивка)
+
+    Returns:
+        RevolutionPunches: Координаты пробитий оборота
+    """
+    angle_step_size = 360 / angle_step_count
+    steps = np.arange(angle_step_count)
+    angles = round_array(360 * revolution + angle_step_size * steps, 3)
+
+    active = active_angle_steps(layout, angle_step_count)
+    active_steps = steps[active]
+
+    # самый первый удар имеет направление true
+    direction = (revolution * angle_step_count + active_steps) % 2 == 0
+    x_snake_offset = (active_steps % 2) * layout.x_substep_size / 2
+
+    # смещение для слоя (каждый полный оборот)
+    x_section_offset = (revolution % layout.section_count) * layout.section_size
+
+    # поддержка обратного движения (для змейкообразного паттерна)
+    start_x_step_offset = np.where(direction, layout.x_step_offset_1, layout.x_step_offset_2)
+    x_step_offset = np.abs(layout.x_step_size * np.arange(layout.x_step_count)[None, :]
+                           - start_x_step_offset[:, None])
+
+    start_x_substep_offset = np.where(direction, layout.x_substep_offset_1, layout.x_substep_offset_2)
+    x_substep_offset = np.abs(layout.x_substep_size * np.arange(layout.x_substep_count)[None, :]
+                              - start_x_substep_offset[:, None])
+
+    shape = (active_steps.size, layout.x_step_count, layout.x_substep_count)
+    offsets = np.asarray(random_offsets[:int(np.prod(shape))], dtype=np.float64).reshape(shape)
+
+    # порядок сложения совпадает со скалярным расчетом (для идентичного округления)
+    x = (offsets
+         + x_snake_offset[:, None, None]
+         + x_section_offset
+         + x_substep_offset[:, None, :]
+         + x_step_offset[:, :, None])
+    x = round_array(x, 3).reshape(active_steps.size, -1)
+
+    y, z, y_punch, z_punch = layer_heights(params, revolution, fix_z_offset)
+
+    return RevolutionPunches(
+        revolution=revolution,
+        angles=angles,
+        active=active,
+        x=x,
+        y=y,
+        z=z,
+        y_punch=y_punch,
+        z_punch=z_punch,
+        y_surface=surface_height(params, y),
+    )
+
+
+def surface_height(params: dict, y: Union[int, float]) -> Optional[float]:
+    """
+    Координата Y конца быстрого подвода двухэтапного удара: поверхность ткани
+    слоя (y + punch_offset) минус зазор 'surface_clearance'.
+    Профиль задается параметром 'stroke_profile' (по умолчанию GenerationConfig.STROKE_PROFILE).
+
+    Args:
+        params (dict): Словарь параметров пробития
+        y (Union[int, float]): Координата Y подхода/извлечения слоя
+
+    Returns:
+        Optional[float]: Координата Y или None - удар одним движением (профиль 'single'
+                         или зазор не меньше punch_offset: быстрого участка нет)
+    """
+    profile = params.get('stroke_profile', GenerationConfig.STROKE_PROFILE)
+    if profile not in STROKE_PROFILES:
+        raise ValueError(f"Неизвестный профиль удара: {profile} (допустимо: {', '.join(STROKE_PROFILES)})")
+    clearance = params.get('surface_clearance', GenerationConfig.SURFACE_CLEARANCE)
+    if clearance < 0:
+        raise ValueError(f"Зазор до поверхности ткани не может быть отрицательным: {clearance}")
+    if profile == STROKE_PROFILE_SINGLE or clearance >= params['punch_offset']:
+        return None
+    return round(y + params['punch_offset'] - clearance, 3)
+
+
+def layer_heights(params: dict, revolution: int, fix_z_offset: Optional[float] = None) -> tuple:
+    """
+    Координаты Y/Z слоя: подход/извлечение и внедрение игл
+
+    Args:
+        params (dict): Словарь параметров пробития
+        revolution (int): Номер оборота
+        fix_z_offset (Optional[float]): Фиксированное смещение по Z (виртуальная прошивка)
+
+    Returns:
+        tuple: (y, z, y_punch, z_punch)
+    """
+    y_offset = params['fabric_thickness'] * revolution
+    z_offset = fix_z_offset if fix_z_offset is not None else params['fabric_thickness'] * revolution
+
+    y = round(params['zero_offset_Y'] - params['punch_offset'] - y_offset, 3)
+    z = round(params['zero_offset_Z'] - z_offset, 3)
+
+    return y, z, y + params['punch_depth'] + params['punch_offset'], z + params['support_depth']
@@ -0,0 +1,161 @@
+from typing import Tuple
+
+import numpy as np
+
+
+# Режимы источника случайных смещений
+RANDOM_MODE_SEQUENTIAL = 'sequential'  # Совместимый: один поток default_rng(seed) на всю программу
+RANDOM_MODE_COUNTER = 'counter'        # Счетчиковый: смещение = f(seed, оборот, шаг, зона, подшаг)
+RANDOM_MODES = (RANDOM_MODE_SEQUENTIAL, RANDOM_MODE_COUNTER)
+
+# Константы Philox4x32 (Salmon et al., "Parallel Random Numbers: As Easy as 1, 2, 3")
+_PHILOX_M0 = np.uint64(0xD2511F53)
+_PHILOX_M1 = np.uint64(0xCD9E8D57)
+_PHILOX_W0 = 0x9E3779B9
+_PHILOX_W1 = 0xBB67AE85
+_MASK32 = np.uint64(0xFFFFFFFF)
+_SHIFT32 = np.uint64(32)
+
+
+def philox4x32(counter: Tuple, key: Tuple[int, int], rounds: int = 10) -> Tuple[np.ndarray, ...]:
+    """
+    Векторный блочный генератор Philox4x32.
+
+    Результат зависит только от счетчика и ключа, поэтому любое значение
+    вычисляется за O(1) без генерации предыдущих.
+
+    Args:
+        counter (Tuple): Четыре 32-битных слова счетчика (скаляры или массивы одной формы)
+        key (Tuple[int, int]): Два 32-битных слова ключа
+        rounds (int): Количество раундов (стандартно 10)
+
+    Returns:
+        Tuple[np.ndarray, ...]: Четыре 32-битных слова результата (dtype uint64)
+    """
+    c0, c1, c2, c3 = np.broadcast_arrays(*[np.asarray(word, dtype=np.uint64) & _MASK32 for word in counter])
+    k0, k1 = int(key[0]) & 0xFFFFFFFF, int(key[1]) & 0xFFFFFFFF
+
+    for round_idx in range(rounds):
+        if round_idx:
+            k0 = (k0 + _PHILOX_W0) & 0xFFFFFFFF
+            k1 = (k1 + _PHILOX_W1) & 0xFFFFFFFF
+        product0 = _PHILOX_M0 * c0
+        product1 = _PHILOX_M1 * c2
+        c0, c1, c2, c3 = (((product1 >> _SHIFT32) ^ c1 ^ np.uint64(k0)),
+                          product1 & _MASK32,
+                          ((product0 >> _SHIFT32) ^ c3 ^ np.uint64(k1)),
+                          product0 & _MASK32)
+
+    return c0, c1, c2, c3
+
+
+class SequentialRandomOffsets:
+    """
+    Совместимый источник смещений: последовательность default_rng(seed).uniform(low, high).
+
+    Смещение пробития с глобальным номером k совпадает с k-м элементом массива,
+    который раньше генерировался на всю программу. Для произвольного оборота
+    генератор PCG64 перематывается (advance) к нужному номеру без генерации
+    предыдущих значений.
+    """
+
+    mode = RANDOM_MODE_SEQUENTIAL
+
+    def __init__(self, seed: int, low: float, high: float):
+        """
+        Args:
+            seed (int): Зерно генератора
+            low, high (float): Границы равномерного распределения
+        """
+        self.seed = seed
+        self.low = low
+        self.high = high
+
+    def revolution_offsets(self, revolution: int, first_punch: int,
+                           active_steps: np.ndarray, x_step_count: int,
+                           x_substep_count: int) -> np.ndarray:
+        """
+        Смещения пробитий одного оборота
+
+        Args:
+            revolution (int): Номер оборота
+            first_punch (int): Глобальный номер первого пробития оборота
+            active_steps (np.ndarray): Номера шагов оборота, на которых выполняется пробитие
+            x_step_count (int): Количество зон вдоль X
+            x_substep_count (int): Количество подшагов в зоне
+
+        Returns:
+            np.ndarray: Смещения формы (len(active_steps), x_step_count, x_substep_count)
+        """
+        shape = (len(active_steps), x_step_count, x_substep_count)
+        bit_generator = np.random.PCG64(self.seed)
+        bit_generator.advance(first_punch)
+        rng = np.random.Generator(bit_generator)
+        return rng.uniform(self.low, self.high, size=int(np.prod(shape))).reshape(shape)
+
+
+class CounterRandomOffsets:
+    """
+    Счетчиковый источник смещений на основе Philox4x32-10.
+
+    Счетчик - (оборот, шаг по углу, зона X, подшаг X), ключ - зерно.
+    Смещение любого пробития вычисляется независимо, поэтому обороты
+    можно генерировать в любом порядке и параллельно.
+    """
+
+    mode = RANDOM_MODE_COUNTER
+
+    def __init__(self, seed: int, low: float, high: float):
+        """
+        Args:
+            seed (int): Зерно генератора (до 64 бит)
+            low, high (float): Границы равномерного распределения
+        """
+        self.seed = seed
+        self.low = low
+        self.high = high
+        self.key = (seed & 0xFFFFFFFF, (seed >> 32) & 0xFFFFFFFF)
+
+    def punch_offset(self, revolution: int, angle_step: int, x_step: int, x_substep: int) -> float:
+        """Смещение одного пробития"""
+        return float(self._uniform(revolution, angle_step, x_step, x_substep))
+
+    def revolution_offsets(self, revolution: int, first_punch: int,
+                           active_steps: np.ndarray, x_step_count: int,
+                           x_substep_count: int) -> np.ndarray:
+        """
+        Смещения пробитий одного оборота (first_punch не используется)
+
+        Returns:
+            np.ndarray: Смещения формы (len(active_steps), x_step_count, x_substep_count)
+        """
+        return self._uniform(revolution,
+                             np.asarray(active_steps)[:, None, None],
+                             np.arange(x_step_count)[None, :, None],
+                             np.arange(x_substep_count)[None, None, :])
+
+    def _uniform(self, revolution, angle_step, x_step, x_substep) -> np.ndarray:
+        """Равномерное распределение [low, high) из 53 бит блока Philox"""
+        word0, word1, _, _ = philox4x32((revolution, angle_step, x_step, x_substep), self.key)
+        bits53 = ((word0 >> np.uint64(5)) << np.uint64(26)) | (word1 >> np.uint64(6))
+        unit = bits53.astype(np.float64) * (1.0 / 9007199254740992.0)
+        return self.low + (self.high - self.low) * unit
+
+
+def create_random_offsets(mode: str, seed: int, low: float, high: float):
+    """
+    Создание источника случайных смещений
+
+    Args:
+        mode (str): Режим (RANDOM_MODE_SEQUENTIAL или RANDOM_MODE_COUNTER)
+        seed (int): Зерно генератора
+        low, high (float): Границы равномерного распределения
+
+    Returns:
+        Источник смещений с методом revolution_offsets()
+    """
+    if mode == RANDOM_MODE_SEQUENTIAL:
+        return SequentialRandomOffsets(seed, low, high)
+    if mode == RANDOM_MODE_COUNTER:
+        return CounterRandomOffsets(seed, low, high)
+    raise ValueError(f"Неизвестный режим случайных смещений: {mode} (допустимо: {', '.join(RANDOM_MODES)})")
@@ -0,0 +1,175 @@
+import math
+from dataclasses import dataclass
+from typing import List, Optional
+
+from constants.const import GenerationConfig
+from functions.job_estimator import estimate_job
+from functions.layer_plan import LayerPlan
+from functions.time_calc import _seconds_to_dhms
+
+
+@dataclass(frozen=True)
+class StitchingStrategy:
+    """
+    Вариант прохода виртуальной прошивки (Part 2).
+
+    Attributes:
+        name (str): Название варианта
+        extra_rotations (int): Количество оборотов прошивки
+        substep_stride (int): Прореживание подшагов (пробивается каждый N-й подшаг зоны)
+        merge_rotations (bool): Объединение поворотов без пробития в оборотах прошивки
+    """
+    name: str
+    extra_rotations: int
+    substep_stride: int = 1
+    merge_rotations: bool = False
+
+    def apply(self, params: dict) -> dict:
+        """
+        Параметры пробития с вариантом прошивки
+
+        Args:
+            params (dict): Словарь параметров пробития
+
+        Returns:
+            dict: Копия параметров с параметрами прошивки варианта
+        """
+        return dict(params, extra_rotations=self.extra_rotations,
+                    stitching_substep_stride=self.substep_stride,
+                    stitching_merge_rotations=self.merge_rotations)
+
+
+def candidate_strategies(params: dict) -> List[StitchingStrategy]:
+    """
+    Типовые варианты прошивки: текущий, объединение поворотов, прореживание подшагов,
+    меньше оборотов (половина, если она не короче цикла секций, и один полный цикл
+    секций по X) и их сочетание.
+
+    Args:
+        params (dict): Словарь параметров пробития
+
+    Returns:
+        List[StitchingStrategy]: Варианты без повторов (первый - текущий)
+    """
+    config = GenerationConfig
+    plan = LayerPlan.for_params(params)
+    extra = plan.extra_revolutions
+    sections = plan.layout.section_count
+    stride = 2 if plan.layout.x_substep_count % 2 == 0 else 1
+    current = StitchingStrategy(
+        "Текущий", extra,
+        params.get('stitching_substep_stride', config.STITCHING_SUBSTEP_STRIDE),
+        bool(params.get('stitching_merge_rotations', config.STITCHING_MERGE_ROTATIONS)))
+
+    candidates = [
+        current,
+        StitchingStrategy("Объединение поворотов", extra, current.substep_stride, True),
+        StitchingStrategy("Прореживание подшагов", extra, stride, current.merge_rotations),
+        StitchingStrategy("Один цикл секций", min(sections, extra), current.substep_stride, current.merge_rotations),
+        StitchingStrategy("Один цикл секций + прореживание + объединение", min(sections, extra), stride, True),
+    ]
+    # половина оборотов - только если она короче текущего прохода и не короче цикла секций
+    # (меньше цикла секций - вариант "Один цикл секций")
+    if sections <= extra // 2 < extra:
+        candidates.insert(3, StitchingStrategy("Половина оборотов", extra // 2, current.substep_stride,
+                                               current.merge_rotations))
+    unique, seen = [], set()
+    for strategy in candidates:
+        key = (strategy.extra_rotations, strategy.substep_stride, strategy.merge_rotations)
+        if key not in seen:
+            seen.add(key)
+            unique.append(strategy)
+    return unique
+
+
+def plan_stitching(params: dict, strategies: Optional[List[StitchingStrategy]] = None) -> List[dict]:
+    """
+    Сравнение вариантов прошивки по времени и покрытию без генерации команд
+    (время - по модели job_estimator, совпадающей с time_calc).
+
+    Покрытие варианта оценивается тремя величинами:
+    density - пробитий прошивки на см² внешней поверхности трубы,
+    punch_ratio - доля пробитий прошивки относительно первого варианта,
+    section_coverage - доля секций по X (VOLUMETRIC_DENSITY_MAP), пройденных прошивкой.
+
+    Args:
+        params (dict): Словарь параметров пробития
+        strategies (Optional[List[StitchingStrategy]]): Варианты (None - candidate_strategies,
+                                                        первый вариант - база для сравнения)
+
+    Returns:
+        List[dict]: Для каждого варианта: strategy, params, part_seconds (Part 2), time,
+                    total_seconds (вся программа), punches (прошивки), density,
+                    punch_ratio, section_coverage, saved_seconds, saved_share
+    """
+    strategies = strategies if strategies is not None else candidate_strategies(params)
+    rows = []
+    for strategy in strategies:
+        strategy_params = strategy.apply(params)
+        plan = LayerPlan.for_params(strategy_params)
+        estimate = estimate_job(strategy_params)
+        main = plan.main_revolutions
+        punches = int(plan.punches[main:].sum())
+        o_diam = params['i_diam'] + 2 * params['fabric_thickness'] * main
+        area = math.pi * o_diam * params['tube_len'] / 100.0
+        sections = len({revolution % plan.layout.section_count for revolution in range(main, plan.total_revolutions)})
+        part_seconds = float(estimate['part_seconds'][1])
+        rows.append({
+            'strategy': strategy,
+            'params': strategy_params,
+            'part_seconds': part_seconds,
+            'time': _seconds_to_dhms(part_seconds),
+            'total_seconds': float(sum(estimate['part_seconds'])),
+            'punches': punches,
+            'density': punches / area if area > 0 else 0.0,
+            'section_coverage': sections / plan.layout.section_count,
+        })
+
+    base = rows[0]
+    for row in rows:
+        row['punch_ratio'] = row['punches'] / base['punches'] if base['punches'] else 1.0
+        row['saved_seconds'] = base['part_seconds'] - row['part_seconds']
+        row['saved_share'] = row['saved_seconds'] / base['total_seconds'] if base['total_seconds'] > 0 else 0.0
+    return rows
+
+
+def select_stitching_plan(rows: List[dict], min_punch_ratio: float = 0.0,
+                          full_sections: bool = True) -> dict:
+    """
+    Самый быстрый вариант прошивки с ограничением по покрытию
+
+    Args:
+        rows (List[dict]): Результат plan_stitching()
+        min_punch_ratio (float): Минимальная доля пробитий прошивки относительно базового варианта
+        full_sections (bool): Прошивка должна пройти все секции по X
+
+    Returns:
+        dict: Строка выбранного варианта (базовый вариант, если ограничениям отвечает только он)
+    """
+    allowed = [row for row in rows
+               if row['punch_ratio'] >= min_punch_ratio and (not full_sections or row['section_coverage'] >= 1.0)]
+    return min(allowed or rows[:1], key=lambda row: row['part_seconds'])
+
+
+def format_stitching_plan(rows: List[dict], selected: Optional[dict] = None) -> str:
+    """
+    Таблица вариантов прошивки
+
+    Args:
+        rows (List[dict]): Результат plan_stitching()
+        selected (Optional[dict]): Выбранный вариант (отмечается '*')
+
+    Returns:
+        str: Отчет
+    """
+    lines = [f"{'':2}{'Вариант':<48}{'обороты':>8}{'подшаг':>8}{'объед.':>8}{'Part 2':>18}"
+             f"{'экономия':>18}{'пробитий':>11}{'на см²':>9}{'секции':>8}"]
+    for row in rows:
+        strategy = row['strategy']
+        mark = '*' if row is selected else ''
+        saved = f"{row['saved_seconds'] / 3600:.1f} ч ({row['saved_share'] * 100:.1f}%)"
+        lines.append(f"{mark:<2}{strategy.name:<48}{strategy.extra_rotations:>8}{strategy.substep_stride:>8}"
+                     f"{'да' if strategy.merge_rotations else 'нет':>8}{row['time']:>18}{saved:>18}"
+                     f"{row['punch_ratio'] * 100:>10.0f}%{row['density']:>9.2f}"
+                     f"{row['section_coverage'] * 100:>7.0f}%")
+    return "\n".join(lines)
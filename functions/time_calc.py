@@ -1,6 +1,10 @@
 import math
-from typing import List, Union
+from typing import List, Tuple, Union
+
+import numpy as np
+
 from functions.motion_commands import MotionCommand
+from functions.command_buffer import CommandBuffer, KIND_LINEAR_MOVE, KIND_PAUSE
 
 
 ACCEL_LINEAR = 300.0  # Ускорение для линейных осей (мм/с²)
@@ -34,6 +38,31 @@ def _time_for_move(d: float, v: float, a: float) -> float:
         return 2.0 * math.sqrt(d / a)
 
 
+def time_for_moves(d, v, a) -> np.ndarray:
+    """
+    Векторный аналог _time_for_move для массивов расстояний и скоростей.
+
+    Args:
+        d: Расстояния в мм (или радианах)
+        v: Скорости в мм/с (или рад/с)
+        a (float): Ускорение
+
+    Returns:
+        np.ndarray: Время каждого перемещения в секундах
+    """
+    d, v = np.broadcast_arrays(np.asarray(d, dtype=np.float64), np.asarray(v, dtype=np.float64))
+    if a <= 0:
+        return np.zeros(d.shape)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        d_acc = (v * v) / a
+        t_acc = v / a
+        trapezoid = 2.0 * t_acc + (d - d_acc) / v
+        triangle = 2.0 * np.sqrt(d / a)
+
+    return np.where((d <= 0) | (v <= 0), 0.0, np.where(d >= d_acc, trapezoid, triangle))
+
+
 def _seconds_to_dhms(s: float) -> str:
     """
     Конвертация секунд в формат 'дни часы:минуты:секунды'.
@@ -51,64 +80,89 @@ def _seconds_to_dhms(s: float) -> str:
     return f"{days} д {h:02d}:{m:02d}:{s:02d}" if days else f"{h:02d}:{m:02d}:{s:02d}"
 
 
-def time_prediction_motioncommand(commands: List[MotionCommand]) -> List[List[Union[str, int]]]:
+def time_prediction_motioncommand(commands: Union[List[MotionCommand], CommandBuffer]) -> List[List[Union[str, int]]]:
     """
     Функция расчета времени для MotionCommand.
 
     Args:
-        commands (List[MotionCommand]): Список команд движения
+        commands (Union[List[MotionCommand], CommandBuffer]): Список команд движения
+                                                              или колоночный буфер команд
 
     Returns:
         List[List[Union[str, int]]]: [[time_str_part1, time_sec_part1],
                                       [time_str_part2, time_sec_part2],
                                       [time_str_total, time_sec_total]]
     """
+    time_data, _ = time_prediction_with_move_times(commands)
+    return time_data
+
+
+def time_prediction_with_move_times(commands: Union[List[MotionCommand], CommandBuffer]
+                                    ) -> Tuple[List[List[Union[str, int]]], np.ndarray]:
+    """
+    Расчет времени выполнения по массивам с временем каждой команды.
+
+    Список команд переводится в колоночный буфер, время команд считается
+    векторно (buffer_move_times), программа делится по первой команде M110;
+    расчет Part 2 начинается с нулевой позиции.
+
+    Args:
+        commands (Union[List[MotionCommand], CommandBuffer]): Список команд движения
+                                                              или колоночный буфер команд
+
+    Returns:
+        Tuple: (время в формате time_prediction_motioncommand,
+                время каждой команды в секундах - массив длины len(commands))
+    """
     if not commands:
-        return [["0:00:00", 0], ["0:00:00", 0], ["0:00:00", 0]]
+        return [["0:00:00", 0], ["0:00:00", 0], ["0:00:00", 0]], np.zeros(0)
+
+    if not isinstance(commands, CommandBuffer):
+        commands = CommandBuffer.from_commands(commands)
 
     # Поиск разделителя M110 (команда паузы для резки)
-    split_idx = -1
-    for i, cmd in enumerate(commands):
-        if (cmd.command_type.value == "M" and
-            cmd.m_code == 110):
-            split_idx = i
-            break
+    split_idx = commands.find_m_code(110)
 
     if split_idx == -1:
         # Если нет разделителя, считаем все как одну часть
-        total_time = _calculate_motion_time(commands)
+        move_times, _ = buffer_move_times(commands)
+        total_time = sum_move_times(move_times)
         return [
             [_seconds_to_dhms(total_time), round(total_time)],
             ["0:00:00", 0],
             [_seconds_to_dhms(total_time), round(total_time)]
-        ]
+        ], move_times
 
     # Разделение на части
-    part1 = commands[:split_idx]
-    part2 = commands[split_idx + 1:]
+    times1, _ = buffer_move_times(commands[:split_idx])
+    times2, _ = buffer_move_times(commands[split_idx + 1:])
 
     # Расчет времени для частей
-    t1 = _calculate_motion_time(part1)
-    t2 = _calculate_motion_time(part2)
+    t1 = sum_move_times(times1)
+    t2 = sum_move_times(times2)
     total_time = t1 + t2
 
     return [
         [_seconds_to_dhms(t1), round(t1)],
         [_seconds_to_dhms(t2), round(t2)],
         [_seconds_to_dhms(total_time), round(total_time)]
-    ]
+    ], np.concatenate((times1, [0.0], times2))
 
 
-def _calculate_motion_time(commands: List[MotionCommand]) -> float:
+def _calculate_motion_time(commands: Union[List[MotionCommand], CommandBuffer]) -> float:
     """
     Расчет времени выполнения списка команд MotionCommand.
+    Скалярный расчет по командам (эталон для векторного buffer_move_times).
 
     Args:
-        commands (List[MotionCommand]): Список команд
+        commands (Union[List[MotionCommand], CommandBuffer]): Список команд или буфер команд
 
     Returns:
         float: Время выполнения в секундах
     """
+    if isinstance(commands, CommandBuffer):
+        return _calculate_buffer_time(commands)
+
     total_time = 0.0
     current_pos = {'x': 0.0, 'y': 0.0, 'z': 0.0, 'a': 0.0}
 
@@ -127,17 +181,21 @@ def _calculate_motion_time(commands: List[MotionCommand]) -> float:
             feed_rate = cmd.feed_rate if cmd.feed_rate is not None else 1000.0
 
             # Время линейного движения
+            linear_time = 0.0
             if linear_distance > 0:
                 linear_time = _time_for_move(linear_distance, feed_rate / 60.0, ACCEL_LINEAR)
-                total_time += linear_time
 
-            # Время углового движения (если только поворот без линейного движения)
-            if da > 0 and linear_distance == 0:
+            # Время углового движения
+            angular_time = 0.0
+            if da > 0:
                 # Преобразуем угловую скорость в рад/сек (приблизительно)
                 angular_speed = feed_rate / 60.0 * math.pi / 180.0  # рад/сек
                 angular_distance = da * math.pi / 180.0  # рад
                 angular_time = _time_for_move(angular_distance, angular_speed, ACCEL_ANGULAR)
-                total_time += angular_time
+
+            # Совместное перемещение линейных осей и A: оси движутся одновременно,
+            # время определяет самая медленная группа осей
+            total_time += max(linear_time, angular_time)
 
             # Обновление текущей позиции
             if cmd.x is not None:
@@ -155,4 +213,217 @@ def _calculate_motion_time(commands: List[MotionCommand]) -> float:
 
         # M-коды в оценки времени пока не учитываются
 
-    return total_time
\ No newline at end of file
+    return total_time
+
+
+def _calculate_buffer_time(buffer: CommandBuffer) -> float:
+    """
+    Расчет времени выполнения по колонкам CommandBuffer (без создания MotionCommand).
+
+    Args:
+        buffer (CommandBuffer): Буфер команд
+
+    Returns:
+        float: Время выполнения в секундах
+    """
+    total_time, _ = _accumulate_buffer_time(buffer)
+    return total_time
+
+
+def _accumulate_buffer_time(buffer: CommandBuffer, total_time: float = 0.0,
+                            position: Tuple[float, float, float, float] = (0.0, 0.0, 0.0, 0.0)
+                            ) -> Tuple[float, Tuple[float, float, float, float]]:
+    """
+    Продолжение расчета времени для очередного буфера команд.
+    Время суммируется в том же порядке, что и при расчете всей программы сразу,
+    поэтому потоковый расчет дает идентичный результат.
+
+    Args:
+        buffer (CommandBuffer): Буфер команд
+        total_time (float): Накопленное время до буфера
+        position (Tuple): Текущая позиция (x, y, z, a) перед буфером
+
+    Returns:
+        Tuple: (накопленное время, позиция после буфера)
+    """
+    move_times, position = buffer_move_times(buffer, position)
+    return sum_move_times(move_times, total_time), position
+
+
+def buffer_move_times(buffer: CommandBuffer,
+                      position: Tuple[float, float, float, float] = (0.0, 0.0, 0.0, 0.0)
+                      ) -> Tuple[np.ndarray, Tuple[float, float, float, float]]:
+    """
+    Время выполнения каждой команды буфера (векторный расчет).
+
+    Незаданные оси (NaN) заполняются последним заданным значением, расстояния
+    и профиль трапеция/треугольник считаются по массивам. Порядок операций
+    совпадает с _calculate_motion_time, поэтому время каждой команды
+    совпадает со скалярным расчетом бит в бит. Время совместного перемещения
+    линейных осей и A - максимум из линейного и углового времени.
+
+    Args:
+        buffer (CommandBuffer): Буфер команд
+        position (Tuple): Текущая позиция (x, y, z, a) перед буфером
+
+    Returns:
+        Tuple: (время каждой команды в секундах, позиция после буфера)
+    """
+    count = len(buffer)
+    linear = buffer.kind == KIND_LINEAR_MOVE
+    rows = np.arange(count)
+
+    deltas = []
+    end_position = []
+    for column, current in zip((buffer.x, buffer.y, buffer.z, buffer.a), position):
+        given = linear & ~np.isnan(column)
+        # Позиция перед каждой командой: последнее заданное значение до нее (или стартовая позиция)
+        last = np.maximum.accumulate(np.where(given, rows, -1))
+        filled = np.append(column, current)[last]
+        previous = np.concatenate(([current], filled[:-1]))
+        deltas.append(np.where(given, column - previous, 0.0))
+        end_position.append(float(filled[-1]) if count else current)
+
+    dx, dy, dz, da = deltas
+    linear_distance = np.sqrt(dx*dx + dy*dy + dz*dz)
+    da = np.abs(da)
+
+    feed_rate = np.where(np.isnan(buffer.feed), 1000.0, buffer.feed)
+    linear_time = time_for_moves(linear_distance, feed_rate / 60.0, ACCEL_LINEAR)
+    angular_speed = feed_rate / 60.0 * math.pi / 180.0  # рад/сек
+    angular_time = time_for_moves(da * math.pi / 180.0, angular_speed, ACCEL_ANGULAR)
+
+    # совместное перемещение линейных осей и A - по самой медленной группе осей
+    move_times = np.where(linear_distance > 0,
+                          np.where(da > 0, np.maximum(linear_time, angular_time), linear_time),
+                          np.where(da > 0, angular_time, 0.0))
+    move_times = np.where(linear, move_times, 0.0)
+
+    pause = (buffer.kind == KIND_PAUSE) & ~np.isnan(buffer.pause)
+    move_times = np.where(pause, buffer.pause, move_times)
+
+    return move_times, tuple(end_position)
+
+
+def sum_move_times(move_times: np.ndarray, total_time: float = 0.0) -> float:
+    """
+    Последовательная сумма времен команд (np.cumsum складывает по порядку,
+    поэтому результат совпадает с суммированием в цикле)
+
+    Args:
+        move_times (np.ndarray): Время каждой команды
+        total_time (float): Накопленное время до команд
+
+    Returns:
+        float: Накопленное время после команд
+    """
+    if len(move_times) == 0:
+        return total_time
+    return float(np.cumsum(np.concatenate(([total_time], move_times)))[-1])
+
+
+def buffer_end_position(buffer: CommandBuffer,
+                        position: Tuple[float, float, float, float] = (0.0, 0.0, 0.0, 0.0)
+                        ) -> Tuple[float, float, float, float]:
+    """
+    Позиция после выполнения буфера (последние заданные значения X, Y, Z, A)
+
+    Args:
+        buffer (CommandBuffer): Буфер команд
+        position (Tuple): Позиция перед буфером
+
+    Returns:
+        Tuple: Позиция (x, y, z, a) после буфера
+    """
+    moves = buffer.kind == KIND_LINEAR_MOVE
+    result = []
+    for column, current in zip((buffer.x, buffer.y, buffer.z, buffer.a), position):
+        values = column[moves & ~np.isnan(column)]
+        result.append(float(values[-1]) if values.size else current)
+    return tuple(result)
+
+
+class MotionTimeAccumulator:
+    """
+    Потоковый расчет времени выполнения программы.
+
+    Команды подаются батчами (например, по оборотам) в порядке выполнения.
+    Первая команда M110 разделяет программу на Part 1 и Part 2; как и в
+    time_prediction_motioncommand, расчет Part 2 начинается с нулевой позиции.
+    """
+
+    def __init__(self):
+        self.part_times = [0.0]
+        self.position = (0.0, 0.0, 0.0, 0.0)
+        self.has_commands = False
+
+    @property
+    def split_found(self) -> bool:
+        """Найден ли разделитель M110"""
+        return len(self.part_times) > 1
+
+    def add(self, commands: Union[List[MotionCommand], CommandBuffer]):
+        """
+        Учесть очередной батч команд
+
+        Args:
+            commands (Union[List[MotionCommand], CommandBuffer]): Команды батча
+        """
+        if not isinstance(commands, CommandBuffer):
+            commands = CommandBuffer.from_commands(commands)
+        if len(commands) == 0:
+            return
+        self.has_commands = True
+
+        split_idx = -1 if self.split_found else commands.find_m_code(110)
+        if split_idx != -1:
+            self.part_times[-1], _ = _accumulate_buffer_time(commands[:split_idx], self.part_times[-1],
+                                                             self.position)
+            self.part_times.append(0.0)
+            self.position = (0.0, 0.0, 0.0, 0.0)
+            commands = commands[split_idx + 1:]
+
+        self.part_times[-1], self.position = _accumulate_buffer_time(commands, self.part_times[-1],
+                                                                     self.position)
+
+    def add_move_times(self, move_times, position: Tuple[float, float, float, float]):
+        """
+        Учесть батч, время команд которого уже рассчитано (например, в другом процессе)
+
+        Args:
+            move_times: Время каждой команды батча (батч не должен содержать M110)
+            position (Tuple): Позиция после батча
+        """
+        if len(move_times) == 0:
+            return
+        self.has_commands = True
+        self.part_times[-1] = sum_move_times(np.asarray(move_times, dtype=np.float64), self.part_times[-1])
+        self.position = position
+
+    def result(self) -> List[List[Union[str, int]]]:
+        """
+        Итоговое время в формате time_prediction_motioncommand
+
+        Returns:
+            List[List[Union[str, int]]]: [[time_str_part1, time_sec_part1],
+                                          [time_str_part2, time_sec_part2],
+                                          [time_str_total, time_sec_total]]
+        """
+        if not self.has_commands:
+            return [["0:00:00", 0], ["0:00:00", 0], ["0:00:00", 0]]
+
+        t1 = self.part_times[0]
+        if not self.split_found:
+            return [
+                [_seconds_to_dhms(t1), round(t1)],
+                ["0:00:00", 0],
+                [_seconds_to_dhms(t1), round(t1)]
+            ]
+
+        t2 = self.part_times[1]
+        total_time = t1 + t2
+        return [
+            [_seconds_to_dhms(t1), round(t1)],
+            [_seconds_to_dhms(t2), round(t2)],
+            [_seconds_to_dhms(total_time), round(total_time)]
+        ]
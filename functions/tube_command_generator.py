@@ -1,11 +1,17 @@
-from typing import List, Iterator
+from typing import Iterator
 import math
 import numpy as np
 from itertools import zip_longest
 
 from constants.const import GenerationConfig
 from functions.geometry_calculator import GeometryCalculator
-from functions.motion_commands import MotionCommand, PunchCommands, CommandType
+from functions.motion_commands import PunchCommands, CommandType
+from functions.punch_array_engine import (PunchLayout, RevolutionPunches, compute_revolution, active_angle_steps,
+                                          faster_blend_steps)
+from functions.random_offsets import create_random_offsets
+from functions.layer_plan import LayerPlan
+from functions.command_buffer import CommandBuffer, PHASE_MAIN, PHASE_STITCHING
+from functions.path_optimizer import optimize_revolution_path, revolution_end
 
 
 class TubeCommandGenerator:
@@ -42,48 +48,63 @@ class TubeCommandGenerator:
         return [i for pair in zip_longest(lst[:mid], lst[mid:])
                 for i in pair if i is not None]
             
+    @property
+    def layer_plan(self) -> LayerPlan:
+        """План слоев для текущих параметров (общий кэш LayerPlan)"""
+        return LayerPlan.for_params(self.params)
+
     def calclulate_number_of_revolutions(self):
-        diam_diff = self.params['o_diam'] - self.params['i_diam']
-        ideal_rotation_num = diam_diff / (self.params['fabric_thickness'] * 2)
-        return self.nearest_multiple(ideal_rotation_num, self.config.VOLUMETRIC_DENSITY_MAP[self.params['volumetric_density']])
+        return self.layer_plan.main_revolutions
     
-    def generate_random_offsets(self, revolutions):
-        total_cranks = 0
-        for revolution in range(revolutions):
-            angle_step_count = self.get_angle_steps_count(revolution)
-            total_cranks += angle_step_count
-        x_step_count = math.ceil(self.params['tube_len'] / self.params['head_len'])
-        volumetric_density = self.config.VOLUMETRIC_DENSITY_MAP[self.params['volumetric_density']]
-        x_substep_count = round(self.params['needle_step_X'] / volumetric_density)
-        total_punches = x_substep_count * x_step_count * total_cranks
-        self.random_offsets = self._generate_random_offsets(total_punches)
+    def generate_random_offsets(self):
+        """
+        Подготовка источника случайных смещений и сброс счетчика пробитий.
+
+        Массив смещений на всю программу больше не создается: смещения вычисляются
+        для каждого оборота по его номеру и номеру первого пробития.
+        Режим задается параметром 'random_mode' (по умолчанию GenerationConfig.RANDOM_MODE):
+        'sequential' воспроизводит прежнюю последовательность default_rng(RANDOM_SEED),
+        'counter' вычисляет смещение по (seed, оборот, шаг, зона, подшаг).
+        """
+        mode = self.params.get('random_mode', self.config.RANDOM_MODE)
+        low = 2 * self.config.CENTER_X - self.params['random_border']
+        high = self.params['random_border']
+        self.offset_source = create_random_offsets(mode, self.config.RANDOM_SEED, low, high)
         self.punch_counter = 0
 
-    def generate_punch_pattern_commands(self) -> List[MotionCommand]:
-        revolutions = self.calclulate_number_of_revolutions()
-        self.generate_random_offsets(revolutions + self.config.EXTRA_ROTATIONS)
+    def generate_punch_pattern_commands(self) -> CommandBuffer:
+        return CommandBuffer.concatenate(self.iter_revolution_batches())
 
-        commands = self.generate_commands(revolutions)
+    def iter_revolution_batches(self) -> Iterator[CommandBuffer]:
+        """
+        Генерация программы по одному обороту за раз.
 
-        if (len(commands) > 0):
-            commands.append(PunchCommands.waiting())
+        Порядок батчей совпадает с generate_punch_pattern_commands: основные обороты,
+        пауза для резки M110 (отдельный батч из одной команды, если основные обороты есть)
+        и обороты виртуальной прошивки с фиксированным смещением по Z.
+        Потребитель может обрабатывать батчи сразу, не дожидаясь генерации всей программы.
 
-        fix_z_offset = self.params['fabric_thickness'] * revolutions
-        commands_for_virtual_stitching = self.generate_commands(self.config.EXTRA_ROTATIONS, fix_z_offset=fix_z_offset)
-        commands.extend(commands_for_virtual_stitching)
+        Yields:
+            CommandBuffer: Команды одного оборота (или батч с командой M110)
+        """
+        self.completed_revolutions = 0
+        revolutions = self.calclulate_number_of_revolutions()
+        extra_revolutions = self.layer_plan.extra_revolutions
+        self.generate_random_offsets()
 
-        return commands
+        for punches in self.generate_revolution_arrays(revolutions):
+            yield self._revolution_buffer(punches, PHASE_MAIN)
 
-    def _generate_random_offsets(self, total_punches: int) -> np.ndarray:
-        """Генерация случайных смещений"""
-        seed = self.config.RANDOM_SEED
-        rng = np.random.default_rng(seed)
-        a = 2 * self.config.CENTER_X - self.params['random_border']
-        b = self.params['random_border']
-        return rng.uniform(a, b, size=total_punches)
+        if revolutions > 0:
+            yield CommandBuffer.from_commands([PunchCommands.waiting()])
+
+        fix_z_offset = self.params['fabric_thickness'] * revolutions
+        for punches in self.generate_revolution_arrays(extra_revolutions, fix_z_offset):
+            yield self._revolution_buffer(punches, PHASE_STITCHING)
 
-    
     def get_circle_len(self, revolution):
+        if 0 <= revolution < self.layer_plan.total_revolutions:
+            return float(self.layer_plan.circle_len[revolution])
         return math.pi * (self.params['i_diam'] + 2 * self.params['fabric_thickness'] * revolution)
 
     def get_angle_steps_count(self, revolution):
@@ -92,122 +113,171 @@ class TubeCommandGenerator:
         Расчет ведётся исходя из целевого шага self.params['punch_step_r']
         Количества рядов игл из self.params['num_of_needle_rows']
         Расстояния между рядами игл из self.params["needles_dist_y"]
+        (значение берется из плана слоев, см. layer_plan.layer_geometry)
+        """
+        return self.layer_plan.angle_step_count(revolution, self.params)
 
+    def get_punch_layout(self, revolution=None) -> PunchLayout:
         """
-        # Величина смещения игольницы по окружности
-        if self.params.get('num_of_needle_rows') == 1:
-            radial_head_offset = 2
-        else:
-            radial_head_offset = self.params.get('num_of_needle_rows') * self.params['needle_step_Y']
+        Раскладка пробитий вдоль X (зоны, подшаги, секции) для текущих параметров
 
-        # Идеальное количество шагов
-        circle_len = self.get_circle_len(revolution)
-        ideal_steps = circle_len / self.params['punch_step_r']
+        Args:
+            revolution (int): Номер оборота (None - раскладка основных оборотов;
+                              у оборотов прошивки подшаги могут быть прорежены)
 
-        # Два ближайших варианта, кратных radial_head_offset
-        low_steps = max(radial_head_offset, math.floor(ideal_steps / radial_head_offset) * radial_head_offset)
-        high_steps = math.ceil(ideal_steps / radial_head_offset) * radial_head_offset
+        Returns:
+            PunchLayout: Раскладка пробитий
+        """
+        if revolution is None:
+            return self.layer_plan.layout
+        return self.layer_plan.layout_for(revolution)
 
-        # Считаем шаги для каждого варианта
-        step_low = circle_len / low_steps
-        step_high = circle_len / high_steps
+    def generate_revolution_arrays(self, revolutions, fix_z_offset=None) -> Iterator[RevolutionPunches]:
+        """
+        Векторная генерация координат пробитий по оборотам.
+        Продолжает нумерацию оборотов и расход случайных смещений так же, как generate_commands.
 
-        # Выбираем вариант с шагом ближе к целевому
-        if abs(step_low - self.params['punch_step_r']) <= abs(step_high - self.params['punch_step_r']):
-            final_steps = low_steps
-        else:
-            final_steps = high_steps
+        Args:
+            revolutions (int): Количество оборотов
+            fix_z_offset (Optional[float]): Фиксированное смещение по Z (виртуальная прошивка)
 
-        return final_steps
+        Yields:
+            RevolutionPunches: Координаты пробитий одного оборота
+        """
+        start = self.completed_revolutions
+        finish = self.completed_revolutions + revolutions
+        for revolution in range(start, finish):
+            punches = self._compute_revolution(self.get_punch_layout(revolution), revolution,
+                                               self.punch_counter, fix_z_offset)
+            self.punch_counter += punches.punch_count
+            self.completed_revolutions += 1
+            yield punches
 
-    def generate_commands(self, revolutions, fix_z_offset=None):
-        volumetric_density = self.config.VOLUMETRIC_DENSITY_MAP[self.params['volumetric_density']]
-        support_depth = self.params['support_depth']
-        num_of_needle_rows = self.params.get('num_of_needle_rows', 1)
+    def generate_revolution(self, revolution, fix_z_offset=None) -> RevolutionPunches:
+        """
+        Независимая генерация координат пробитий произвольного оборота.
+        Не меняет состояние генератора (счетчики оборотов и пробитий).
 
-        x_step_count = math.ceil(self.params['tube_len'] / self.params['head_len'])
-        x_step_size = self.params['head_len']
-        x_step_offset_1 = 0
-        x_step_offset_2 = (x_step_count - 1) * x_step_size
+        Args:
+            revolution (int): Номер оборота (обороты прошивки продолжают нумерацию основных)
+            fix_z_offset (Optional[float]): Фиксированное смещение по Z (виртуальная прошивка)
 
-        x_substep_count = round(self.params['needle_step_X'] / volumetric_density)
-        x_substep_size = round(
-            self.params['needle_step_X'] / volumetric_density / x_substep_count)  # params['punch_step_r']
-        x_substep_offset_1 = 0
-        x_substep_offset_2 = (x_substep_count - 1) * x_substep_size
+        Returns:
+            RevolutionPunches: Координаты пробитий оборота
+        """
+        if not hasattr(self, 'offset_source'):
+            self.generate_random_offsets()
+        return self._compute_revolution(self.get_punch_layout(revolution), revolution,
+                                        self.first_punch_index(revolution), fix_z_offset)
 
-        section_count = volumetric_density  # количество оборотов для заполнения полного паттерна вдоль Х (int)
-        section_size = self.params['needle_step_X'] / section_count
+    def seek_revolution(self, revolution):
+        """
+        Перевод генератора к началу оборота: следующий вызов generate_revolution_arrays /
+        generate_commands продолжит генерацию с этого оборота так же, как при
+        последовательной генерации всех предыдущих оборотов.
 
-        commands = []
+        Args:
+            revolution (int): Номер оборота
+        """
+        if not hasattr(self, 'offset_source'):
+            self.generate_random_offsets()
+        self.completed_revolutions = revolution
+        self.punch_counter = self.first_punch_index(revolution)
 
-        start = self.completed_revolutions
-        finish = self.completed_revolutions + revolutions
-        for revolution in range(start, finish):
-            angle_step_count = self.get_angle_steps_count(revolution)
-            angle_step_size = 360 / angle_step_count
-
-            for angle_step in range(angle_step_count):
-                # Вычисляем угол с учетом смещения от предыдущих вызовов generate_commands
-                angle_deg = round(360 * revolution + angle_step_size * angle_step, 3)
-
-                circumferential_head_step = num_of_needle_rows * self.params['needle_step_Y']
-                # пробиваем зоны между иглами (в радиальном направлении)
-                # если заполнили то делаем проворот на всю длину игольницы
-                if self.params['needle_step_Y'] <= (angle_step % circumferential_head_step) <= (circumferential_head_step - 1):
-                    # просто проворачиваем
-                    # Вычисляем угол с учетом смещения от предыдущих вызовов generate_commands
-                    # angle_deg = round(360 * revolution + angle_step_size * angle_step, 3)
-                    direction = not bool(
-                        (revolution * angle_step_count + angle_step) % 2)  # самый первый удар имеет направление true
-
-                    commands.append(PunchCommands.rotate(angle_deg, self.params['rotate_speed']))
-
-                    continue
-
-                direction = not bool(
-                    (revolution * angle_step_count + angle_step) % 2)  # самый первый удар имеет направление true
-
-                commands.append(PunchCommands.rotate(angle_deg, self.params['rotate_speed']))
-                for x_step in range(x_step_count):
-                    for x_substep in range(x_substep_count):
-                    # for x_substep in self.reorder_range(x_substep_count): #  новая версия, раскомментировать вместе с апдейтом тестов
-                        random_offset = self.random_offsets[self.punch_counter]
-                        self.punch_counter += 1
-                        x_snake_offset = (angle_step % 2) * x_substep_size / 2
-
-                        # смещение для слоя (каждый полный оборот)
-                        x_section_offset = (revolution % section_count) * section_size
-
-                        # поддержка обратного движения (для змейкообразного паттерна)
-                        start_x_step_offset = x_step_offset_1 if direction else x_step_offset_2
-                        x_step_offset = abs(x_step_size * x_step - start_x_step_offset)
-
-                        # поддержка обратного движения (для змейкообразного паттерна)
-                        start_x_substep_offset = x_substep_offset_1 if direction else x_substep_offset_2
-                        x_substep_offset = abs(x_substep_size * x_substep - start_x_substep_offset)
-
-                        y_offset = self.params['fabric_thickness'] * revolution
-                        z_offset = fix_z_offset if fix_z_offset is not None else self.params['fabric_thickness'] * revolution
-
-                        # random_offset = 0
-                        x = round(random_offset +
-                                  x_snake_offset +
-                                  x_section_offset +
-                                  x_substep_offset +
-                                  x_step_offset, 3)
-                        y = round(self.params['zero_offset_Y'] - self.params['punch_offset'] - y_offset, 3)
-                        z = round(self.params['zero_offset_Z'] - z_offset, 3)
-
-                        y_punch = y + self.params['punch_depth'] + self.params['punch_offset']
-                        z_punch = z + support_depth
-
-                        commands.append(PunchCommands.approach(x, y, z, self.params['idling_speed']))
-                        commands.append(PunchCommands.punch(x, y_punch, z_punch, self.params['move_speed']))
-                        commands.append(PunchCommands.retract(x, y, z, self.params['move_speed']))
-
-        self.completed_revolutions += revolutions # Сохраняем для следующих вызовов функции
-        return commands
+    def first_punch_index(self, revolution) -> int:
+        """
+        Глобальный номер первого пробития оборота (сумма пробитий предыдущих оборотов)
+
+        Args:
+            revolution (int): Номер оборота
+
+        Returns:
+            int: Номер первого пробития
+        """
+        plan = self.layer_plan
+        if revolution < plan.total_revolutions:
+            return int(plan.first_punch[revolution])
+        # обороты за пределами плана (например, дополнительная прошивка)
+        layout = plan.stitching_layout
+        extra = sum(int(active_angle_steps(layout, self.get_angle_steps_count(previous)).sum())
+                    for previous in range(plan.total_revolutions, revolution))
+        return plan.total_punches + extra * layout.punches_per_crank
+
+    def _compute_revolution(self, layout: PunchLayout, revolution: int, first_punch: int,
+                            fix_z_offset=None) -> RevolutionPunches:
+        """
+        Расчет оборота со смещениями из источника случайных смещений.
+        При параметре 'optimize_path' (по умолчанию GenerationConfig.OPTIMIZE_PATH)
+        порядок пробитий оптимизируется по времени перемещений по X
+        с ограничением 'path_constraint' (см. path_optimizer).
+        """
+        punches = self._raw_revolution(layout, revolution, first_punch, fix_z_offset)
+        if not self.params.get('optimize_path', self.config.OPTIMIZE_PATH):
+            return punches
+
+        if self.layer_plan.starts_phase(revolution):
+            entry = (0.0, 0.0, 0.0)
+        else:
+            # позиция после предыдущего оборота зависит только от его набора X
+            previous = getattr(self, '_path_previous', None)
+            if previous is None or previous[0] != (revolution - 1, fix_z_offset):
+                previous = ((revolution - 1, fix_z_offset),
+                            revolution_end(self._raw_revolution(self.get_punch_layout(revolution - 1),
+                                                                revolution - 1,
+                                                                self.first_punch_index(revolution - 1),
+                                                                fix_z_offset)))
+            entry = previous[1]
+        self._path_previous = ((revolution, fix_z_offset), revolution_end(punches))
+        return optimize_revolution_path(punches, entry, self.params['idling_speed'],
+                                        self.params.get('path_constraint', self.config.PATH_CONSTRAINT))
+
+    def _raw_revolution(self, layout: PunchLayout, revolution: int, first_punch: int,
+                        fix_z_offset=None) -> RevolutionPunches:
+        """Расчет оборота в исходном порядке змейки"""
+        angle_step_count = self.get_angle_steps_count(revolution)
+        active_steps = np.flatnonzero(active_angle_steps(layout, angle_step_count))
+        offsets = self.offset_source.revolution_offsets(revolution, first_punch, active_steps,
+                                                        layout.x_step_count, layout.x_substep_count)
+        return compute_revolution(self.params, layout, revolution, angle_step_count,
+                                  offsets.reshape(-1), fix_z_offset)
+
+    def generate_commands(self, revolutions, fix_z_offset=None) -> CommandBuffer:
+        """
+        Генерация команд для заданного количества оборотов
+
+        Args:
+            revolutions (int): Количество оборотов
+            fix_z_offset (Optional[float]): Фиксированное смещение по Z (виртуальная прошивка)
+
+        Returns:
+            CommandBuffer: Колоночный буфер команд (последовательность MotionCommand)
+        """
+        phase = PHASE_STITCHING if fix_z_offset is not None else PHASE_MAIN
+        return CommandBuffer.concatenate(
+            self._revolution_buffer(punches, phase)
+            for punches in self.generate_revolution_arrays(revolutions, fix_z_offset)
+        )
+
+    def _revolution_buffer(self, punches: RevolutionPunches, phase: int) -> CommandBuffer:
+        """
+        Команды оборота в колоночном представлении.
+        Режим объединения поворотов задается параметром 'merge_rotations'
+        (по умолчанию GenerationConfig.MERGE_ROTATIONS) или, только для прошивки,
+        'stitching_merge_rotations' (см. LayerPlan.merges_rotations): повороты шагов
+        без пробития пропускаются, последний поворот сохраняется только в конце фазы.
+        Параметр 'blend_rotations' (по умолчанию GenerationConfig.BLEND_ROTATIONS)
+        совмещает поворот с первым подходом шага, когда иглы извлечены и совмещение
+        быстрее раздельных команд (faster_blend_steps).
+        """
+        merge = self.layer_plan.merges_rotations(punches.revolution, self.params)
+        blend = self.params.get('blend_rotations', self.config.BLEND_ROTATIONS)
+        if blend:
+            blend = faster_blend_steps(self.params, self.layer_plan.layout_for(punches.revolution),
+                                       punches.revolution, punches.angles.size, merge)
+        return CommandBuffer.from_punches(punches, self.params['rotate_speed'], self.params['idling_speed'],
+                                          self.params['move_speed'], phase, merge_rotations=merge,
+                                          keep_last_rotation=self.layer_plan.ends_phase(punches.revolution),
+                                          blend_rotations=blend)
 
     def get_generation_statistics(self) -> dict:
         """
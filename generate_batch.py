@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Пакетная генерация G-кода: набор параметров из файла заданий (JSON / CSV),
+программы генерируются параллельно в пуле процессов
+"""
+
+import argparse
+import os
+import sys
+import time
+
+from functions.batch_jobs import load_jobs, run_batch, write_summary, format_summary, STATUS_OK
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Пакетная генерация G-кода иглопробивного станка'
+    )
+    parser.add_argument(
+        'jobs',
+        type=str,
+        help='Файл заданий: JSON (список объектов параметров) или CSV (заголовок - имена параметров); '
+             'поля name и output необязательны, недостающие параметры берутся из advanced_dict'
+    )
+    parser.add_argument(
+        '--output-dir',
+        type=str,
+        default='gcode/batch',
+        help='Каталог файлов G-кода, по умолчанию: gcode/batch'
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=os.cpu_count() or 1,
+        help='Количество процессов (заданий одновременно), по умолчанию: количество ядер'
+    )
+    parser.add_argument(
+        '--summary',
+        type=str,
+        default=None,
+        help='Итоговая таблица CSV, по умолчанию: <output-dir>/summary.csv'
+    )
+
+    args = parser.parse_args()
+    try:
+        jobs = load_jobs(args.jobs, args.output_dir)
+    except (OSError, ValueError) as error:
+        parser.error(f'Файл заданий {args.jobs}: {error}')
+    summary_path = args.summary or os.path.join(args.output_dir, 'summary.csv')
+    os.makedirs(os.path.dirname(os.path.abspath(summary_path)), exist_ok=True)
+
+    print("=" * 80)
+    print("ПАКЕТНАЯ ГЕНЕРАЦИЯ G-КОДА")
+    print("=" * 80)
+    print(f"  jobs: {args.jobs} ({len(jobs)} заданий)")
+    print(f"  output_dir: {args.output_dir}, workers: {args.workers}")
+
+    start = time.perf_counter()
+    results = run_batch(jobs, workers=args.workers)
+    elapsed = time.perf_counter() - start
+    write_summary(results, summary_path)
+
+    print()
+    print(format_summary(results, elapsed))
+    print(f"Итоговая таблица: {summary_path}")
+    print("=" * 80)
+    return 0 if all(result.status == STATUS_OK for result in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Скрипт генерации G-кода из командной строки (без графического интерфейса)
+"""
+
+import argparse
+import json
+import os
+import time
+
+from constants.const import advanced_dict
+from functions.compressed_io import COMPRESSIONS, compression_from_path
+from functions.gcode_file_formatter import GCODE_MODE_COMPACT
+from functions.macro_program import DIALECTS
+from functions.path_optimizer import PATH_CONSTRAINTS
+from functions.punch_array_engine import STROKE_PROFILES
+from functions.stitching_planner import plan_stitching, select_stitching_plan, format_stitching_plan
+from functions.job_estimator import estimate_density_schedule, format_density_schedule
+from functions.parameter_optimizer import optimize_parameters, format_pareto
+from functions.program_splitter import ProgramSplitter
+from functions.prod_functions import (check_params_for_validity, write_gcode_file, generation_reports,
+                                      generate_split_gcode_files, generate_macro_gcode_file)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Генерация G-кода иглопробивного станка'
+    )
+    parser.add_argument(
+        '--params',
+        type=str,
+        default=None,
+        help='JSON файл с параметрами пробития (недостающие берутся из advanced_dict)'
+    )
+    parser.add_argument(
+        '--output',
+        type=str,
+        default='gcode/program.txt',
+        help='Путь к файлу G-кода (.gz / .xz - со сжатием), по умолчанию: gcode/program.txt'
+    )
+    parser.add_argument(
+        '--compress',
+        choices=COMPRESSIONS,
+        default=None,
+        help='Сжатие файла при записи (по умолчанию - по расширению --output)'
+    )
+    parser.add_argument(
+        '--level',
+        type=int,
+        default=None,
+        help='Уровень сжатия (gz: 1-9, xz: 0-9), по умолчанию: 6'
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=1,
+        help='Количество процессов генерации, по умолчанию: 1'
+    )
+    parser.add_argument(
+        '--pipeline',
+        action='store_true',
+        help='Генерация, форматирование и запись на отдельных потоках'
+    )
+    parser.add_argument(
+        '--report',
+        action='store_true',
+        help='Отчеты после записи: стадии конвейера, экономия формата и выигрыш включенных оптимизаций '
+             '(сравнение с исходным вариантом повторяет расчет программы)'
+    )
+
+    parser.add_argument(
+        '--compact',
+        action='store_true',
+        help='Компактный G-код: G01, X, Y, Z, A, F печатаются только при изменении'
+    )
+    parser.add_argument(
+        '--no-comments',
+        action='store_true',
+        help='Без комментариев в строках команд'
+    )
+    parser.add_argument(
+        '--merge-rotations',
+        action='store_true',
+        help='Объединять подряд идущие повороты без пробития в один поворот'
+    )
+    parser.add_argument(
+        '--blend-rotations',
+        action='store_true',
+        help='Совмещать поворот с подходом следующего шага в одну команду G01'
+    )
+    parser.add_argument(
+        '--stroke-profile',
+        choices=STROKE_PROFILES,
+        default=None,
+        help='Профиль удара: single - одним движением (по умолчанию), '
+             'two_stage - быстрый подвод к поверхности ткани и быстрое извлечение'
+    )
+    parser.add_argument(
+        '--surface-clearance',
+        type=float,
+        default=None,
+        help='С --stroke-profile two_stage: зазор до поверхности ткани, мм (по умолчанию: 1.0)'
+    )
+    parser.add_argument(
+        '--optimize-path',
+        action='store_true',
+        help='Оптимизировать порядок пробитий по времени перемещений по X'
+    )
+    parser.add_argument(
+        '--path-constraint',
+        choices=PATH_CONSTRAINTS,
+        default=None,
+        help='С --optimize-path: alternate - соседние шаги в противоположных направлениях '
+             '(по умолчанию), free - без ограничения'
+    )
+    parser.add_argument(
+        '--density-schedule',
+        action='store_true',
+        help='Количество угловых шагов каждого слоя по целевой поверхностной плотности пробитий'
+    )
+    parser.add_argument(
+        '--target-density',
+        type=float,
+        default=None,
+        help='С --density-schedule: целевая плотность, пробитий/см² (по умолчанию - плотность шага punch_step_r)'
+    )
+    parser.add_argument(
+        '--density-tolerance',
+        type=float,
+        default=None,
+        help='С --density-schedule: допустимое относительное отклонение плотности, по умолчанию: 0.05'
+    )
+    parser.add_argument(
+        '--density-report',
+        action='store_true',
+        help='Отчет по слоям: постоянный шаг и расписание по плотности (без генерации)'
+    )
+    parser.add_argument(
+        '--extra-rotations',
+        type=int,
+        default=None,
+        help='Количество оборотов виртуальной прошивки (Part 2), по умолчанию: 20'
+    )
+    parser.add_argument(
+        '--stitching-substep-stride',
+        type=int,
+        default=None,
+        help='Прошивка: пробивать каждый N-й подшаг зоны, по умолчанию: 1'
+    )
+    parser.add_argument(
+        '--stitching-merge-rotations',
+        action='store_true',
+        help='Прошивка: объединять подряд идущие повороты без пробития'
+    )
+    parser.add_argument(
+        '--plan-stitching',
+        action='store_true',
+        help='Сравнить варианты прошивки по времени и покрытию (без генерации)'
+    )
+    parser.add_argument(
+        '--min-punch-ratio',
+        type=float,
+        default=0.5,
+        help='С --plan-stitching: минимальная доля пробитий прошивки для выбора варианта, по умолчанию: 0.5'
+    )
+    parser.add_argument(
+        '--optimize-params',
+        action='store_true',
+        help='Парето-оптимальные наборы параметров (время и плотность проколов) '
+             'для трубы из --params, оценка на --workers процессах (без генерации)'
+    )
+    parser.add_argument(
+        '--min-density',
+        type=float,
+        default=None,
+        help='С --optimize-params: минимальная плотность проколов, 1/см²'
+    )
+    parser.add_argument(
+        '--min-random-border',
+        type=float,
+        default=None,
+        help='С --optimize-params: минимальное случайное смещение'
+    )
+    parser.add_argument(
+        '--macro',
+        choices=tuple(DIALECTS),
+        default=None,
+        help='Удар пробития - подпрограмма контроллера с вызовом по X (диалект вызова)'
+    )
+    parser.add_argument(
+        '--no-sweep',
+        action='store_true',
+        help='С --macro: без подпрограмм прохода по X (вызов на каждое пробитие)'
+    )
+    parser.add_argument(
+        '--split-part',
+        action='store_true',
+        help='Запись частями: новая часть после паузы для резки M110'
+    )
+    parser.add_argument(
+        '--max-lines',
+        type=int,
+        default=None,
+        help='Запись частями: максимальное количество строк файла части'
+    )
+    parser.add_argument(
+        '--max-bytes',
+        type=int,
+        default=None,
+        help='Запись частями: максимальный размер файла части в байтах'
+    )
+
+    args = parser.parse_args()
+    split = args.split_part or args.max_lines is not None or args.max_bytes is not None
+    if split and (args.compress or compression_from_path(args.output)):
+        parser.error('Запись частями выполняется без сжатия')
+    if args.macro and (split or args.compress or compression_from_path(args.output)):
+        parser.error('Программа с подпрограммами записывается одним файлом без сжатия')
+    if args.macro and args.stroke_profile not in (None, 'single'):
+        parser.error('Программа с подпрограммами поддерживает только профиль удара single')
+
+    params = dict(advanced_dict)
+    if args.params:
+        with open(args.params, encoding='utf-8') as file:
+            params.update(json.load(file))
+    if args.compact:
+        params['gcode_mode'] = GCODE_MODE_COMPACT
+    if args.no_comments:
+        params['gcode_comments'] = False
+    if args.merge_rotations:
+        params['merge_rotations'] = True
+    if args.blend_rotations:
+        params['blend_rotations'] = True
+    if args.stroke_profile:
+        params['stroke_profile'] = args.stroke_profile
+    if args.surface_clearance is not None:
+        params['surface_clearance'] = args.surface_clearance
+    if args.density_schedule:
+        params['density_schedule'] = True
+    if args.target_density is not None:
+        params['target_density'] = args.target_density
+    if args.density_tolerance is not None:
+        params['density_tolerance'] = args.density_tolerance
+    if args.extra_rotations is not None:
+        params['extra_rotations'] = args.extra_rotations
+    if args.stitching_substep_stride is not None:
+        params['stitching_substep_stride'] = args.stitching_substep_stride
+    if args.stitching_merge_rotations:
+        params['stitching_merge_rotations'] = True
+    if args.optimize_path:
+        params['optimize_path'] = True
+    if args.path_constraint:
+        params['path_constraint'] = args.path_constraint
+
+    is_valid, invalid_param, error_message = check_params_for_validity(params)
+    if not is_valid:
+        parser.error(f'Ошибка в параметре "{invalid_param}": {error_message}')
+
+    if args.optimize_params:
+        print(format_pareto(optimize_parameters(params, workers=args.workers, min_density=args.min_density,
+                                               min_random_border=args.min_random_border)))
+        return
+    if args.density_report:
+        print(format_density_schedule(estimate_density_schedule(params)))
+        return
+    if args.plan_stitching:
+        rows = plan_stitching(params)
+        selected = select_stitching_plan(rows, min_punch_ratio=args.min_punch_ratio)
+        strategy = selected['strategy']
+        print(format_stitching_plan(rows, selected))
+        print(f"\nВыбран вариант '{strategy.name}': --extra-rotations {strategy.extra_rotations} "
+              f"--stitching-substep-stride {strategy.substep_stride}"
+              + (" --stitching-merge-rotations" if strategy.merge_rotations else ""))
+        return
+
+    compression = args.compress or compression_from_path(args.output)
+    output_dir = os.path.dirname(os.path.abspath(args.output))
+    os.makedirs(output_dir, exist_ok=True)
+
+    print("=" * 80)
+    print("ГЕНЕРАЦИЯ G-КОДА")
+    print("=" * 80)
+    print(f"  output_file: {args.output}")
+    print(f"  compression: {compression or 'нет'}" + (f" (level {args.level})" if args.level is not None else ""))
+    print(f"  workers: {args.workers}, pipeline: {args.pipeline}")
+
+    start = time.perf_counter()
+    if args.macro:
+        summary = generate_macro_gcode_file(params, args.output, dialect=args.macro, sweep=not args.no_sweep)
+        time_data = summary['time_data']
+        print(f"Подпрограммы {args.macro}: {summary['text_bytes'] / 2 ** 20:.2f} МБ вместо "
+              f"{summary['flat_bytes'] / 2 ** 20:.2f} МБ (в {summary['flat_bytes'] / summary['text_bytes']:.1f} раза), "
+              f"строк {summary['macro_lines']} вместо {summary['command_lines']}, вызовов {summary['calls']}, "
+              f"подпрограмм прохода {summary['sweeps']}")
+        print(f"\nВремя выполнения программы: {time_data[2][0]} "
+              f"(Part 1: {time_data[0][0]}, Part 2: {time_data[1][0]})")
+        print(f"Размер файла: {os.path.getsize(args.output) / 2 ** 20:.2f} МБ, "
+              f"генерация: {time.perf_counter() - start:.2f} с")
+        print("=" * 80)
+        return
+    if split:
+        manifest = generate_split_gcode_files(params, args.output, by_part=args.split_part,
+                                              max_lines=args.max_lines, max_bytes=args.max_bytes)
+        elapsed = time.perf_counter() - start
+        time_data = manifest['time_data']
+        print(f"\nВремя выполнения программы: {time_data[2][0]} "
+              f"(Part 1: {time_data[0][0]}, Part 2: {time_data[1][0]})")
+        for part in manifest['parts']:
+            print(f"  {part['file']}: обороты {part['revolutions'][0]}-{part['revolutions'][1]}, "
+                  f"строк {part['lines']}, {part['bytes'] / 2 ** 20:.2f} МБ, время {part['time'][0]}")
+        print(f"Манифест: {ProgramSplitter.manifest_path(args.output)}, генерация: {elapsed:.2f} с")
+        print("=" * 80)
+        return
+
+    summary = write_gcode_file(params, args.output, workers=args.workers, pipeline=args.pipeline,
+                               compression=compression, level=args.level)
+    elapsed = time.perf_counter() - start
+    time_data = summary['time_data']
+    if args.report:
+        for report in generation_reports(params, summary):
+            print(report)
+
+    print(f"\nВремя выполнения программы: {time_data[2][0]} "
+          f"(Part 1: {time_data[0][0]}, Part 2: {time_data[1][0]})")
+    print(f"Размер файла: {os.path.getsize(args.output) / 2 ** 20:.2f} МБ, генерация: {elapsed:.2f} с")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Расчет сетки размеров трубы для предварительной оценки заказа: обороты, пробития
+и время выполнения для всех сочетаний параметров без генерации G-кода
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+from constants.const import advanced_dict
+from functions.parameter_sweep import SWEEP_PARAMS, sweep_parameters, write_sweep_csv, parse_sweep_values
+from functions.time_calc import _seconds_to_dhms
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Сетка размеров трубы: обороты, пробития и время выполнения (без генерации)'
+    )
+    parser.add_argument(
+        '--params',
+        type=str,
+        default=None,
+        help='JSON файл с параметрами пробития (недостающие берутся из advanced_dict)'
+    )
+    for name in SWEEP_PARAMS:
+        parser.add_argument(
+            f"--{name.replace('_', '-')}",
+            dest=name,
+            type=str,
+            default=None,
+            help=f'Значения {name}: список через запятую и/или диапазоны начало:конец:шаг '
+                 f'(по умолчанию - значение из параметров)'
+        )
+    parser.add_argument(
+        '--output',
+        type=str,
+        default='gcode/sweep.csv',
+        help='Таблица CSV, по умолчанию: gcode/sweep.csv'
+    )
+
+    args = parser.parse_args()
+    params = dict(advanced_dict)
+    if args.params:
+        with open(args.params, encoding='utf-8') as file:
+            params.update(json.load(file))
+    try:
+        values = {name: parse_sweep_values(getattr(args, name)) for name in SWEEP_PARAMS
+                  if getattr(args, name) is not None}
+        if 'volumetric_density' in values:
+            values['volumetric_density'] = values['volumetric_density'].astype(int)
+        start = time.perf_counter()
+        table = sweep_parameters(params, values)
+    except ValueError as error:
+        parser.error(f'Сетка параметров: {error}')
+    elapsed = time.perf_counter() - start
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    write_sweep_csv(table, args.output)
+
+    valid = table[table['valid']]
+    print(f"Сочетаний: {table.size} (недопустимых размеров: {table.size - valid.size}), "
+          f"расчет: {elapsed:.2f} с, таблица: {args.output}")
+    if valid.size:
+        print(f"Время программы: {_seconds_to_dhms(valid['total_seconds'].min())} - "
+              f"{_seconds_to_dhms(valid['total_seconds'].max())}, "
+              f"пробитий: {valid['total_punches'].min()} - {valid['total_punches'].max()}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
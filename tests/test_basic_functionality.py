@@ -3,16 +3,54 @@
 Базовые тесты функциональности генератора
 """
 
+import contextlib
+import io
 import sys
 import os
+import tempfile
 import unittest
+from unittest import mock
+from dataclasses import replace
+
+import numpy as np
 
 # Добавляем родительский каталог в путь для импорта модулей
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from functions.advanced_punch_generator import CommandLinesGenerator
-from functions.time_calc import time_prediction_motioncommand
-from functions.prod_functions import calculate_execution_time
+from functions.time_calc import (time_prediction_motioncommand, time_prediction_with_move_times,
+                                 _calculate_motion_time, MotionTimeAccumulator)
+from functions.prod_functions import (calculate_execution_time, generate_gcode_file, write_in_file_by_lines,
+                                      generate_split_gcode_files, generate_macro_gcode_file,
+                                      compare_execution_time)
+from functions.tube_command_generator import TubeCommandGenerator
+from functions.punch_array_engine import round_array, active_angle_steps, faster_blend_steps
+from functions.command_buffer import CommandBuffer
+from functions.gcode_file_formatter import GCodeFileFormatter
+from functions.motion_commands import MotionCommand, PunchCommands
+from functions.random_offsets import CounterRandomOffsets, philox4x32
+from functions.layer_plan import LayerPlan, target_density
+from functions.bulk_writer import BulkFileWriter
+from functions.gcode_stream_writer import GCodeStreamWriter, scan_program
+from functions.compressed_io import read_gcode_lines, detect_compression
+from functions.pipeline_generation import GenerationPipeline
+from functions.job_estimator import (estimate_job, estimate_rotation_merge, estimate_stroke_profiles,
+                                    estimate_density_schedule,
+                                    TIME_TOLERANCE, FILE_SIZE_TOLERANCE)
+from functions.macro_program import expand_macro_program
+from functions.stitching_planner import StitchingStrategy, plan_stitching, select_stitching_plan
+from functions.parameter_optimizer import optimize_parameters, needle_density
+from functions.batch_jobs import BatchJob, JobResult, load_jobs, run_batch, run_job, write_summary
+from functions.parameter_sweep import sweep_parameters, write_sweep_csv
+from functions.geometry_calculator import GeometryCalculator
+from functions.parameter_validator import ParameterValidator
+
+
+def _crash_or_succeed(job):
+    """Задание пакета для проверки изоляции: 'crash' завершает процесс-исполнитель"""
+    if job.name == 'crash':
+        os._exit(1)
+    return JobResult(name=job.name, status='ok', output=job.output)
 
 
 class TestBasicFunctionality(unittest.TestCase):
@@ -102,6 +140,752 @@ class TestBasicFunctionality(unittest.TestCase):
         self.assertIn('G-code has been generated', file_content)
         self.assertIn('G01', file_content)
 
+    def test_round_array_matches_builtin_round(self):
+        """Тест векторного округления (должно совпадать с round())"""
+        values = [0.0005, 0.0015, 1.0025, -2.0035, 264.0145, 123.4565, -0.0004, 7.77749999]
+        rounded = round_array(values, 3).tolist()
+
+        self.assertEqual(rounded, [round(value, 3) for value in values])
+
+    def test_revolution_arrays_match_commands(self):
+        """Тест соответствия векторного расчета пробитий командам подхода"""
+        params = dict(self.minimal_params, o_diam=14, num_of_needle_rows=2)
+
+        generator = TubeCommandGenerator(params)
+        revolutions = generator.calclulate_number_of_revolutions()
+        generator.generate_random_offsets()
+        punches = list(generator.generate_revolution_arrays(revolutions))
+
+        generator = TubeCommandGenerator(params)
+        generator.generate_random_offsets()
+        commands = generator.generate_commands(revolutions)
+
+        approach_x = [cmd.x for cmd in commands if cmd.comment == "Подход к точке пробития"]
+        rotations = [cmd.a for cmd in commands if cmd.a is not None]
+
+        self.assertEqual(approach_x, [x for item in punches for x in item.x.ravel().tolist()])
+        self.assertEqual(rotations, [a for item in punches for a in item.angles.tolist()])
+
+    def test_seekable_random_offsets(self):
+        """Тест независимой генерации оборотов в совместимом и счетчиковом режимах"""
+        self.assertEqual([hex(int(word)) for word in philox4x32((0, 0, 0, 0), (0, 0))],
+                         ['0x6627e8d5', '0xe169c58d', '0xbc57ac4c', '0x9b00dbd8'])
+
+        for mode in ('sequential', 'counter'):
+            params = dict(self.minimal_params, o_diam=14, num_of_needle_rows=2, random_mode=mode)
+            generator = TubeCommandGenerator(params)
+            revolutions = generator.calclulate_number_of_revolutions()
+            generator.generate_random_offsets()
+            fix_z_offset = params['fabric_thickness'] * revolutions
+            sequence = (list(generator.generate_revolution_arrays(revolutions))
+                        + list(generator.generate_revolution_arrays(2, fix_z_offset)))
+
+            seeker = TubeCommandGenerator(params)
+            for revolution in (revolutions + 1, 0, revolutions - 1):
+                fix = fix_z_offset if revolution >= revolutions else None
+                punches = seeker.generate_revolution(revolution, fix)
+                self.assertEqual(punches.x.tolist(), sequence[revolution].x.tolist())
+                self.assertEqual(punches.z, sequence[revolution].z)
+
+        source = CounterRandomOffsets(5, -0.5, 0.5)
+        offsets = source.revolution_offsets(3, 0, np.array([0, 4]), 2, 3)
+        self.assertEqual(offsets[1, 1, 2], source.punch_offset(3, 4, 1, 2))
+        self.assertTrue(((offsets >= -0.5) & (offsets < 0.5)).all())
+
+    def test_layer_plan_matches_generated_program(self):
+        """Тест плана слоев: статистика заголовка совпадает со сгенерированной программой"""
+        params = dict(self.minimal_params, o_diam=14, num_of_needle_rows=2)
+        generator = TubeCommandGenerator(params)
+        plan = LayerPlan.for_params(params)
+        self.assertIs(plan, LayerPlan.for_params(dict(params)))
+
+        buffer = generator.generate_punch_pattern_commands()
+        approaches = buffer.comment_mask([PunchCommands.APPROACH_COMMENT])
+        rotations = ~np.isnan(buffer.a)
+
+        self.assertEqual(int(rotations.sum()), int(plan.step_count.sum()))
+        self.assertEqual(int(approaches.sum()), plan.total_punches)
+        self.assertEqual(generator.get_generation_statistics()['total_punches'], plan.total_punches)
+        self.assertEqual(plan.first_punch.tolist(),
+                         [generator.first_punch_index(r) for r in range(plan.total_revolutions)])
+        self.assertEqual(int(plan.first_punch[-1] + plan.punches[-1]), plan.total_punches)
+
+    def test_command_buffer_matches_command_list(self):
+        """Тест колоночного буфера: представления команд, статистика и форматирование"""
+        generator = CommandLinesGenerator(self.minimal_params)
+        buffer = generator.generate_command_buffer()
+        commands = buffer.to_commands()
+
+        self.assertIsInstance(buffer, CommandBuffer)
+        self.assertEqual(len(buffer), len(commands))
+        self.assertEqual(CommandBuffer.from_commands(commands).to_commands(), commands)
+
+        formatter = GCodeFileFormatter(self.minimal_params)
+        self.assertEqual(formatter.count_command_statistics(buffer),
+                         formatter.count_command_statistics(commands))
+        self.assertEqual(formatter._format_commands(buffer),
+                         [command.to_gcode_string() for command in commands])
+        self.assertEqual(time_prediction_motioncommand(buffer),
+                         time_prediction_motioncommand(commands))
+
+    def test_vectorized_move_times(self):
+        """Тест векторного расчета времени: незаданные оси, паузы, M110 и совпадение со скалярным расчетом"""
+        commands = [
+            MotionCommand.linear_move(a=90, feed_rate=2000),
+            MotionCommand.linear_move(x=10.5, y=3, z=-1, feed_rate=5000),
+            MotionCommand.linear_move(y=20, feed_rate=1000),
+            MotionCommand.linear_move(x=10.5, a=180),
+            MotionCommand.pause(1.5),
+            PunchCommands.waiting(),
+            MotionCommand.linear_move(x=0.001, feed_rate=6000),
+            MotionCommand.linear_move(a=0.5, feed_rate=60),
+        ]
+        time_data, move_times = time_prediction_with_move_times(commands)
+
+        self.assertEqual(len(move_times), len(commands))
+        self.assertEqual(move_times[5], 0.0)
+        self.assertEqual(move_times[4], 1.5)
+        self.assertEqual(time_data, time_prediction_motioncommand(commands))
+
+        # накопленное время совпадает со скалярным расчетом бит в бит (Part 2 - с нулевой позиции)
+        expected = [_calculate_motion_time(commands[:idx + 1]) for idx in range(5)]
+        self.assertEqual(np.cumsum(move_times[:5]).tolist(), expected)
+        self.assertEqual(sum(move_times[6:].tolist()), _calculate_motion_time(commands[6:]))
+
+    def test_bulk_formatter_edge_values(self):
+        """Тест пакетного форматирования: целые, отрицательные, -0.0, половинные значения"""
+        commands = [
+            PunchCommands.rotate(0, 3000),
+            PunchCommands.rotate(12.5, 3000),
+            PunchCommands.approach(-0.0, 5, -19.0, 6000),
+            PunchCommands.punch(-0.0, 2.675, 0.0005, 1200),
+            PunchCommands.retract(-0.0, 5, -19.0, 1200),
+            MotionCommand.linear_move(x=1.0005, y=-2.675, feed_rate=1500.0),
+            MotionCommand.linear_move(x=7, z=123456.7895, a=-0.0004, feed_rate=None),
+            PunchCommands.waiting(),
+            MotionCommand.pause(0.5),
+            MotionCommand.linear_move(x=7.0, y=None, comment="Другое"),
+        ]
+        buffer = CommandBuffer.from_commands(commands)
+        formatter = GCodeFileFormatter(self.minimal_params)
+        expected = [command.to_gcode_string() for command in commands]
+
+        self.assertEqual(formatter.format_commands(buffer), expected)
+        self.assertEqual(formatter.format_block(buffer), "".join(line + '\n' for line in expected))
+        self.assertEqual(formatter.format_block(commands), formatter.format_block(buffer))
+
+    def test_revolution_batches(self):
+        """Тест потоковой генерации по оборотам"""
+        params = dict(self.minimal_params, o_diam=14)
+        generator = TubeCommandGenerator(params)
+        revolutions = generator.calclulate_number_of_revolutions()
+
+        batches = list(generator.iter_revolution_batches())
+        full = TubeCommandGenerator(params).generate_punch_pattern_commands()
+
+        self.assertEqual(len(batches), revolutions + 1 + generator.config.EXTRA_ROTATIONS)
+        self.assertEqual(batches[revolutions].to_commands()[0].m_code, 110)
+        self.assertEqual(CommandBuffer.concatenate(batches).to_commands(), full.to_commands())
+
+    def test_streaming_file_generation(self):
+        """Тест потоковой записи файла с дозаписью заголовка"""
+        lines = CommandLinesGenerator(self.minimal_params).generate_radial_spiral_pattern()
+        commands_start = next(i for i, line in enumerate(lines) if not line.startswith(';'))
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'stream.txt')
+            time_data = generate_gcode_file(self.minimal_params, path)
+            with open(path, encoding='utf-8') as f:
+                streamed = f.readlines()
+
+        self.assertEqual(time_data, calculate_execution_time(self.minimal_params))
+        self.assertEqual(streamed[commands_start:], lines[commands_start:])
+        self.assertIn(f'Total => {time_data[2][0]} ({time_data[2][1]})', ''.join(streamed[:commands_start]))
+
+    def test_parallel_file_generation(self):
+        """Тест многопроцессной генерации: результат совпадает с последовательной"""
+        params = dict(self.minimal_params, o_diam=14)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            serial_path = os.path.join(tmp_dir, 'serial.txt')
+            parallel_path = os.path.join(tmp_dir, 'parallel.txt')
+            serial_time = generate_gcode_file(params, serial_path)
+            parallel_time = generate_gcode_file(params, parallel_path, workers=2)
+            with open(serial_path, encoding='utf-8') as f:
+                serial = f.readlines()
+            with open(parallel_path, encoding='utf-8') as f:
+                parallel = f.readlines()
+
+        self.assertEqual(parallel_time, serial_time)
+        # строка 3 - время генерации
+        self.assertEqual(parallel[:2] + parallel[3:], serial[:2] + serial[3:])
+
+    def test_pipeline_file_generation(self):
+        """Тест конвейерной записи: результат совпадает с последовательной, ошибки стадий передаются"""
+        params = dict(self.minimal_params, o_diam=14)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            serial_path = os.path.join(tmp_dir, 'serial.txt')
+            pipeline_path = os.path.join(tmp_dir, 'pipeline.txt')
+            serial_summary = CommandLinesGenerator(params).write_radial_spiral_pattern(serial_path)
+            generator = CommandLinesGenerator(params, pipeline=True)
+            pipeline_summary = generator.write_radial_spiral_pattern(pipeline_path)
+            with open(serial_path, encoding='utf-8') as f:
+                serial = f.readlines()
+            with open(pipeline_path, encoding='utf-8') as f:
+                pipelined = f.readlines()
+
+        self.assertEqual(pipeline_summary, serial_summary)
+        self.assertEqual(pipelined[:2] + pipelined[3:], serial[:2] + serial[3:])
+        self.assertIn('write:', generator.pipeline_report)
+
+        # ошибка стадии генерации возбуждается в потоке записи, потоки стадий завершаются
+        broken = dict(params)
+        del broken['idling_speed']
+        pipeline = GenerationPipeline(broken, queue_size=1)
+        with self.assertRaises(KeyError):
+            list(pipeline)
+        self.assertEqual(pipeline.counters['write'].items, 0)
+
+    def test_bulk_file_writer(self):
+        """Тест блочной записи: переводы строк, перезапись заголовка, атомарная замена файла"""
+        lines = [f"G01 X{idx}.5 ; Подход к точке пробития\n" for idx in range(1000)]
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'out.txt')
+            with BulkFileWriter(path, block_size=1024, atomic=True, newline='\r\n') as writer:
+                writer.write("; HEADER\n")
+                writer.writelines(lines)
+                writer.overwrite(0, "; header\n")
+            with open(path, 'rb') as f:
+                data = f.read()
+            self.assertEqual(data, ''.join(["; header\n"] + lines).replace('\n', '\r\n').encode('utf-8'))
+            self.assertEqual(write_in_file_by_lines(lines, path), True)
+            with open(path, encoding='utf-8', newline='') as f:
+                self.assertEqual(f.read(), ''.join(lines).replace('\n', os.linesep))
+
+            # при ошибке существующий файл не изменяется, временный файл удаляется
+            with self.assertRaises(RuntimeError):
+                with BulkFileWriter(path, block_size=1024, atomic=True) as writer:
+                    writer.writelines(lines[:10])
+                    raise RuntimeError("ошибка генерации")
+            self.assertEqual(os.listdir(tmp_dir), ['out.txt'])
+            with open(path, encoding='utf-8') as f:
+                self.assertEqual(f.readlines(), lines)
+
+    def test_compressed_file_generation(self):
+        """Тест записи со сжатием gzip/xz: после распаковки файл совпадает с обычным"""
+        params = dict(self.minimal_params, o_diam=12)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            plain_path = os.path.join(tmp_dir, 'program.txt')
+            plain_time = generate_gcode_file(params, plain_path)
+            plain = read_gcode_lines(plain_path)
+
+            for compression, level in (('gz', 1), ('xz', None)):
+                path = os.path.join(tmp_dir, f'program.txt.{compression}')
+                self.assertEqual(generate_gcode_file(params, path, level=level), plain_time)
+                self.assertEqual(detect_compression(path), compression)
+                self.assertLess(os.path.getsize(path), os.path.getsize(plain_path))
+                lines = read_gcode_lines(path)
+                # строка 3 - время генерации
+                self.assertEqual(lines[:2] + lines[3:], plain[:2] + plain[3:])
+
+            # заголовок сжатого файла - по предварительному проходу без форматирования
+            scan = scan_program(params)
+            self.assertEqual(scan['time_data'], plain_time)
+            self.assertEqual(scan['punches'], sum(1 for line in plain if PunchCommands.APPROACH_COMMENT in line))
+            writer = GCodeStreamWriter(params)
+            with self.assertRaises(ValueError):
+                writer.write(TubeCommandGenerator(params).iter_revolution_batches(),
+                             TubeCommandGenerator(params).get_generation_statistics(),
+                             os.path.join(tmp_dir, 'no_scan.gz'), compression='gz')
+            self.assertEqual(sorted(os.listdir(tmp_dir)), ['program.txt', 'program.txt.gz', 'program.txt.xz'])
+
+            with self.assertRaises(ValueError):
+                generate_gcode_file(params, os.path.join(tmp_dir, 'bad.gz'), level=10)
+            self.assertNotIn('bad.gz', os.listdir(tmp_dir))
+
+    def test_split_file_generation(self):
+        """Тест записи частями: команды частей совпадают с программой, ограничения и время частей"""
+        params = dict(self.minimal_params, o_diam=14)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            time_data = generate_gcode_file(params, os.path.join(tmp_dir, 'full.txt'))
+            commands = [line for line in read_gcode_lines(os.path.join(tmp_dir, 'full.txt'))
+                        if not line.startswith(';')]
+
+            # длинное имя программы не ограничено шириной полей заголовка
+            path = os.path.join(tmp_dir, 'tube_order_2026_10_17_customer_variant_A_final_v2.txt')
+            for by_part, max_lines in ((True, None), (True, 1500), (False, 2000)):
+                manifest = generate_split_gcode_files(params, path, by_part=by_part, max_lines=max_lines)
+                self.assertEqual(manifest['time_data'], time_data)
+                self.assertGreater(len(manifest['parts']), 1)
+
+                joined = []
+                revolution = 0
+                for part in manifest['parts']:
+                    lines = read_gcode_lines(os.path.join(tmp_dir, part['file']))
+                    self.assertEqual(len(lines), part['lines'])
+                    self.assertEqual(part['revolutions'][0], revolution)
+                    revolution = part['revolutions'][1] + 1
+                    if max_lines is not None:
+                        self.assertLessEqual(part['lines'], max_lines)
+                    restore = [line for line in lines if 'Восстановление положения' in line]
+                    self.assertEqual(len(restore), 0 if part['index'] == 1 else 4)
+                    body = [line for line in lines if not line.startswith(';') and line not in restore]
+                    first, last = part['program_lines']
+                    self.assertEqual(body, commands[first - 1:last])
+                    joined += body
+                self.assertEqual(joined, commands)
+                # пауза M110 в одной части, при разбиении по частям - в конце первой
+                self.assertEqual(sum(part['pause'] for part in manifest['parts']), 1)
+                if by_part:
+                    self.assertTrue(manifest['parts'][0]['pause'])
+                self.assertAlmostEqual(sum(part['seconds'] for part in manifest['parts']), time_data[2][1], delta=1)
+
+            with self.assertRaises(ValueError):
+                generate_split_gcode_files(params, path, by_part=False, max_lines=100)
+
+    def test_compact_gcode_format(self):
+        """Тест компактного формата: то же модальное состояние станка в каждой строке, меньше байт"""
+        def modal_states(lines):
+            state, states = {}, []
+            for line in lines:
+                if line.startswith(';'):
+                    continue
+                for word in line.split(';')[0].split():
+                    if word[0] in 'XYZAF':
+                        state[word[0]] = word[1:]
+                    elif word != 'G01':
+                        state['code'] = word
+                states.append(tuple(sorted(state.items())))
+            return states
+
+        params = dict(self.minimal_params, o_diam=14)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            full_path = os.path.join(tmp_dir, 'full.txt')
+            generate_gcode_file(params, full_path)
+            full = read_gcode_lines(full_path)
+
+            for comments in (True, False):
+                compact_params = dict(params, gcode_mode='compact', gcode_comments=comments)
+                generator = CommandLinesGenerator(compact_params)
+                path = os.path.join(tmp_dir, 'compact.txt')
+                summary = generator.write_radial_spiral_pattern(path)
+                compact = read_gcode_lines(path)
+
+                self.assertEqual(modal_states(compact), modal_states(full))
+                self.assertEqual(any(';' in line for line in compact[33:]), comments)
+                # экономия считается точно: отличие заголовка - строка с форматом G-кода
+                mode_line = f';G-code format => {generator.file_formatter.format_mode()}\n'
+                self.assertEqual(summary['text_bytes'] + summary['saved_bytes'],
+                                 os.path.getsize(full_path) + len(mode_line.encode('utf-8')))
+                self.assertLess(os.path.getsize(path), 0.8 * os.path.getsize(full_path))
+
+                # результат не зависит от способа записи
+                parallel_path = os.path.join(tmp_dir, 'parallel.txt')
+                CommandLinesGenerator(compact_params, workers=2).write_radial_spiral_pattern(parallel_path)
+                self.assertEqual(read_gcode_lines(parallel_path)[3:], compact[3:])
+                lines = CommandLinesGenerator(compact_params).generate_radial_spiral_pattern()
+                self.assertEqual(lines[33:], compact[33:])
+
+        with self.assertRaises(ValueError):
+            GCodeFileFormatter(dict(params, gcode_mode='short'))
+
+    def test_macro_program_matches_flat_program(self):
+        """Тест подпрограмм: развернутая программа совпадает с обычной, размер меньше в 3+ раза"""
+        params = dict(self.minimal_params, o_diam=14)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            flat_path = os.path.join(tmp_dir, 'flat.txt')
+            path = os.path.join(tmp_dir, 'macro.txt')
+            # без случайных смещений проходы по X повторяются и выносятся в подпрограммы
+            for random_border, dialect, sweep in ((0.5, 'fanuc', True), (0.5, 'linuxcnc', False),
+                                                  (0, 'fanuc', True), (0, 'linuxcnc', True)):
+                case = dict(params, random_border=random_border)
+                time_data = generate_gcode_file(case, flat_path)
+                flat = [line.split(';', 1)[0].strip() for line in read_gcode_lines(flat_path)
+                        if not line.startswith(';')]
+
+                summary = generate_macro_gcode_file(case, path, dialect=dialect, sweep=sweep)
+                self.assertEqual(expand_macro_program(read_gcode_lines(path), dialect), flat)
+                self.assertEqual(summary['time_data'], time_data)
+                self.assertEqual(summary['flat_bytes'], os.path.getsize(flat_path))
+                self.assertGreaterEqual(os.path.getsize(flat_path) / os.path.getsize(path), 3)
+            self.assertGreater(summary['sweeps'], 0)
+
+        with self.assertRaises(ValueError):
+            generate_macro_gcode_file(params, path, dialect='heidenhain')
+        with self.assertRaises(ValueError):
+            generate_macro_gcode_file(dict(params, stroke_profile='two_stage'), path)
+
+    def test_merge_rotations(self):
+        """Тест объединения поворотов: те же пробития и конечные углы, меньше поворотов и время"""
+        params = dict(self.minimal_params, o_diam=14, num_of_needle_rows=2)
+        merged_params = dict(params, merge_rotations=True)
+
+        def program(case):
+            buffer = TubeCommandGenerator(case).generate_punch_pattern_commands()
+            accumulator = MotionTimeAccumulator()
+            accumulator.add(buffer)
+            return buffer, buffer.a == buffer.a, accumulator.part_times
+
+        full, full_rotations, full_times = program(params)
+        merged, merged_rotations, merged_times = program(merged_params)
+
+        # команды пробития не меняются
+        self.assertEqual(merged[~merged_rotations].to_commands(), full[~full_rotations].to_commands())
+        # конечные углы фаз (перед M110 и в конце программы) сохраняются
+        self.assertEqual(np.nanmax(merged.a[:merged.find_m_code(110)]), np.nanmax(full.a[:full.find_m_code(110)]))
+        self.assertEqual(np.nanmax(merged.a), np.nanmax(full.a))
+
+        # экономия времени рассчитывается без генерации и совпадает с разностью времени программ
+        savings = estimate_rotation_merge(params)
+        self.assertEqual(savings['removed_rotations'], full_rotations.sum() - merged_rotations.sum())
+        self.assertGreater(savings['removed_rotations'], 0)
+        for part in range(2):
+            self.assertGreater(savings['part_seconds'][part], 0)
+            self.assertAlmostEqual(full_times[part] - merged_times[part], savings['part_seconds'][part], places=6)
+        self.assertEqual(estimate_job(merged_params)['command_lines'], len(merged))
+
+    def test_blend_rotations(self):
+        """Тест совмещения поворота с подходом: те же углы и пробития, подход только из извлеченного положения"""
+        params = dict(self.minimal_params, o_diam=14)
+        blended_params = dict(params, blend_rotations=True)
+        full = TubeCommandGenerator(params).generate_punch_pattern_commands()
+        blended = TubeCommandGenerator(blended_params).generate_punch_pattern_commands()
+
+        # последовательность углов A и команды пробития не меняются
+        np.testing.assert_array_equal(blended.a[blended.a == blended.a], full.a[full.a == full.a])
+        joint = np.flatnonzero((blended.a == blended.a) & (blended.x == blended.x))
+        self.assertGreater(joint.size, 0)
+        self.assertEqual(len(full) - len(blended), joint.size)
+        # совмещенный подход не меняет Y/Z: предыдущая команда - извлечение на той же высоте
+        self.assertTrue(np.all(blended.comment[joint - 1] == 3))
+        np.testing.assert_array_equal(blended.y[joint], blended.y[joint - 1])
+        np.testing.assert_array_equal(blended.z[joint], blended.z[joint - 1])
+        self.assertTrue(np.all(blended.feed[joint] == min(params['rotate_speed'], params['idling_speed'])))
+
+        # время совместного перемещения: скалярный и векторный расчет совпадают
+        self.assertEqual(_calculate_motion_time(blended.to_commands()), _calculate_motion_time(blended))
+        comparison = compare_execution_time(params, blended_params)
+        self.assertEqual(comparison['lines'], (len(full), len(blended)))
+        self.assertGreater(comparison['saved_seconds'][2], 0)
+        self.assertEqual(estimate_job(blended_params)['command_lines'], len(blended))
+
+        # длинные подходы (переход через полосу шагов без пробития) не совмещаются:
+        # совмещение не делает программу медленнее
+        gap_params = dict(params, tube_len=528, idling_speed=5000, num_of_needle_rows=2, needle_step_Y=7,
+                          punch_step_r=1.3)
+        plan = LayerPlan.for_params(gap_params)
+        step_count = plan.angle_step_count(1, gap_params)
+        blend = faster_blend_steps(gap_params, plan.layout, 1, step_count)
+        self.assertLess(blend.sum(), active_angle_steps(plan.layout, step_count).sum() - 1)
+        gap = compare_execution_time(gap_params, dict(gap_params, blend_rotations=True))
+        self.assertGreaterEqual(gap['saved_seconds'][2], 0)
+        gap_blended = TubeCommandGenerator(dict(gap_params, blend_rotations=True)).generate_punch_pattern_commands()
+        self.assertEqual(estimate_job(dict(gap_params, blend_rotations=True))['command_lines'], len(gap_blended))
+
+    def test_two_stage_stroke(self):
+        """Тест двухэтапного удара: те же точки внедрения, быстрый подвод до поверхности, оценка выигрыша"""
+        params = dict(self.minimal_params, o_diam=14, random_border=0)
+        two_stage_params = dict(params, stroke_profile='two_stage', surface_clearance=1.5)
+        single = TubeCommandGenerator(params).generate_punch_pattern_commands()
+        two_stage = TubeCommandGenerator(two_stage_params).generate_punch_pattern_commands()
+
+        # точки внедрения не меняются, на каждое пробитие - две дополнительные команды
+        for buffer in (single, two_stage):
+            self.assertEqual(int((buffer.comment == 2).sum()), int((single.comment == 2).sum()))
+        for column in ('x', 'y', 'z', 'a'):
+            np.testing.assert_array_equal(getattr(two_stage, column)[two_stage.comment == 2],
+                                          getattr(single, column)[single.comment == 2])
+        surface = np.flatnonzero(two_stage.comment == 5)
+        self.assertEqual(len(two_stage) - len(single), 2 * surface.size)
+        # подвод - со скоростью холостого хода до зазора surface_clearance от поверхности слоя
+        self.assertTrue(np.all(two_stage.feed[surface] == params['idling_speed']))
+        np.testing.assert_allclose(two_stage.y[surface + 1] - two_stage.y[surface],
+                                   params['punch_depth'] + 1.5)
+        np.testing.assert_array_equal(two_stage.comment[surface + 2], 6)
+
+        # оценка выигрыша совпадает с разностью времени генерации
+        comparison = compare_execution_time(params, two_stage_params)
+        estimate = estimate_stroke_profiles(two_stage_params)
+        self.assertEqual(comparison['lines'], (estimate['single']['command_lines'],
+                                               estimate['two_stage']['command_lines']))
+        self.assertGreater(comparison['saved_seconds'][2], 0)
+        for saved, estimated in zip(comparison['saved_seconds'], estimate['saved_seconds']):
+            self.assertAlmostEqual(saved, estimated, places=3)
+
+        with self.assertRaises(ValueError):
+            TubeCommandGenerator(dict(params, stroke_profile='triple')).generate_punch_pattern_commands()
+
+    def test_stitching_planner(self):
+        """Тест вариантов прошивки: обороты, прореживание подшагов, оценка времени и выбор варианта"""
+        params = dict(self.minimal_params, o_diam=14, random_border=0)
+        plan = LayerPlan.for_params(params)
+        strategy = StitchingStrategy("Сокращенная", extra_rotations=4, substep_stride=2, merge_rotations=True)
+        reduced_params = strategy.apply(params)
+        batches = list(TubeCommandGenerator(reduced_params).iter_revolution_batches())
+        self.assertEqual(len(batches), plan.main_revolutions + 1 + 4)
+
+        # основные обороты не меняются, в прошивке - вдвое меньше пробитий на шаг
+        reduced_plan = LayerPlan.for_params(reduced_params)
+        np.testing.assert_array_equal(reduced_plan.punches[:plan.main_revolutions],
+                                      plan.punches[:plan.main_revolutions])
+        np.testing.assert_array_equal(reduced_plan.punches[plan.main_revolutions:] * 2,
+                                      plan.punches[plan.main_revolutions:plan.main_revolutions + 4])
+
+        rows = plan_stitching(params, [StitchingStrategy("Текущий", plan.extra_revolutions), strategy])
+        estimate = estimate_job(reduced_params)
+        self.assertEqual(estimate['command_lines'], sum(len(batch) for batch in batches))
+        self.assertAlmostEqual(rows[1]['part_seconds'], time_prediction_motioncommand(
+            CommandBuffer.concatenate(batches))[1][1], delta=1)
+        self.assertEqual(rows[0]['saved_seconds'], 0)
+        self.assertGreater(rows[1]['saved_seconds'], 0)
+        self.assertAlmostEqual(rows[1]['punch_ratio'], reduced_plan.punches[plan.main_revolutions:].sum()
+                               / plan.punches[plan.main_revolutions:].sum())
+        self.assertIs(select_stitching_plan(rows, min_punch_ratio=0.5), rows[0])
+        self.assertIs(select_stitching_plan(rows), rows[1])
+
+        with self.assertRaises(ValueError):
+            LayerPlan.for_params(dict(params, stitching_substep_stride=0))
+        # шаг больше 2 оставляет подшаги, которые смещение змейки не покрывает
+        layout = replace(plan.layout, x_substep_count=6)
+        self.assertEqual(layout.sparse(2).x_substep_count, 3)
+        with self.assertRaises(ValueError):
+            layout.sparse(3)
+
+    def test_density_schedule(self):
+        """Тест расписания шагов по плотности: кратность смещению игольницы, допуск плотности, отчет"""
+        params = dict(self.minimal_params, o_diam=14, random_border=0)
+        plan = LayerPlan.for_params(params)
+        # с целевой плотностью по умолчанию (плотность шага punch_step_r) шаги не меняются
+        default = LayerPlan.for_params(dict(params, density_schedule=True, density_tolerance=0.05))
+        np.testing.assert_array_equal(default.step_count, plan.step_count)
+
+        # выигрыш - только от явной целевой плотности ниже плотности шага
+        scheduled_params = dict(params, density_schedule=True, density_tolerance=0.05,
+                                target_density=0.9 * target_density(params))
+        scheduled = LayerPlan.for_params(scheduled_params)
+        area = scheduled.circle_len * params['tube_len'] / 100.0
+        density = scheduled.punches / area / target_density(scheduled_params)
+        self.assertTrue(np.all(scheduled.step_count % 2 == 0))
+        self.assertTrue(np.all(np.abs(density - 1) <= 0.05 + 1e-9))
+        # соседние количества шагов (кратные 2) не ближе к целевой плотности
+        for neighbour in (scheduled.step_count - 2, scheduled.step_count + 2):
+            neighbour_density = scheduled.punches / scheduled.step_count * neighbour / area
+            self.assertTrue(np.all(np.abs(neighbour_density / target_density(scheduled_params) - 1)
+                                   >= np.abs(density - 1) - 1e-9))
+        self.assertLess(scheduled.total_punches, plan.total_punches)
+
+        # отчет по слоям совпадает с планами и генерацией
+        report = estimate_density_schedule(scheduled_params)
+        self.assertEqual(report['punches'], (plan.total_punches, scheduled.total_punches))
+        self.assertEqual([layer['steps'][1] for layer in report['layers']], scheduled.step_count.tolist())
+        self.assertGreater(report['saved_seconds'], 0)
+        time_data = time_prediction_motioncommand(TubeCommandGenerator(scheduled_params).generate_punch_pattern_commands())
+        self.assertEqual([round(seconds) for seconds in report['part_seconds'][1]], [time_data[0][1], time_data[1][1]])
+
+        with self.assertRaises(ValueError):
+            LayerPlan.for_params(dict(scheduled_params, target_density=-1))
+
+    def test_parameter_optimizer(self):
+        """Тест оптимизатора параметров: Парето-фронт, ограничения и параллельная оценка"""
+        params = dict(self.minimal_params, i_diam=68, o_diam=70, tube_len=100)
+        space = {'punch_step_r': (1, 2), 'num_of_needle_rows': (1, 2), 'random_border': (0, 0.5),
+                 'move_speed': (1000, 2000, 2500)}
+        result = optimize_parameters(params, space, min_density=needle_density(dict(params, punch_step_r=2)))
+
+        self.assertEqual(len(result['candidates']), 24)
+        # скорость выше ValidationLimits.MAX_MOVE_SPEED отклоняется проверкой параметров
+        self.assertEqual(sum(not row['valid'] for row in result['candidates']), 8)
+        pareto = result['pareto']
+        self.assertGreater(len(pareto), 0)
+        for row in pareto:
+            self.assertEqual(row['params']['move_speed'], 2000)
+            for other in result['feasible']:
+                self.assertFalse(other['seconds'] <= row['seconds'] and other['density'] >= row['density']
+                                 and (other['seconds'], other['density']) != (row['seconds'], row['density']))
+        # любой допустимый кандидат не лучше одного из фронта по времени и плотности
+        for other in result['feasible']:
+            self.assertTrue(any(row['seconds'] <= other['seconds'] and row['density'] >= other['density']
+                                for row in pareto))
+        self.assertTrue(all(row['density'] >= needle_density(dict(params, punch_step_r=2))
+                            for row in result['feasible']))
+
+        # случайное смещение - ограничение, а не критерий
+        bounded = optimize_parameters(params, space, min_random_border=0.5)
+        self.assertTrue(all(row['random_border'] >= 0.5 for row in bounded['feasible']))
+        self.assertTrue(all(row['random_border'] == 0.5 for row in bounded['pareto']))
+
+        parallel = optimize_parameters(params, space, workers=2,
+                                       min_density=needle_density(dict(params, punch_step_r=2)))
+        self.assertEqual([row['seconds'] for row in parallel['pareto']], [row['seconds'] for row in pareto])
+
+    def test_batch_jobs(self):
+        """Тест пакетной генерации: задания из CSV, изоляция ошибок и итоговая таблица"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            jobs_path = os.path.join(tmp_dir, 'jobs.csv')
+            with open(jobs_path, 'w', encoding='utf-8') as f:
+                f.write("name,tube_len,i_diam,o_diam,punch_step_r,stroke_profile\n"
+                        "small,100,68,70,2,\n"
+                        "invalid,100,10,70,2,\n"
+                        "broken,100,68,70,2,bogus\n")
+            jobs = load_jobs(jobs_path, tmp_dir)
+            self.assertEqual([job.name for job in jobs], ['small', 'invalid', 'broken'])
+            self.assertEqual(jobs[0].params['punch_step_r'], 2)
+            self.assertNotIn('stroke_profile', jobs[0].params)
+
+            results = run_batch(jobs, workers=2)
+            self.assertEqual([result.status for result in results], ['ok', 'invalid', 'error'])
+            self.assertEqual(results[0].file_bytes, os.path.getsize(jobs[0].output))
+            self.assertEqual(results[0].punches, LayerPlan.for_params(jobs[0].params).total_punches)
+            self.assertEqual(results[0].seconds, calculate_execution_time(jobs[0].params)[2][1])
+            self.assertIn('bogus', results[2].error)
+
+            # аварийное завершение процесса одного задания не прерывает остальные
+            crashing = [BatchJob(name=f"job_{index}", output=os.path.join(tmp_dir, f"job_{index}.txt"))
+                        for index in range(6)]
+            crashing[2].name = 'crash'
+            with mock.patch('functions.batch_jobs.run_job', _crash_or_succeed):
+                crash_results = run_batch(crashing, workers=3)
+            self.assertEqual([result.name for result in crash_results], [job.name for job in crashing])
+            self.assertEqual([result.status for result in crash_results], ['ok', 'ok', 'error', 'ok', 'ok', 'ok'])
+            self.assertIn('BrokenProcessPool', crash_results[2].error)
+
+            # нечисловое значение параметра - недопустимое задание, а не прерывание пакета
+            malformed = [BatchJob(name='malformed', output=os.path.join(tmp_dir, 'malformed.txt'),
+                                  params=dict(jobs[0].params, i_diam='abc')), jobs[0]]
+            malformed_results = run_batch(malformed, workers=1)
+            self.assertEqual([result.status for result in malformed_results], ['invalid', 'ok'])
+            self.assertIn('TypeError', malformed_results[0].error)
+
+            # процессы-исполнители ничего не выводят в консоль
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                run_job(jobs[0])
+            self.assertEqual(output.getvalue(), '')
+
+            summary_path = os.path.join(tmp_dir, 'summary.csv')
+            write_summary(results, summary_path)
+            with open(summary_path, encoding='utf-8') as f:
+                lines = f.readlines()
+            self.assertEqual(len(lines), 4)
+            self.assertTrue(lines[1].startswith('small,ok,'))
+
+    def test_parameter_sweep(self):
+        """Тест векторного расчета сетки: обороты и пробития как у GeometryCalculator, время как у estimate_job"""
+        params = dict(self.minimal_params, i_diam=68, tube_len=100, num_of_needle_rows=2)
+        values = {'i_diam': [68, 71.5], 'o_diam': [70, 74.2], 'tube_len': [100, 130], 'volumetric_density': [15, 45]}
+        table = sweep_parameters(params, values)
+        self.assertEqual(table.size, 16)
+
+        for row in table:
+            case = dict(params, i_diam=float(row['i_diam']), o_diam=float(row['o_diam']),
+                        tube_len=float(row['tube_len']), volumetric_density=int(row['volumetric_density']))
+            self.assertEqual(row['valid'], ParameterValidator().validate_all_parameters(case)[0])
+            if row['o_diam'] <= row['i_diam']:
+                self.assertEqual(row['main_rotation_num'], 0)
+                continue
+            calculator = GeometryCalculator(case)
+            main, total, o_diam = calculator.calculate_rotation_parameters()
+            self.assertEqual((row['main_rotation_num'], row['total_rotation_num']), (main, total))
+            self.assertAlmostEqual(row['calculated_o_diam'], o_diam)
+            punches, fabric_len, zones, punches_in_zone = calculator.calculate_total_punches(main, total)
+            self.assertEqual((row['total_punches'], row['zones_per_crank'], row['punches_in_zone']),
+                             (punches, zones, punches_in_zone))
+            self.assertAlmostEqual(row['total_fabric_len'], fabric_len, places=6)
+            # общие слагаемые модели: расхождение - только от округления углов до 0.001°
+            seconds = (row['part1_seconds'], row['part2_seconds'])
+            for expected, actual in zip(estimate_job(case)['part_seconds'], seconds):
+                self.assertLessEqual(abs(actual - expected), 1e-6 * expected)
+
+        self.assertEqual(int(np.count_nonzero(~table['valid'])), 4)
+        # размеры вне пределов ValidationLimits отмечаются недопустимыми
+        limits = sweep_parameters(params, {'i_diam': [30, 68], 'o_diam': [74.2, 400]}, product=False)
+        self.assertEqual(limits['valid'].tolist(), [False, False])
+
+        paired = sweep_parameters(params, {'i_diam': [68, 71.5], 'o_diam': [70, 74.2]}, product=False)
+        self.assertEqual(paired['o_diam'].tolist(), [70, 74.2])
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'sweep.csv')
+            write_sweep_csv(paired, path)
+            with open(path, encoding='utf-8') as f:
+                lines = f.readlines()
+            self.assertEqual(len(lines), 3)
+            self.assertTrue(lines[0].startswith('i_diam,o_diam,tube_len,volumetric_density,main_rotation_num'))
+
+    def test_optimize_path(self):
+        """Тест оптимизации порядка пробитий: те же X в каждом шаге, время не больше, запись не зависит от способа"""
+        params = dict(self.minimal_params, o_diam=14, needle_step_Y=7, num_of_needle_rows=2)
+        full = TubeCommandGenerator(params).generate_punch_pattern_commands()
+        punch_rows = np.flatnonzero(full.comment == 2)
+
+        for constraint in ('alternate', 'free'):
+            optimized_params = dict(params, optimize_path=True, path_constraint=constraint)
+            optimized = TubeCommandGenerator(optimized_params).generate_punch_pattern_commands()
+            # порядок меняется только внутри шага: те же строки, углы и набор X каждого шага
+            np.testing.assert_array_equal(optimized.comment, full.comment)
+            np.testing.assert_array_equal(optimized.a, full.a)
+            step = np.cumsum(full.comment == 0)[punch_rows]
+            full_x, optimized_x = full.x[punch_rows], optimized.x[punch_rows]
+            np.testing.assert_array_equal(optimized_x[np.lexsort((optimized_x, step))],
+                                          full_x[np.lexsort((full_x, step))])
+
+            comparison = compare_execution_time(params, optimized_params)
+            self.assertGreater(comparison['saved_seconds'][2], 0)
+            self.assertTrue(all(saved >= 0 for saved in comparison['saved_seconds']))
+
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                paths = [os.path.join(tmp_dir, name) for name in ('serial.txt', 'parallel.txt')]
+                CommandLinesGenerator(optimized_params).write_radial_spiral_pattern(paths[0])
+                CommandLinesGenerator(optimized_params, workers=2).write_radial_spiral_pattern(paths[1])
+                self.assertEqual(read_gcode_lines(paths[0])[3:], read_gcode_lines(paths[1])[3:])
+
+        with self.assertRaises(ValueError):
+            TubeCommandGenerator(dict(params, optimize_path=True, path_constraint='random')
+                                 ).generate_punch_pattern_commands()
+
+    def test_job_estimate_matches_generation(self):
+        """Тест аналитической оценки задания: строки и пробития точно, время и размер в пределах допуска"""
+        params = dict(self.minimal_params, o_diam=14)
+
+        for random_border in (params['random_border'], 0):
+            case = dict(params, random_border=random_border)
+            estimate = estimate_job(case)
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                path = os.path.join(tmp_dir, 'job.txt')
+                time_data = generate_gcode_file(case, path)
+                file_bytes = os.path.getsize(path)
+                with open(path, encoding='utf-8') as f:
+                    lines = f.readlines()
+
+            punches = sum(1 for line in lines if PunchCommands.APPROACH_COMMENT in line)
+            self.assertEqual(estimate['total_lines'], len(lines))
+            self.assertEqual(estimate['punches'], punches)
+            for part in range(3):
+                self.assertLessEqual(abs(estimate['time_data'][part][1] - time_data[part][1]),
+                                     max(1, TIME_TOLERANCE * time_data[part][1]))
+            self.assertLessEqual(abs(estimate['file_bytes'] - file_bytes), FILE_SIZE_TOLERANCE * file_bytes)
+
+        # без случайных смещений оценка совпадает с генерацией
+        self.assertEqual(estimate['time_data'], time_data)
+        self.assertEqual(estimate['file_bytes'], file_bytes)
+
+        # компактный формат и формат без комментариев
+        for line_format in (dict(gcode_comments=False), dict(gcode_mode='compact'),
+                            dict(gcode_mode='compact', gcode_comments=False)):
+            for random_border in (params['random_border'], 0):
+                case = dict(params, random_border=random_border, **line_format)
+                with tempfile.TemporaryDirectory() as tmp_dir:
+                    path = os.path.join(tmp_dir, 'job.txt')
+                    generate_gcode_file(case, path)
+                    file_bytes = os.path.getsize(path)
+                estimate = estimate_job(case)
+                self.assertLessEqual(abs(estimate['file_bytes'] - file_bytes), FILE_SIZE_TOLERANCE * file_bytes)
+            self.assertEqual(estimate['file_bytes'], file_bytes)
+
 
 if __name__ == '__main__':
     unittest.main(verbosity=2)
@@ -14,6 +14,7 @@ from typing import List, Dict, Tuple
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from functions.prod_functions import generate_command_lines
+from functions.compressed_io import read_gcode_lines
 
 
 class TestGCodeGeneration(unittest.TestCase):
@@ -75,8 +76,7 @@ class TestGCodeGeneration(unittest.TestCase):
 
         # Читаем референсный файл
         print("Чтение референсного файла...")
-        with open(self.reference_file, 'r', encoding='utf-8') as f:
-            reference_lines = [line.rstrip('\n') for line in f.readlines()]
+        reference_lines = [line.rstrip('\n') for line in read_gcode_lines(self.reference_file)]
 
         # Убираем переносы строк из сгенерированных данных для корректного сравнения
         generated_clean = [line.rstrip('\n') for line in generated_lines]
@@ -39,7 +39,7 @@ def create_punch_visualization(params: dict, html_path: str = "visualization.htm
         print(f"[ВИЗУАЛИЗАЦИЯ] revolutions: {revolutions}")
 
         print("[ВИЗУАЛИЗАЦИЯ] Генерация случайных смещений...")
-        generator.generate_random_offsets(revolutions)
+        generator.generate_random_offsets()
 
         print("[ВИЗУАЛИЗАЦИЯ] Генерация команд...")
         commands = generator.generate_commands(revolutions)
@@ -64,7 +64,7 @@ def create_punch_visualization_2d(params: dict, html_path: str = "visualization_
         print(f"[ВИЗУАЛИЗАЦИЯ 2D] revolutions: {revolutions}")
 
         print("[ВИЗУАЛИЗАЦИЯ 2D] Генерация случайных смещений...")
-        generator.generate_random_offsets(revolutions)
+        generator.generate_random_offsets()
 
         print("[ВИЗУАЛИЗАЦИЯ 2D] Генерация команд...")
         commands = generator.generate_commands(revolutions)